@@ -0,0 +1,107 @@
+"""Memory bandwidth with and without placing the processes on NUMA nodes.
+
+An in-place producer fills large buffers and the consumer copies every batch
+into a local array, so both sides are bound by memory bandwidth. The
+placements are:
+
+    none        no affinity, the operating system places the processes and the pages
+    local       the commander, producers and consumer on the CPUs of one node,
+                the buffers first touched by the consumer on that node
+    remote      the producers on one node and the consumer (and the buffers)
+                on another node, only on systems with more than one node
+
+    python -m benchmarks.affinity_benchmark --cpus 4 --megabytes 64
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from concurrentbuffer.affinity import CpuAffinity, get_numa_nodes
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import InPlaceProducer
+
+
+class IndexCommander(Commander):
+    def __init__(self):
+        self._index = 0
+
+    def create_message(self) -> dict:
+        self._index += 1
+        return {"index": self._index}
+
+
+class FillProducer(InPlaceProducer):
+    def create_data_into(self, message: dict, out_arrays):
+        out_arrays[0].fill(message["index"])
+
+
+def placements() -> dict:
+    nodes = get_numa_nodes()
+    node_ids = sorted(nodes)
+    local = sorted(nodes[node_ids[0]])
+    placements = {
+        "none": None,
+        "local": CpuAffinity(commander=local, producers=[local], consumer=local),
+    }
+    if len(node_ids) > 1:
+        remote = sorted(nodes[node_ids[1]])
+        placements["remote"] = CpuAffinity(
+            commander=local, producers=[local], consumer=remote
+        )
+    return placements
+
+
+def run(affinity, context: str, cpus: int, megabytes: int, items: int) -> dict:
+    shape = (megabytes * 2**20 // 8,)
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=(shape,),
+        commander=IndexCommander(),
+        producer=FillProducer(),
+        context=context,
+        deterministic=False,
+        buffer_dtype=np.int64,
+        buffer_count=2 * cpus,
+        affinity=affinity,
+    ) as buffer_iterator:
+        local_array = np.empty(shape, dtype=np.int64)
+        next(buffer_iterator)
+        start = time.perf_counter()
+        for _ in range(items):
+            np.copyto(local_array, next(buffer_iterator)[0])
+        elapsed = time.perf_counter() - start
+
+    return {"gigabytes_per_second": items * local_array.nbytes / elapsed / 1e9}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=2)
+    parser.add_argument("--megabytes", type=int, default=64, help="size of a batch")
+    parser.add_argument("--items", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"numa nodes: {dict(sorted(get_numa_nodes().items()))}")
+    for name, affinity in placements().items():
+        best = max(
+            run(
+                affinity=affinity,
+                context=args.context,
+                cpus=args.cpus,
+                megabytes=args.megabytes,
+                items=args.items,
+            )["gigabytes_per_second"]
+            for _ in range(args.repeats)
+        )
+        print(f"{name:>6}: {best:7.3f} GB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compares one shared memory segment per buffer with a single arena.
+
+Reports the time it takes to allocate the shared memory and the number of
+open file descriptors and /dev/shm segments in the main process.
+
+    python -m benchmarks.arena_benchmark --cpus 32 --outputs 3
+"""
+
+import argparse
+import os
+import time
+from multiprocessing.managers import SharedMemoryManager
+
+import numpy as np
+
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.manager import SharedBufferManager
+from concurrentbuffer.state import BufferState
+
+
+def _open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except FileNotFoundError:
+        return -1
+
+
+def _per_buffer(buffer_info: BufferInfo):
+    # the allocation strategy before the arena: one segment per buffer
+    manager = SharedMemoryManager()
+    manager.start()
+    segments = [manager.SharedMemory(size=buffer_info.count)]
+    for shape in buffer_info.shapes:
+        nbytes = int(np.prod(shape)) * np.dtype(buffer_info.dtype).itemsize
+        for _ in range(buffer_info.count):
+            segments.append(manager.SharedMemory(size=nbytes))
+    return manager, segments
+
+
+def _arena(buffer_info: BufferInfo):
+    manager = SharedBufferManager(buffer_info=buffer_info)
+    manager.start()
+    return manager, [manager.arena]
+
+
+_MODES = {"per-buffer": _per_buffer, "arena": _arena}
+
+
+def run(mode: str, buffer_info: BufferInfo) -> dict:
+    fds = _open_fds()
+    start = time.perf_counter()
+    manager, segments = _MODES[mode](buffer_info)
+    elapsed = time.perf_counter() - start
+    result = {
+        "mode": mode,
+        "startup_ms": elapsed * 1e3,
+        "segments": len(segments),
+        "open_fds": _open_fds() - fds,
+    }
+    del segments
+    manager.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cpus", type=int, default=32)
+    parser.add_argument("--outputs", type=int, default=3)
+    parser.add_argument("--shape", type=int, nargs="+", default=[16, 128, 128, 3])
+    args = parser.parse_args()
+
+    buffer_info = BufferInfo(
+        shapes=(tuple(args.shape),) * args.outputs,
+        count=args.cpus * len(BufferState),
+    )
+    for mode in _MODES:
+        result = run(mode=mode, buffer_info=buffer_info)
+        print(
+            f"{result['mode']:>10}: startup {result['startup_ms']:8.1f} ms"
+            f"  segments {result['segments']:5d}  open fds {result['open_fds']:5d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Throughput of consumers in other processes compared to consumer threads.
+
+The consumers in other processes get their data through an attachment of
+the factory (BufferFactory.attachment), from the same shared memory as the
+consumer threads, so no data is copied. Every consumer spends --consume
+seconds on each batch.
+
+    python -m benchmarks.attachment_benchmark --cpus 4 --consumers 2
+"""
+
+import argparse
+import multiprocessing
+import threading
+import time
+
+import numpy as np
+
+from concurrentbuffer.consumers import ConsumerGroup
+from concurrentbuffer.iterator import BufferIterator, buffer_iterator_factory
+
+from benchmarks.consumers_benchmark import FillProducer, IndexCommander
+
+SHAPES = ((32, 64, 64, 3),)
+
+
+def consume_items(consumer, items: int, consume: float, start):
+    next(consumer)
+    start.wait()
+    for _ in range(items):
+        next(consumer)
+        time.sleep(consume)
+
+
+def consume_attached(attachment, consumer: int, consumers: int, items: int, consume: float, start):
+    with BufferIterator(
+        buffer_factory=attachment, consumer=consumer, consumers=consumers
+    ) as buffer_iterator:
+        consume_items(buffer_iterator, items=items, consume=consume, start=start)
+
+
+def run(
+    processes: bool,
+    consumers: int,
+    context: str,
+    cpus: int,
+    latency: float,
+    consume: float,
+    items: int,
+) -> float:
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=SHAPES,
+        commander=IndexCommander(),
+        producer=FillProducer(latency=latency),
+        context=context,
+        deterministic=True,
+        buffer_dtype=np.uint8,
+        buffer_count=2 * cpus + consumers,
+        buffer_iterator_class=ConsumerGroup,
+        consumers=consumers,
+    ) as consumer_group:
+        if processes:
+            mp_context = multiprocessing.get_context(context)
+            start = mp_context.Barrier(consumers + 1)
+            attachment = consumer_group.buffer_factory.attachment()
+            workers = [
+                threading.Thread(
+                    target=consume_items, args=(consumer_group[0], items, consume, start)
+                )
+            ] + [
+                mp_context.Process(
+                    target=consume_attached,
+                    args=(attachment, consumer, consumers, items, consume, start),
+                )
+                for consumer in range(1, consumers)
+            ]
+        else:
+            start = threading.Barrier(consumers + 1)
+            workers = [
+                threading.Thread(target=consume_items, args=(consumer, items, consume, start))
+                for consumer in consumer_group
+            ]
+        for worker in workers:
+            worker.start()
+        start.wait()
+        begin = time.perf_counter()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - begin
+
+    return consumers * items / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=4)
+    parser.add_argument("--consumers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds to produce a batch")
+    parser.add_argument("--consume", type=float, default=0.01, help="seconds a consumer spends per batch")
+    parser.add_argument("--items", type=int, default=100, help="batches per consumer")
+    args = parser.parse_args()
+
+    for processes in (False, True):
+        batches_per_second = run(
+            processes=processes,
+            consumers=args.consumers,
+            context=args.context,
+            cpus=args.cpus,
+            latency=args.latency,
+            consume=args.consume,
+            items=args.items,
+        )
+        print(
+            f"{'processes' if processes else 'threads':>9}"
+            f" consumers {args.consumers}: {batches_per_second:8.1f} batches/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compares the thread backend with the fork, forkserver and spawn process backends.
+
+The producer multiplies matrices with numpy, which releases the GIL. Startup
+is the time from creating the iterator until the first batch is returned,
+throughput is measured over the batches after that.
+
+    python -m benchmarks.backend_benchmark --cpus 4 --items 200 --size 256
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import InPlaceProducer
+from concurrentbuffer.thread import THREAD_CONTEXT
+
+
+class SeedCommander(Commander):
+    def __init__(self):
+        self._seed = 0
+
+    def create_message(self) -> dict:
+        self._seed += 1
+        return {"seed": self._seed}
+
+
+class MatMulProducer(InPlaceProducer):
+    def __init__(self, size: int):
+        self._size = size
+        self._matrix = None
+
+    def build(self):
+        self._matrix = np.random.default_rng(0).random((self._size, self._size))
+
+    def create_data_into(self, message: dict, out_arrays):
+        np.dot(self._matrix, self._matrix * message["seed"], out=out_arrays[0])
+
+
+def run(context: str, cpus: int, items: int, size: int) -> dict:
+    start = time.perf_counter()
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=((size, size),),
+        commander=SeedCommander(),
+        producer=MatMulProducer(size=size),
+        context=context,
+        deterministic=False,
+        buffer_dtype=np.float64,
+    ) as buffer_iterator:
+        next(buffer_iterator)
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(items):
+            next(buffer_iterator)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "context": context,
+        "startup_seconds": startup,
+        "items_per_second": items / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cpus", type=int, default=4)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--size", type=int, default=256)
+    args = parser.parse_args()
+
+    contexts = [THREAD_CONTEXT, "spawn"]
+    if sys.platform != "win32":
+        contexts[1:1] = ["fork", "forkserver"]
+    for context in contexts:
+        result = run(context=context, cpus=args.cpus, items=args.items, size=args.size)
+        print(
+            f"{context:>10}: startup {result['startup_seconds'] * 1000:8.1f}ms"
+            f"  throughput {result['items_per_second']:8.1f} items/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Throughput of multiple consumer threads on one pool of producers.
+
+Every consumer spends --consume seconds on each batch (like a training step
+on its own GPU, which releases the GIL), so with enough producers the
+throughput grows with the number of consumers.
+
+    python -m benchmarks.consumers_benchmark --cpus 4 --consumers 1 2 4
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.consumers import ConsumerGroup
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import InPlaceProducer
+from concurrentbuffer.system import LOAD_BALANCED_DELIVERY, ROUND_ROBIN_DELIVERY
+
+SHAPES = ((32, 64, 64, 3),)
+
+
+class IndexCommander(Commander):
+    def __init__(self):
+        self._index = 0
+
+    def create_message(self) -> dict:
+        self._index += 1
+        return {"index": self._index}
+
+
+class FillProducer(InPlaceProducer):
+    def __init__(self, latency: float):
+        self._latency = latency
+
+    def create_data_into(self, message: dict, out_arrays):
+        time.sleep(self._latency)
+        out_arrays[0][:] = message["index"] % 256
+
+
+def run(
+    consumers: int,
+    delivery: str,
+    deterministic: bool,
+    context: str,
+    cpus: int,
+    latency: float,
+    consume: float,
+    items: int,
+) -> float:
+    def consume_items(consumer):
+        for _ in range(items):
+            next(consumer)
+            time.sleep(consume)
+
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=SHAPES,
+        commander=IndexCommander(),
+        producer=FillProducer(latency=latency),
+        context=context,
+        deterministic=deterministic,
+        buffer_dtype=np.uint8,
+        buffer_count=2 * cpus + consumers,
+        buffer_iterator_class=ConsumerGroup,
+        consumers=consumers,
+        delivery=delivery,
+    ) as consumer_group:
+        for consumer in consumer_group:
+            next(consumer)
+        threads = [
+            threading.Thread(target=consume_items, args=(consumer,))
+            for consumer in consumer_group
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    return consumers * items / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=4)
+    parser.add_argument("--consumers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds to produce a batch")
+    parser.add_argument("--consume", type=float, default=0.01, help="seconds a consumer spends per batch")
+    parser.add_argument("--items", type=int, default=100, help="batches per consumer")
+    args = parser.parse_args()
+
+    for deterministic in (True, False):
+        for delivery in (ROUND_ROBIN_DELIVERY, LOAD_BALANCED_DELIVERY):
+            for consumers in args.consumers:
+                batches_per_second = run(
+                    consumers=consumers,
+                    delivery=delivery,
+                    deterministic=deterministic,
+                    context=args.context,
+                    cpus=args.cpus,
+                    latency=args.latency,
+                    consume=args.consume,
+                    items=args.items,
+                )
+                print(
+                    f"{'det' if deterministic else 'any'} {delivery:>13}"
+                    f" consumers {consumers}: {batches_per_second:8.1f} batches/s"
+                )
+
+
+if __name__ == "__main__":
+    main()
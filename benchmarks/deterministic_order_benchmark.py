@@ -0,0 +1,132 @@
+"""Throughput of deterministic and non-deterministic iteration under skewed latency.
+
+Every slow_every-th message takes slow seconds to produce, all others take
+fast seconds. In deterministic mode a slow message blocks the consumer until
+it is ready, a reorder window lets the producers continue with the buffers
+of the messages behind it and an order window lets the consumer take data
+up to order_window positions out of order.
+
+    python -m benchmarks.deterministic_order_benchmark --cpus 4 --items 200
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import Producer
+
+SHAPES = ((64, 64),)
+
+
+class SkewedCommander(Commander):
+    def __init__(self, fast: float, slow: float, slow_every: int):
+        self._fast = fast
+        self._slow = slow
+        self._slow_every = slow_every
+        self._index = 0
+
+    def create_message(self) -> dict:
+        slow = self._index % self._slow_every == self._slow_every - 1
+        message = {"index": self._index, "delay": self._slow if slow else self._fast}
+        self._index += 1
+        return message
+
+
+class SleepProducer(Producer):
+    def create_data(self, message: dict):
+        time.sleep(message["delay"])
+        return (np.full(SHAPES[0], message["index"], dtype=np.int64),)
+
+
+def run(
+    cpus: int,
+    items: int,
+    deterministic: bool,
+    reorder_window: int,
+    order_window: int,
+    buffer_count: int,
+    fast: float,
+    slow: float,
+    slow_every: int,
+    context: str = "spawn",
+) -> dict:
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=SHAPES,
+        commander=SkewedCommander(fast=fast, slow=slow, slow_every=slow_every),
+        producer=SleepProducer(),
+        context=context,
+        deterministic=deterministic,
+        buffer_dtype=np.int64,
+        buffer_count=buffer_count,
+        reorder_window=reorder_window,
+        order_window=order_window,
+    ) as buffer_iterator:
+        # warm up, all processes are running after the first item
+        next(buffer_iterator)
+        indices = []
+        start = time.perf_counter()
+        for _ in range(items):
+            indices.append(int(next(buffer_iterator)[0][0, 0]))
+        elapsed = time.perf_counter() - start
+
+    if deterministic:
+        assert all(
+            abs(index - position) <= order_window
+            for position, index in enumerate(indices, 1)
+        )
+    return {
+        "deterministic": deterministic,
+        "reorder_window": reorder_window,
+        "order_window": order_window,
+        "items_per_second": items / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=4)
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--buffer-count", type=int, default=None)
+    parser.add_argument("--fast", type=float, default=0.005)
+    parser.add_argument("--slow", type=float, default=0.1)
+    parser.add_argument("--slow-every", type=int, default=16)
+    args = parser.parse_args()
+
+    buffer_count = args.buffer_count or 2 * args.cpus + 2
+    modes = [
+        (True, 0, 0),
+        (True, buffer_count // 2, 0),
+        (True, buffer_count - 1, 0),
+        (True, 0, 2),
+        (True, 0, buffer_count // 2),
+        (True, buffer_count - 1, buffer_count // 2),
+        (False, 0, 0),
+    ]
+    for deterministic, reorder_window, order_window in modes:
+        result = run(
+            cpus=args.cpus,
+            items=args.items,
+            deterministic=deterministic,
+            reorder_window=reorder_window,
+            order_window=order_window,
+            buffer_count=buffer_count,
+            fast=args.fast,
+            slow=args.slow,
+            slow_every=args.slow_every,
+            context=args.context,
+        )
+        label = (
+            f"deterministic, reorder_window {reorder_window:>2}, order_window {order_window:>2}"
+            if deterministic
+            else "non-deterministic"
+        )
+        print(f"{label:>50}: {result['items_per_second']:7.1f} items/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compares the return-value producer api with the in-place producer api.
+
+Every mode runs in a fresh process such that the peak resident set size
+(ru_maxrss) only accounts for that mode. The throughput is reported as the
+number of batch bytes that end up in shared memory per second.
+
+    python -m benchmarks.inplace_producer_benchmark --shape 64 256 256 3
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from concurrentbuffer.memory import BufferMemory
+from concurrentbuffer.producer import InPlaceProducer, Producer
+
+
+class _ReturnProducer(Producer):
+    def __init__(self, shape, dtype):
+        self._shape = shape
+        self._dtype = dtype
+
+    def create_data(self, message):
+        data = np.empty(self._shape, dtype=self._dtype)
+        data[:] = message["value"]
+        return (data,)
+
+
+class _InPlaceProducer(InPlaceProducer):
+    def create_data_into(self, message, out_arrays):
+        out_arrays[0][:] = message["value"]
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _produce(mode, shape, dtype, batches, results):
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    shared_memory = SharedMemory(create=True, size=nbytes)
+    try:
+        buffer_memory = BufferMemory(
+            shape=shape, dtype=dtype, buffer=shared_memory, offsets=[0]
+        )
+        # touch the slot once such that page faults are not measured
+        buffer_memory.get_writable_buffer(buffer_id=0)[:] = 0
+
+        if mode == "in-place":
+            producer = _InPlaceProducer()
+        else:
+            producer = _ReturnProducer(shape=shape, dtype=dtype)
+
+        start = time.perf_counter()
+        for index in range(batches):
+            message = {"value": index % 255}
+            if mode == "in-place":
+                producer.create_data_into(
+                    message=message,
+                    out_arrays=[buffer_memory.get_writable_buffer(buffer_id=0)],
+                )
+            else:
+                data = producer.create_data(message=message)
+                buffer_memory.update_buffer(buffer_id=0, data=data[0])
+                del data
+        elapsed = time.perf_counter() - start
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    results.put(
+        {
+            "mode": mode,
+            "gb_per_second": nbytes * batches / elapsed / 1e9,
+            "ms_per_batch": elapsed / batches * 1e3,
+            "peak_rss_mb": _peak_rss_bytes() / 1e6,
+        }
+    )
+
+
+def run(mode: str, shape: tuple, dtype: str, batches: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_produce, args=(mode, shape, dtype, batches, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--shape", type=int, nargs="+", default=[64, 256, 256, 3])
+    parser.add_argument("--dtype", default="float32")
+    parser.add_argument("--batches", type=int, default=50)
+    args = parser.parse_args()
+
+    for mode in ("return", "in-place"):
+        result = run(
+            mode=mode, shape=tuple(args.shape), dtype=args.dtype, batches=args.batches
+        )
+        print(
+            f"{result['mode']:>8}: {result['gb_per_second']:6.2f} GB/s"
+            f"  {result['ms_per_batch']:7.2f} ms/batch"
+            f"  peak rss {result['peak_rss_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Compares multiprocessing.Queue with the shared memory MessageRing.
+
+Latency is measured as a ping-pong between two processes over two
+transports (half the round trip). Throughput is measured by streaming
+commander-like messages from one process to another.
+
+    python -m benchmarks.message_transport_benchmark --messages 20000
+"""
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing.managers import SharedMemoryManager
+
+import numpy as np
+
+from concurrentbuffer.commander import BUFFER_ID_KEY
+from concurrentbuffer.ring import MessageRing
+
+SIZE = 64
+MESSAGE_NBYTES = 1024
+
+
+def _message(index: int) -> list:
+    return [{"index": index, "values": (0.5, 1.5), BUFFER_ID_KEY: index % SIZE}]
+
+
+def _echo(requests, responses, count):
+    for _ in range(count):
+        responses.put(requests.get())
+
+
+def _consume(requests, responses, count):
+    for _ in range(count):
+        requests.get()
+    responses.put(time.perf_counter())
+
+
+def _create_transports(mode, context, manager):
+    if mode == "queue":
+        return context.Queue(maxsize=SIZE), context.Queue(maxsize=SIZE)
+    nbytes = MessageRing.nbytes(size=SIZE, message_nbytes=MESSAGE_NBYTES)
+    return tuple(
+        MessageRing(
+            context=context,
+            buffer=manager.SharedMemory(size=nbytes),
+            size=SIZE,
+            message_nbytes=MESSAGE_NBYTES,
+        )
+        for _ in range(2)
+    )
+
+
+def run(mode: str, context: str, messages: int) -> dict:
+    mp_context = multiprocessing.get_context(context)
+    with SharedMemoryManager() as manager:
+        requests, responses = _create_transports(mode, mp_context, manager)
+        pings = min(messages, 2000)
+        echo = mp_context.Process(target=_echo, args=(requests, responses, pings))
+        echo.start()
+        latencies = []
+        for index in range(pings):
+            start = time.perf_counter()
+            requests.put(_message(index))
+            responses.get()
+            latencies.append((time.perf_counter() - start) / 2)
+        echo.join()
+
+        consumer = mp_context.Process(
+            target=_consume, args=(requests, responses, messages)
+        )
+        consumer.start()
+        start = time.perf_counter()
+        for index in range(messages):
+            requests.put(_message(index))
+        end = responses.get()
+        consumer.join()
+
+    latencies = np.array(latencies) * 1e6
+    return {
+        "mode": mode,
+        "latency_p50_us": float(np.percentile(latencies, 50)),
+        "latency_p99_us": float(np.percentile(latencies, 99)),
+        "messages_per_second": messages / (end - start),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    for mode in ("queue", "ring"):
+        result = run(mode=mode, context=args.context, messages=args.messages)
+        print(
+            f"{result['mode']:>5}: latency p50 {result['latency_p50_us']:7.1f}us"
+            f"  p99 {result['latency_p99_us']:7.1f}us"
+            f"  throughput {result['messages_per_second']:9.0f} messages/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Overhead of the metrics on the throughput of small messages.
+
+The producer fills a small buffer, so the time per item is dominated by the
+framework and the metrics are the largest relative overhead they can be.
+
+    python -m benchmarks.metrics_benchmark --cpus 2 --items 5000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import InPlaceProducer
+
+SHAPES = ((16, 16),)
+
+
+class IndexCommander(Commander):
+    def __init__(self):
+        self._index = 0
+
+    def create_message(self) -> dict:
+        self._index += 1
+        return {"index": self._index}
+
+
+class FillProducer(InPlaceProducer):
+    def create_data_into(self, message: dict, out_arrays):
+        out_arrays[0][:] = message["index"]
+
+
+def run(metrics: bool, context: str, cpus: int, items: int) -> dict:
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=SHAPES,
+        commander=IndexCommander(),
+        producer=FillProducer(),
+        context=context,
+        deterministic=False,
+        buffer_dtype=np.int64,
+        buffer_count=4 * cpus,
+        metrics=metrics,
+    ) as buffer_iterator:
+        next(buffer_iterator)
+        start = time.perf_counter()
+        for _ in range(items):
+            next(buffer_iterator)
+        elapsed = time.perf_counter() - start
+        stats = buffer_iterator.stats() if metrics else None
+
+    return {"metrics": metrics, "items_per_second": items / elapsed, "stats": stats}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=2)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for metrics in (False, True):
+        results = [
+            run(metrics=metrics, context=args.context, cpus=args.cpus, items=args.items)
+            for _ in range(args.repeats)
+        ]
+        best = max(result["items_per_second"] for result in results)
+        label = "metrics" if metrics else "no metrics"
+        print(f"{label:>10}: {best:9.1f} items/s")
+        if metrics:
+            wait = results[-1]["stats"]["consumer"]["wait"]
+            print(
+                f"{'':>10}  consumer wait p50 {wait['p50_seconds'] * 1e6:.1f}us"
+                f"  p99 {wait['p99_seconds'] * 1e6:.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
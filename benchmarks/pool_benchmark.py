@@ -0,0 +1,89 @@
+"""Compares a new iterator for every epoch with iterators of a BufferPool.
+
+Every epoch creates an iterator with a new commander and takes a few
+batches from it. Without a pool every epoch starts the shared memory
+manager, the commander and the producers again.
+
+    python -m benchmarks.pool_benchmark --cpus 4 --epochs 10
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.pool import BufferPool
+from concurrentbuffer.producer import InPlaceProducer
+from concurrentbuffer.system import BufferSystem
+from concurrentbuffer.thread import get_context
+
+SHAPES = ((64, 64, 3),)
+
+
+class EpochCommander(Commander):
+    def __init__(self, epoch: int):
+        self._epoch = epoch
+
+    def create_message(self) -> dict:
+        return {"epoch": self._epoch}
+
+
+class FillProducer(InPlaceProducer):
+    def create_data_into(self, message: dict, out_arrays):
+        out_arrays[0][:] = message["epoch"]
+
+
+def run(pool: bool, context: str, cpus: int, epochs: int, items: int) -> dict:
+    start = time.perf_counter()
+    if pool:
+        buffer_system = BufferSystem(cpus=cpus, context=get_context(context))
+        buffer_info = BufferInfo(shapes=SHAPES, count=2 * cpus)
+        with BufferPool(
+            buffer_system=buffer_system, buffer_info=buffer_info, producer=FillProducer()
+        ) as buffer_pool:
+            for epoch in range(epochs):
+                with buffer_pool.iterator(commander=EpochCommander(epoch)) as buffer_iterator:
+                    for _ in range(items):
+                        assert next(buffer_iterator)[0][0, 0, 0] == epoch
+    else:
+        for epoch in range(epochs):
+            with buffer_iterator_factory(
+                cpus=cpus,
+                buffer_shapes=SHAPES,
+                commander=EpochCommander(epoch),
+                producer=FillProducer(),
+                context=context,
+                deterministic=True,
+                buffer_dtype=np.uint8,
+                buffer_count=2 * cpus,
+            ) as buffer_iterator:
+                for _ in range(items):
+                    assert next(buffer_iterator)[0][0, 0, 0] == epoch
+    return {"pool": pool, "seconds_per_epoch": (time.perf_counter() - start) / epochs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=4)
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--items", type=int, default=20)
+    args = parser.parse_args()
+
+    for pool in (False, True):
+        result = run(
+            pool=pool,
+            context=args.context,
+            cpus=args.cpus,
+            epochs=args.epochs,
+            items=args.items,
+        )
+        label = "pool" if pool else "new iterator"
+        print(f"{label:>12}: {result['seconds_per_epoch'] * 1000:8.1f}ms per epoch")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Throughput of the first batches with and without prefaulting and huge pages.
+
+Until every buffer has been used once, producers and the consumer page-fault
+on its pages. The benchmark reports the time until the first batch, the
+throughput of the first --warmup batches (every buffer is used once) and the
+throughput afterwards, for:
+
+    default       regular pages, faulted on first use
+    prefault      regular pages, touched by every producer and the consumer at startup
+    transparent   prefault with transparent huge pages (needs shmem_enabled=advise)
+    hugetlbfs     prefault with a hugetlbfs mount (needs reserved huge pages)
+
+    python -m benchmarks.prefault_benchmark --cpus 2 --megabytes 32
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.info import HUGETLBFS_HUGE_PAGES, TRANSPARENT_HUGE_PAGES
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.manager import get_hugetlbfs_mount
+from concurrentbuffer.producer import InPlaceProducer
+
+
+class IndexCommander(Commander):
+    def __init__(self):
+        self._index = 0
+
+    def create_message(self) -> dict:
+        self._index += 1
+        return {"index": self._index}
+
+
+class FillProducer(InPlaceProducer):
+    def create_data_into(self, message: dict, out_arrays):
+        out_arrays[0].fill(message["index"])
+
+
+def configurations() -> dict:
+    configurations = {
+        "default": {"prefault": False, "buffer_huge_pages": None},
+        "prefault": {"prefault": True, "buffer_huge_pages": None},
+        "transparent": {"prefault": True, "buffer_huge_pages": TRANSPARENT_HUGE_PAGES},
+    }
+    try:
+        get_hugetlbfs_mount()
+        configurations["hugetlbfs"] = {
+            "prefault": True,
+            "buffer_huge_pages": HUGETLBFS_HUGE_PAGES,
+        }
+    except ValueError:
+        pass
+    return configurations
+
+
+def run(
+    configuration: dict, context: str, cpus: int, megabytes: int, buffers: int, items: int
+) -> dict:
+    shape = (megabytes * 2**20 // 8,)
+    start = time.perf_counter()
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=(shape,),
+        commander=IndexCommander(),
+        producer=FillProducer(),
+        context=context,
+        deterministic=False,
+        buffer_dtype=np.int64,
+        buffer_count=buffers,
+        **configuration,
+    ) as buffer_iterator:
+        local_array = np.empty(shape, dtype=np.int64)
+        np.copyto(local_array, next(buffer_iterator)[0])
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(buffers - 1):
+            np.copyto(local_array, next(buffer_iterator)[0])
+        warmup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(items):
+            np.copyto(local_array, next(buffer_iterator)[0])
+        steady = time.perf_counter() - start
+
+    return {
+        "first_batch_seconds": first,
+        "warmup_batches_per_second": (buffers - 1) / warmup,
+        "steady_batches_per_second": items / steady,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--cpus", type=int, default=2)
+    parser.add_argument("--megabytes", type=int, default=32, help="size of a batch")
+    parser.add_argument("--buffers", type=int, default=16)
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for name, configuration in configurations().items():
+        results = [
+            run(
+                configuration=configuration,
+                context=args.context,
+                cpus=args.cpus,
+                megabytes=args.megabytes,
+                buffers=args.buffers,
+                items=args.items,
+            )
+            for _ in range(args.repeats)
+        ]
+        first = min(result["first_batch_seconds"] for result in results)
+        warmup = max(result["warmup_batches_per_second"] for result in results)
+        steady = max(result["steady_batches_per_second"] for result in results)
+        print(
+            f"{name:>11}: first batch {first * 1e3:8.1f}ms"
+            f"  warmup {warmup:7.1f} batches/s  steady {steady:7.1f} batches/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
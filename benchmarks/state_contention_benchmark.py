@@ -0,0 +1,123 @@
+"""Measures the throughput of the buffer state transitions under contention.
+
+Every worker process repeatedly reserves a free buffer, marks it available,
+takes an available buffer and frees it again, which is the cycle a buffer
+goes through for every batch. The linked-list engine is compared with the
+previous engine that scanned the whole state array for every transition.
+
+    python -m benchmarks.state_contention_benchmark --producers 1 2 4 8 16
+"""
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional
+
+import numpy as np
+
+from concurrentbuffer.state import BufferState, BufferStateMemory
+
+
+class _ScanBufferStateMemory(BufferStateMemory):
+    """The previous engine: a linear scan of the states for every transition"""
+
+    def reset(self):
+        with self.lock:
+            self.get_state_buffer()[:] = BufferState.FREE.value
+
+    def _find_buffer_id_with_state(
+        self, state: BufferState, buffer_id: Optional[int] = None
+    ) -> Optional[int]:
+        buffer_ids = list(np.where(self.get_state_buffer() == state.value)[0])
+        if len(buffer_ids) == 0:
+            return None
+        if buffer_id is not None and buffer_id not in buffer_ids:
+            return None
+        if buffer_id is None:
+            buffer_id = buffer_ids[0]
+        return buffer_id
+
+    def _update_state_buffer(self, buffer_id: int, buffer_state: BufferState):
+        self.get_state_buffer()[buffer_id] = buffer_state.value
+
+
+_ENGINES = {"scan": _ScanBufferStateMemory, "linked": BufferStateMemory}
+
+
+def _worker(buffer_state_memory, start, duration, results):
+    start.wait()
+    cycles = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        buffer_id = buffer_state_memory.get_free_buffer_id()
+        if buffer_id is not None:
+            buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+        buffer_id = buffer_state_memory.get_available_buffer_id()
+        if buffer_id is not None:
+            buffer_state_memory.update_buffer_id_to_free(buffer_id=buffer_id)
+            cycles += 1
+    results.put(cycles)
+
+
+def run(engine: str, producers: int, count: int, duration: float) -> dict:
+    context = multiprocessing.get_context("fork")
+    shared_memory = SharedMemory(
+        create=True, size=BufferStateMemory.nbytes(count=count, dtype=np.uint8)
+    )
+    try:
+        buffer_state_memory = _ENGINES[engine](
+            count=count,
+            dtype=np.dtype("uint8"),
+            lock=context.Condition(),
+            buffer=shared_memory,
+        )
+        start = context.Event()
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=_worker,
+                args=(buffer_state_memory, start, duration, results),
+            )
+            for _ in range(producers)
+        ]
+        for worker in workers:
+            worker.start()
+        start.set()
+        cycles = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    return {
+        "engine": engine,
+        "producers": producers,
+        "cycles_per_second": cycles / duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--producers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--count", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    for producers in args.producers:
+        for engine in _ENGINES:
+            result = run(
+                engine=engine,
+                producers=producers,
+                count=args.count,
+                duration=args.duration,
+            )
+            print(
+                f"{result['producers']:3d} producers {result['engine']:>7}:"
+                f" {result['cycles_per_second']:10.0f} cycles/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Compares busy-spinning with blocking waits on the buffer states.
+
+Reports the cpu time a consumer burns while no buffer is available and the
+latency between a producer marking a buffer available and the consumer
+waking up.
+
+    python -m benchmarks.state_wait_benchmark --context fork
+"""
+
+import argparse
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from concurrentbuffer.state import BufferStateMemory
+
+COUNT = 16
+
+
+def _spin(buffer_state_memory: BufferStateMemory):
+    while True:
+        buffer_id = buffer_state_memory.get_available_buffer_id()
+        if buffer_id is not None:
+            return buffer_id
+
+
+def _wait(buffer_state_memory: BufferStateMemory):
+    return buffer_state_memory.wait_for_available_buffer_id()
+
+
+_MODES = {"spin": _spin, "wait": _wait}
+
+
+def _consumer(mode, buffer_state_memory, repeats, results):
+    take = _MODES[mode]
+    cpu_start = time.process_time()
+    take(buffer_state_memory)
+    results.put(("idle_cpu", time.process_time() - cpu_start))
+
+    for _ in range(repeats):
+        buffer_id = take(buffer_state_memory)
+        results.put(("latency", time.perf_counter()))
+        buffer_state_memory.update_buffer_id_to_free(buffer_id=buffer_id)
+
+
+def run(mode: str, context: str, idle: float, repeats: int) -> dict:
+    mp_context = multiprocessing.get_context(context)
+    shared_memory = SharedMemory(
+        create=True, size=BufferStateMemory.nbytes(count=COUNT, dtype=np.uint8)
+    )
+    try:
+        buffer_state_memory = BufferStateMemory(
+            count=COUNT,
+            dtype=np.dtype("uint8"),
+            lock=mp_context.Condition(),
+            buffer=shared_memory,
+        )
+        results = mp_context.Queue()
+        consumer = mp_context.Process(
+            target=_consumer,
+            args=(mode, buffer_state_memory, repeats, results),
+            daemon=True,
+        )
+        consumer.start()
+
+        # nothing is available, the consumer is idle
+        time.sleep(idle)
+        buffer_state_memory.update_buffer_id_to_available(
+            buffer_id=buffer_state_memory.get_free_buffer_id()
+        )
+        _, idle_cpu = results.get()
+
+        latencies = []
+        for _ in range(repeats):
+            time.sleep(0.005)
+            buffer_id = buffer_state_memory.get_free_buffer_id()
+            start = time.perf_counter()
+            buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+            _, woken = results.get()
+            latencies.append(woken - start)
+
+        consumer.join()
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    latencies = np.array(latencies) * 1e6
+    return {
+        "mode": mode,
+        "idle_cpu_fraction": idle_cpu / idle,
+        "latency_p50_us": float(np.percentile(latencies, 50)),
+        "latency_p99_us": float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--context", default="spawn")
+    parser.add_argument("--idle", type=float, default=2.0)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    for mode in _MODES:
+        result = run(
+            mode=mode, context=args.context, idle=args.idle, repeats=args.repeats
+        )
+        print(
+            f"{result['mode']:>5}: idle cpu {result['idle_cpu_fraction']:6.1%}"
+            f"  wake-up p50 {result['latency_p50_us']:8.1f}us"
+            f"  p99 {result['latency_p99_us']:8.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
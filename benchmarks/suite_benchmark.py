@@ -0,0 +1,278 @@
+"""End-to-end throughput and latency over a grid of configurations.
+
+A synthetic commander draws the time it takes to produce every batch from a
+latency distribution, a synthetic in-place producer waits that long and
+fills every output of the buffer. The consumer takes --items batches and
+spends --consume seconds on each of them, like a training step would.
+
+For every combination of context, cpus, determinism, batch size (the first
+dimension of every output), number of outputs and latency distribution the
+suite reports batches/s, GB/s, the p50 and p99 latency of next() and the
+fraction of the time the consumer was idle (waiting in next()). Results are
+saved as JSON and can be compared with the results of another version:
+
+    python -m benchmarks.suite_benchmark --output results.json
+    python -m benchmarks.suite_benchmark --output new.json --compare results.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import concurrentbuffer
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.iterator import buffer_iterator_factory
+from concurrentbuffer.producer import InPlaceProducer
+
+DISTRIBUTIONS = ("constant", "exponential", "lognormal", "bimodal")
+# configurations are matched on these keys when comparing results
+CONFIG_KEYS = (
+    "context",
+    "cpus",
+    "deterministic",
+    "batch_size",
+    "outputs",
+    "distribution",
+)
+
+
+class SyntheticCommander(Commander):
+    def __init__(self, distribution: str, latency: float, seed: int = 0):
+        self._distribution = distribution
+        self._latency = latency
+        self._seed = seed
+        self._rng = None
+        self._index = 0
+
+    def build(self):
+        self._rng = np.random.default_rng(self._seed)
+
+    def _delay(self) -> float:
+        if self._distribution == "constant":
+            return self._latency
+        if self._distribution == "exponential":
+            return self._rng.exponential(self._latency)
+        if self._distribution == "lognormal":
+            # heavy tail with the same mean
+            sigma = 1.0
+            return self._rng.lognormal(np.log(self._latency) - sigma**2 / 2, sigma)
+        if self._distribution == "bimodal":
+            # one in ten batches is ten times slower, with the same mean
+            slow = self._rng.random() < 0.1
+            return self._latency / 1.9 * (10 if slow else 1)
+        raise ValueError(f"unknown distribution {self._distribution}")
+
+    def create_message(self) -> dict:
+        self._index += 1
+        return {"index": self._index, "delay": self._delay()}
+
+
+class SyntheticProducer(InPlaceProducer):
+    def create_data_into(self, message: dict, out_arrays):
+        time.sleep(message["delay"])
+        for out_array in out_arrays:
+            out_array[:] = message["index"]
+
+
+def run(
+    context: str,
+    cpus: int,
+    deterministic: bool,
+    batch_size: int,
+    outputs: int,
+    distribution: str,
+    shape: tuple,
+    latency: float,
+    consume: float,
+    items: int,
+) -> dict:
+    buffer_shapes = tuple((batch_size, *shape) for _ in range(outputs))
+    batch_nbytes = outputs * batch_size * int(np.prod(shape))
+
+    start = time.perf_counter()
+    with buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=buffer_shapes,
+        commander=SyntheticCommander(distribution=distribution, latency=latency),
+        producer=SyntheticProducer(),
+        context=context,
+        deterministic=deterministic,
+        buffer_dtype=np.uint8,
+        buffer_count=2 * cpus,
+    ) as buffer_iterator:
+        next(buffer_iterator)
+        startup = time.perf_counter() - start
+
+        latencies = np.empty(items, dtype=np.int64)
+        start = time.perf_counter()
+        for item in range(items):
+            next_start = time.perf_counter_ns()
+            next(buffer_iterator)
+            latencies[item] = time.perf_counter_ns() - next_start
+            if consume:
+                time.sleep(consume)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "context": context,
+        "cpus": cpus,
+        "deterministic": deterministic,
+        "batch_size": batch_size,
+        "outputs": outputs,
+        "distribution": distribution,
+        "startup_seconds": startup,
+        "batches_per_second": items / elapsed,
+        "gigabytes_per_second": items * batch_nbytes / elapsed / 1e9,
+        "p50_next_seconds": float(np.percentile(latencies, 50)) / 1e9,
+        "p99_next_seconds": float(np.percentile(latencies, 99)) / 1e9,
+        "consumer_idle_fraction": float(latencies.sum()) / 1e9 / elapsed,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _key(result: dict) -> tuple:
+    return tuple(result[key] for key in CONFIG_KEYS)
+
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Prints the change of every result compared to the baseline and returns the regressions
+
+    Args:
+        results (list): results of this run
+        baseline (dict): saved output of an earlier run
+        tolerance (float): relative loss of throughput or gain in p99 latency that is not a regression
+
+    Returns:
+        list: the keys of the configurations that regressed
+    """
+
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    regressions = []
+    print(f"\ncompared to {baseline.get('version')} ({baseline.get('commit', '')[:12]})")
+    for result in results:
+        old = baseline_results.get(_key(result))
+        if old is None:
+            continue
+        throughput = result["batches_per_second"] / old["batches_per_second"] - 1
+        p99 = result["p99_next_seconds"] / max(old["p99_next_seconds"], 1e-9) - 1
+        # changes of the tail latency below a millisecond are noise
+        regressed = throughput < -tolerance or (
+            p99 > tolerance
+            and result["p99_next_seconds"] - old["p99_next_seconds"] > 1e-3
+        )
+        if regressed:
+            regressions.append(_key(result))
+        print(
+            f"{_label(result)}  batches/s {throughput:+7.1%}  p99 {p99:+7.1%}"
+            f"{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+
+def _label(result: dict) -> str:
+    return (
+        f"{result['context']:>10} cpus {result['cpus']:>2}"
+        f" {'det' if result['deterministic'] else 'any'}"
+        f" batch {result['batch_size']:>4} outputs {result['outputs']}"
+        f" {result['distribution']:>11}"
+    )
+
+
+def _bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    default_contexts = ["spawn"] if sys.platform == "win32" else ["fork", "spawn"]
+    parser.add_argument("--contexts", nargs="+", default=default_contexts)
+    parser.add_argument("--cpus", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--deterministic", nargs="+", type=_bool, default=[True, False])
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[8, 32])
+    parser.add_argument("--outputs", nargs="+", type=int, default=[1, 2])
+    parser.add_argument(
+        "--distributions", nargs="+", choices=DISTRIBUTIONS, default=["constant", "lognormal"]
+    )
+    parser.add_argument("--shape", nargs="+", type=int, default=[64, 64, 3], help="shape of a single item")
+    parser.add_argument("--latency", type=float, default=0.005, help="mean seconds to produce a batch")
+    parser.add_argument("--consume", type=float, default=0.001, help="seconds the consumer spends per batch")
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--output", default=None, help="save the results as JSON")
+    parser.add_argument("--compare", default=None, help="JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = []
+    for context, cpus, deterministic, batch_size, outputs, distribution in itertools.product(
+        args.contexts,
+        args.cpus,
+        args.deterministic,
+        args.batch_sizes,
+        args.outputs,
+        args.distributions,
+    ):
+        result = run(
+            context=context,
+            cpus=cpus,
+            deterministic=deterministic,
+            batch_size=batch_size,
+            outputs=outputs,
+            distribution=distribution,
+            shape=tuple(args.shape),
+            latency=args.latency,
+            consume=args.consume,
+            items=args.items,
+        )
+        results.append(result)
+        print(
+            f"{_label(result)}: {result['batches_per_second']:8.1f} batches/s"
+            f" {result['gigabytes_per_second']:6.3f} GB/s"
+            f"  next p50 {result['p50_next_seconds'] * 1e3:7.2f}ms"
+            f" p99 {result['p99_next_seconds'] * 1e3:7.2f}ms"
+            f"  idle {result['consumer_idle_fraction']:5.1%}"
+        )
+
+    output = {
+        "version": concurrentbuffer.__version__,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "arguments": vars(args),
+        "results": results,
+    }
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(output, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
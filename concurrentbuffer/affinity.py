@@ -0,0 +1,147 @@
+import os
+import threading
+from typing import Dict, Iterable, Optional, Sequence, Set
+
+_NUMA_NODE_PATH = "/sys/devices/system/node"
+# the CPUs of every thread (by native id) before set_cpu_affinity pinned it for the first time
+_original_cpus: Dict[int, Set[int]] = {}
+
+
+def affinity_supported() -> bool:
+    """Returns if the CPUs of a process can be set (Linux only)"""
+    return hasattr(os, "sched_setaffinity")
+
+
+def _parse_cpu_list(cpu_list: str) -> Set[int]:
+    # e.g., '0-3,8-11'
+    cpus = set()
+    for part in cpu_list.strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def get_numa_nodes() -> Dict[int, Set[int]]:
+    """Returns the CPUs of every NUMA node
+
+    Returns:
+        Dict[int, Set[int]]: the CPUs per node, a single node 0 with all available CPUs if the system does not expose NUMA nodes
+    """
+
+    nodes = {}
+    try:
+        names = os.listdir(_NUMA_NODE_PATH)
+    except OSError:
+        names = []
+    for name in names:
+        if not (name.startswith("node") and name[4:].isdigit()):
+            continue
+        with open(os.path.join(_NUMA_NODE_PATH, name, "cpulist")) as cpulist:
+            cpus = _parse_cpu_list(cpulist.read())
+        if cpus:
+            nodes[int(name[4:])] = cpus
+    if not nodes:
+        available = (
+            os.sched_getaffinity(0) if affinity_supported() else range(os.cpu_count() or 1)
+        )
+        nodes[0] = set(available)
+    return nodes
+
+
+def set_cpu_affinity(cpus: Optional[Iterable[int]], thread_id: int = 0):
+    """Restricts a thread (and the threads and processes it starts afterwards) to a set of CPUs
+
+    Args:
+        cpus (Optional[Iterable[int]]): the CPUs, None does nothing
+        thread_id (int, optional): native id of the thread, see threading.get_native_id. Defaults to 0 (the calling thread).
+    """
+
+    if cpus is None:
+        return
+    _original_cpus.setdefault(thread_id or threading.get_native_id(), os.sched_getaffinity(thread_id))
+    os.sched_setaffinity(thread_id, set(cpus))
+
+
+def get_original_cpu_affinity() -> Set[int]:
+    """Returns the CPUs of the calling thread before set_cpu_affinity pinned it for the first time"""
+    return set(_original_cpus.get(threading.get_native_id(), os.sched_getaffinity(0)))
+
+
+class CpuAffinity:
+    """CPUs on which the commander, the producers and the consumer run.
+
+    The buffers are first touched by the consumer after it has been placed,
+    such that with the default first-touch policy of the operating system
+    their pages are allocated on the NUMA node of the consumer.
+    """
+
+    def __init__(
+        self,
+        commander: Optional[Iterable[int]] = None,
+        producers: Optional[Sequence[Iterable[int]]] = None,
+        consumer: Optional[Iterable[int]] = None,
+    ):
+        """Init
+
+        Args:
+            commander (Optional[Iterable[int]], optional): CPUs of the commander. Defaults to None (not restricted).
+            producers (Optional[Sequence[Iterable[int]]], optional): CPUs of every producer, producer i uses producers[i % len(producers)]. Defaults to None (not restricted).
+            consumer (Optional[Iterable[int]], optional): CPUs of the thread that creates the factory. Defaults to None (not restricted).
+
+        Raises:
+            ValueError: an empty set of CPUs
+        """
+
+        self._commander = None if commander is None else frozenset(commander)
+        self._producers = (
+            None if producers is None else tuple(frozenset(cpus) for cpus in producers)
+        )
+        self._consumer = None if consumer is None else frozenset(consumer)
+        if (
+            self._commander == frozenset()
+            or self._consumer == frozenset()
+            or self._producers is not None
+            and (not self._producers or not all(self._producers))
+        ):
+            raise ValueError("every set of CPUs should contain at least one CPU")
+
+    @classmethod
+    def numa_node(cls, node: int, pin_producers: bool = False) -> "CpuAffinity":
+        """Runs everything on the CPUs of a single NUMA node
+
+        Args:
+            node (int): the NUMA node, see get_numa_nodes
+            pin_producers (bool, optional): every producer gets its own CPU of the node (round-robin), instead of all CPUs of the node. Defaults to False.
+
+        Returns:
+            CpuAffinity: the affinity
+        """
+
+        cpus = sorted(get_numa_nodes()[node])
+        return cls(
+            commander=cpus,
+            producers=[[cpu] for cpu in cpus] if pin_producers else [cpus],
+            consumer=cpus,
+        )
+
+    @property
+    def cpus(self) -> frozenset:
+        """All CPUs that are used"""
+        return frozenset().union(
+            self._commander or (), self._consumer or (), *(self._producers or ())
+        )
+
+    @property
+    def commander(self) -> Optional[frozenset]:
+        return self._commander
+
+    def producer(self, index: int) -> Optional[frozenset]:
+        if self._producers is None:
+            return None
+        return self._producers[index % len(self._producers)]
+
+    @property
+    def consumer(self) -> Optional[frozenset]:
+        return self._consumer
@@ -0,0 +1,154 @@
+import threading
+from multiprocessing import ProcessError, Queue
+from multiprocessing.context import assert_spawning
+from multiprocessing.synchronize import Event
+from typing import List, Optional
+
+from concurrentbuffer.memory import BufferMemory
+from concurrentbuffer.metrics import BufferMetrics
+from concurrentbuffer.notify import AvailableNotifier
+from concurrentbuffer.process import ProducerError
+from concurrentbuffer.state import BufferState, BufferStateMemory
+from concurrentbuffer.system import BufferSystem
+
+
+def pop_error(error_queue: Queue, sequence: int) -> ProducerError:
+    """Returns the error of data that failed to be produced from a queue that is shared by all consumers
+
+    Args:
+        error_queue (Queue): receives (sequence, ProducerError)
+        sequence (int): sequence number of a buffer that is marked as failed, its error has been send before
+
+    Returns:
+        ProducerError: the error with the traceback of the producer
+    """
+
+    while True:
+        error_sequence, error = error_queue.get()
+        if error_sequence == sequence:
+            return error
+        # the error of another consumer (thread or process)
+        error_queue.put((error_sequence, error))
+
+
+class BufferAttachment:
+    """Everything a consumer needs to get data from the buffers of a running factory in another process, see BufferFactory.attachment
+
+    The attachment is passed to a process that is started with the context of
+    the factory (e.g., as an argument of a Process, one for every GPU),
+    because the locks can only be shared between processes through
+    inheritance. The buffers are attached by the name of their shared memory,
+    no data is copied. It is used like the factory:
+    BufferIterator(buffer_factory=attachment, consumer=1, consumers=2).
+
+    The process of the factory checks for producer processes that died and
+    respawns them (also while its own consumers do not wait for data), and it
+    shuts the factory down. Stop only releases the buffers of the consumer.
+    When the factory stopped, or one of its processes died such that it can
+    not continue, the consumer raises a ProcessError instead of waiting.
+    """
+
+    def __init__(
+        self,
+        buffer_system: BufferSystem,
+        buffer_state_memory: BufferStateMemory,
+        buffer_memories: List[BufferMemory],
+        error_queue: Queue,
+        stopped_event: Event,
+        available_notifier: Optional[AvailableNotifier] = None,
+        metrics: Optional[BufferMetrics] = None,
+    ):
+        """Init
+
+        Args:
+            buffer_system (BufferSystem): the system information of the factory
+            buffer_state_memory (BufferStateMemory): the states of the buffers
+            buffer_memories (List[BufferMemory]): the buffers
+            error_queue (Queue): the errors of data that failed to be produced
+            stopped_event (Event): set when the factory stopped or can not continue
+            available_notifier (Optional[AvailableNotifier], optional): notified for every buffer that became available. Defaults to None.
+            metrics (Optional[BufferMetrics], optional): metrics of the factory. Defaults to None.
+        """
+
+        self._buffer_system = buffer_system
+        self._buffer_state_memory = buffer_state_memory
+        self._buffer_memories = buffer_memories
+        self._error_queue = error_queue
+        self._stopped_event = stopped_event
+        self._available_notifier = available_notifier
+        self._metrics = metrics
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # the locks of the states can not be send to a running process
+        assert_spawning(self)
+        # consumers in multiple threads of a process share the lock of that process
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def buffer_system(self) -> BufferSystem:
+        return self._buffer_system
+
+    @property
+    def buffer_state_memory(self) -> BufferStateMemory:
+        return self._buffer_state_memory
+
+    @property
+    def buffer_memories(self) -> List[BufferMemory]:
+        return self._buffer_memories
+
+    @property
+    def available_notifier(self) -> Optional[AvailableNotifier]:
+        return self._available_notifier
+
+    @property
+    def metrics(self) -> Optional[BufferMetrics]:
+        return self._metrics
+
+    def stats(self) -> dict:
+        """Returns the metrics of all workers, see BufferFactory.stats
+
+        Raises:
+            ValueError: metrics are not enabled in the BufferSystem
+
+        Returns:
+            dict: the stats
+        """
+
+        if self._metrics is None:
+            raise ValueError("metrics are not enabled, use BufferSystem(metrics=True)")
+        return self._metrics.stats(
+            states={
+                state.name.lower(): self._buffer_state_memory.get_buffer_count_with_state(state)
+                for state in BufferState
+            }
+        )
+
+    def pop_error(self, sequence: int) -> ProducerError:
+        """Returns the error of data that failed to be produced, see pop_error"""
+        with self._lock:
+            return pop_error(error_queue=self._error_queue, sequence=sequence)
+
+    def check_producer_processes(self):
+        """Producer processes are checked by the process of the factory, see BufferFactory.check_producer_processes
+
+        Raises:
+            ProcessError: the factory stopped or one of its processes died such that it can not continue
+        """
+
+        if self._stopped_event.is_set():
+            raise ProcessError(
+                "the factory of the attachment stopped or one of its processes died, see the process of the factory"
+            )
+
+    def detach(self):
+        """The factory is stopped by its own process"""
+
+    def shutdown(self, timeout: float = 0.0):
+        """The factory is shut down by its own process"""
@@ -1,7 +1,6 @@
 import sys
 from abc import abstractmethod
 from multiprocessing import Queue
-from multiprocessing.connection import Connection
 
 WINDOWS = sys.platform == "win32"
 
@@ -9,19 +8,36 @@ if not WINDOWS:
     from multiprocessing.context import (
         ForkContext,
         ForkProcess,
+        ForkServerContext,
+        ForkServerProcess,
         SpawnContext,
         SpawnProcess,
     )
 else:
     from multiprocessing.context import SpawnContext, SpawnProcess
 
-from typing import Optional
+import time
+import traceback
+from multiprocessing.synchronize import Event
+from threading import Thread
+from typing import Iterable, List, Optional, Union
 
-from concurrentbuffer.process import SubProcessObject
-from concurrentbuffer.state import BufferStateMemory
+from concurrentbuffer.affinity import set_cpu_affinity
+from concurrentbuffer.metrics import WorkerMetrics
+from concurrentbuffer.process import ProducerError, SubProcessObject
+from concurrentbuffer.ring import MessageRing
+from concurrentbuffer.state import BufferState, BufferStateMemory
+from concurrentbuffer.system import SPECULATE_STRAGGLERS
+from concurrentbuffer.thread import ThreadContext
 
 STOP_MESSAGE = "/stop"
 BUFFER_ID_KEY = "/buffer_id"
+# a commander can set the deadline in seconds of a message with this key, see BufferSystem.message_timeout
+TIMEOUT_KEY = "/timeout"
+# the (sequence, generation) of the reservation of a speculative duplicate message
+RESERVATION_KEY = "/reservation"
+# maximum time in seconds the commander waits for free buffers before it checks if it is stopped
+STOP_POLL_INTERVAL = 0.05
 
 
 class Commander(SubProcessObject):
@@ -35,6 +51,17 @@ class Commander(SubProcessObject):
             dict: the message that contains instructions on how to create data
         """
 
+    def create_messages(self, count: int) -> List[dict]:
+        """This method creates multiple messages at once, override it when messages can be created more efficiently in a batch.
+
+        Args:
+            count (int): number of messages
+
+        Returns:
+            List[dict]: the messages
+        """
+        return [self.create_message() for _ in range(count)]
+
 
 class CommanderProcess:
     """Process that sends messages with information on how to create new data"""
@@ -43,15 +70,31 @@ class CommanderProcess:
         self,
         commander: Commander,
         buffer_state_memory: BufferStateMemory,
-        message_queue: Queue,
-        buffer_id_sender: Optional[Connection],
+        message_queue: Union[Queue, MessageRing],
+        message_batch_size: int = 1,
+        stop_event: Optional[Event] = None,
+        idle_event: Optional[Event] = None,
+        commander_queue: Optional[Queue] = None,
+        straggler_policy: Optional[str] = None,
+        error_queue: Optional[Queue] = None,
+        metrics: Optional[WorkerMetrics] = None,
+        cpu_affinity: Optional[Iterable[int]] = None,
+        exception_queue: Optional[Queue] = None,
     ):
         """Init
 
         Args:
             buffer_state_memory (BufferStateMemory): contains the states of the buffers
-            message_queue (Queue): queue that is used to send information on how to create data
-            buffer_id_sender (Optional[Connection]): connection that is used to send the buffer_id, used to ensure determinstic behaviour.
+            message_queue (Union[Queue, MessageRing]): queue that is used to send batches of messages on how to create data
+            message_batch_size (int, optional): maximum number of messages that are reserved, created and send at once. Defaults to 1.
+            stop_event (Optional[Event], optional): when set, the commander stops after its current batch of messages, see stop. Defaults to None (can only be terminated).
+            idle_event (Optional[Event], optional): set when the commander stopped, see wait_until_stopped. Defaults to None.
+            commander_queue (Optional[Queue], optional): after a stop, the process waits for the next commander on this queue instead of exiting, see restart. Defaults to None.
+            straggler_policy (Optional[str], optional): what happens with messages past their deadline, see BufferSystem.straggler_policy. Defaults to None (deadlines are not checked).
+            error_queue (Optional[Queue], optional): receives (sequence, ProducerError) of messages that failed their deadline. Defaults to None.
+            metrics (Optional[WorkerMetrics], optional): counts the messages, times create_messages and samples the states for every batch. Defaults to None.
+            cpu_affinity (Optional[Iterable[int]], optional): CPUs the process runs on. Defaults to None (not restricted).
+            exception_queue (Optional[Queue], optional): receives the traceback of an exception of the commander (e.g., in create_messages) after which the process exits, see BufferFactory.check_producer_processes. Defaults to None (the process raises).
         """
 
         super().__init__()
@@ -60,22 +103,142 @@ class CommanderProcess:
         self._commander = commander
         self._buffer_state_memory = buffer_state_memory
         self._message_queue = message_queue
-        self._buffer_id_sender = buffer_id_sender
+        self._message_batch_size = message_batch_size
+        self._stop_event = stop_event
+        self._idle_event = idle_event
+        self._commander_queue = commander_queue
+        self._straggler_policy = straggler_policy
+        self._error_queue = error_queue
+        self._metrics = metrics
+        self._cpu_affinity = cpu_affinity
+        self._exception_queue = exception_queue
+        # the message of every reserved buffer, needed for speculative duplicates
+        self._messages = {}
 
     def run(self):
-        self._commander.build()
-        while True:
-            buffer_id = self._buffer_state_memory.get_free_buffer_id()
-            if buffer_id is None:
-                continue
-            self._message(buffer_id)
+        set_cpu_affinity(self._cpu_affinity)
+        try:
+            self._run_commanders()
+        except Exception:
+            if self._exception_queue is None:
+                raise
+            self._exception_queue.put(traceback.format_exc())
+
+    def _run_commanders(self):
+        while self._commander is not None:
+            self._commander.build()
+            self._send_messages()
+            self._commander.teardown()
+            if self._idle_event is not None:
+                self._idle_event.set()
+            if self._commander_queue is None:
+                return
+            # None exits the process
+            self._commander = self._commander_queue.get()
+
+    def _send_messages(self):
+        wait_timeout = None if self._stop_event is None else STOP_POLL_INTERVAL
+        while not self._stopped():
+            buffer_ids = self._buffer_state_memory.wait_for_free_buffer_ids(
+                max_count=self._message_batch_size, timeout=wait_timeout
+            )
+            if buffer_ids:
+                self._message(buffer_ids)
+            if self._straggler_policy is not None:
+                self._handle_stragglers()
+
+    def _handle_stragglers(self):
+        buffer_state_memory = self._buffer_state_memory
+        for buffer_id in buffer_state_memory.get_expired_buffer_ids():
+            message = self._messages[buffer_id]
+            # only the commander reserves buffers, so the reservation can not change meanwhile
+            sequence = buffer_state_memory.get_sequence(buffer_id=buffer_id)
+            generation = buffer_state_memory.get_generation()
+            if (
+                self._straggler_policy == SPECULATE_STRAGGLERS
+                and not buffer_state_memory.is_speculated(buffer_id=buffer_id)
+            ):
+                buffer_state_memory.update_buffer_id_to_speculated(buffer_id=buffer_id)
+                if self._metrics is not None:
+                    self._metrics.count("speculated")
+                self._message_queue.put(
+                    [{**message, RESERVATION_KEY: (sequence, generation)}]
+                )
+            elif buffer_state_memory.claim_buffer_id(
+                buffer_id=buffer_id, sequence=sequence, generation=generation
+            ):
+                # the error is send before the buffer is failed, such that the consumer finds it
+                self._error_queue.put(
+                    (
+                        sequence,
+                        ProducerError(
+                            message=message,
+                            remote_traceback="the message was not produced before its deadline",
+                        ),
+                    )
+                )
+                buffer_state_memory.update_buffer_id_to_failed(buffer_id=buffer_id)
+
+    def _stopped(self) -> bool:
+        return self._stop_event is not None and self._stop_event.is_set()
+
+    def stop(self):
+        """Lets the commander stop after its current batch of messages, see wait_until_stopped"""
+        self._stop_event.set()
+
+    def wait_until_stopped(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the commander stopped sending messages
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: False if the timeout expired
+        """
+        if self._idle_event is None:
+            self.join(timeout)
+            return not self.is_alive()
+        return self._idle_event.wait(timeout)
+
+    def restart(self, commander: Commander):
+        """Starts sending messages of a new commander after the process stopped
 
-    def _message(self, buffer_id, *args, **kwargs):
-        message = self._commander.create_message(*args, **kwargs)
-        message[BUFFER_ID_KEY] = buffer_id
-        self._message_queue.put(message)
-        if self._buffer_id_sender is not None:
-            self._buffer_id_sender.send(buffer_id)
+        Args:
+            commander (Commander): the new commander
+        """
+        self._idle_event.clear()
+        self._stop_event.clear()
+        self._commander_queue.put(commander)
+
+    def exit(self):
+        """Lets the process exit after the commander stopped, wait for it with join"""
+        self.stop()
+        if self._commander_queue is not None:
+            self._commander_queue.put(None)
+
+    def _message(self, buffer_ids: List[int]):
+        if self._metrics is not None:
+            self._sample(len(buffer_ids))
+            start = time.perf_counter_ns()
+            messages = self._commander.create_messages(len(buffer_ids))
+            self._metrics.record("create_messages", start)
+        else:
+            messages = self._commander.create_messages(len(buffer_ids))
+        for buffer_id, message in zip(buffer_ids, messages):
+            message[BUFFER_ID_KEY] = buffer_id
+            if self._straggler_policy is not None:
+                self._messages[buffer_id] = message
+        self._message_queue.put(messages)
+
+    def _sample(self, count: int):
+        self._metrics.count("messages", count)
+        self._metrics.count("batches")
+        self._metrics.count("state_samples")
+        for state in BufferState:
+            self._metrics.count(
+                state.name.lower(),
+                self._buffer_state_memory.get_buffer_count_with_state(state),
+            )
 
 
 class CommanderSpawnProcess(CommanderProcess, SpawnProcess):
@@ -86,6 +249,18 @@ class CommanderSpawnProcess(CommanderProcess, SpawnProcess):
         CommanderProcess.__init__(self, *args, **kwargs)
 
 
+class CommanderThread(CommanderProcess, Thread):
+    """Commander class based on a thread of the current process"""
+
+    def __init__(self, *args, **kwargs):
+        Thread.__init__(self)
+        CommanderProcess.__init__(self, *args, **kwargs)
+
+    def terminate(self):
+        """Threads can not be killed, the commander exits after its current batch of messages"""
+        self.exit()
+
+
 if not WINDOWS:
 
     class CommanderForkProcess(CommanderProcess, ForkProcess):
@@ -95,14 +270,24 @@ if not WINDOWS:
             ForkProcess.__init__(self)
             CommanderProcess.__init__(self, *args, **kwargs)
 
+    class CommanderForkServerProcess(CommanderProcess, ForkServerProcess):
+        """Commander class based on multiprocessing forkserver context process"""
+
+        def __init__(self, *args, **kwargs):
+            ForkServerProcess.__init__(self)
+            CommanderProcess.__init__(self, *args, **kwargs)
+
     _concrete_context_processes = {
         ForkContext: CommanderForkProcess,
+        ForkServerContext: CommanderForkServerProcess,
         SpawnContext: CommanderSpawnProcess,
+        ThreadContext: CommanderThread,
     }
 else:
 
     _concrete_context_processes = {
         SpawnContext: CommanderSpawnProcess,
+        ThreadContext: CommanderThread,
     }
 
 
@@ -110,13 +295,13 @@ def get_commander_process_class_object(context) -> type:
     """Factory function for creating a process class object based on a specific context
 
     Args:
-        context (type): type of context (should be either ForkContext or SpawnContext)
+        context (type): type of context (should be either ForkContext, ForkServerContext, SpawnContext or ThreadContext)
 
     Raises:
         ValueError: context was not found in supported context processes
 
     Returns:
-        type: producer process with specific context (either CommanderForkProcess or CommanderSpawnProcess)
+        type: commander process with specific context (either CommanderForkProcess, CommanderForkServerProcess, CommanderSpawnProcess or CommanderThread)
     """
 
     try:
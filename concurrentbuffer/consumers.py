@@ -0,0 +1,105 @@
+import asyncio
+from typing import Iterator, List
+
+from concurrentbuffer.factory import BufferFactory
+from concurrentbuffer.iterator import BufferIterator
+from concurrentbuffer.system import ROUND_ROBIN_DELIVERY
+
+
+class ConsumerGroup:
+    """Independent consumers of the data of a single factory, e.g., a thread per GPU
+
+    Every consumer is a BufferIterator that tracks (and frees) its own
+    buffers. With ROUND_ROBIN_DELIVERY consumer i gets the sequences with
+    sequence % consumers == i, in deterministic mode in order, such that the
+    consumers together see every sequence exactly once. A consumer that falls
+    behind holds on to the buffers of its sequences, so eventually the others
+    wait for it. With LOAD_BALANCED_DELIVERY the next data goes to the
+    consumer that asks first.
+
+    The consumers can be used from different threads. Stopping a consumer only
+    releases its last buffer, stopping the group stops the factory.
+    """
+
+    def __init__(
+        self,
+        buffer_factory: BufferFactory,
+        consumers: int,
+        delivery: str = ROUND_ROBIN_DELIVERY,
+        consumer_class: type = BufferIterator,
+        shutdown_factory: bool = True,
+        **kwargs
+    ):
+        """Init
+
+        Args:
+            buffer_factory (BufferFactory): factory in which all the components have been created
+            consumers (int): number of consumers
+            delivery (str, optional): how data is divided over the consumers, ROUND_ROBIN_DELIVERY or LOAD_BALANCED_DELIVERY, see BufferIterator. Defaults to ROUND_ROBIN_DELIVERY.
+            consumer_class (type, optional): class of the consumers, e.g., AsyncBufferIterator. Defaults to BufferIterator.
+            shutdown_factory (bool, optional): stop shuts the factory down, otherwise it only detaches the commander, see BufferIterator. Defaults to True.
+
+        Other keyword arguments are passed to every consumer (e.g., copy or auto_free_buffer).
+
+        Raises:
+            ValueError: less than one consumer
+        """
+
+        if consumers < 1:
+            raise ValueError(f"consumers should be >= 1, got {consumers}")
+
+        self._buffer_factory = buffer_factory
+        self._shutdown_factory = shutdown_factory
+        self._consumers = [
+            consumer_class(
+                buffer_factory=buffer_factory,
+                shutdown_factory=False,
+                consumer=consumer,
+                consumers=consumers,
+                delivery=delivery,
+                **kwargs
+            )
+            for consumer in range(consumers)
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __len__(self) -> int:
+        return len(self._consumers)
+
+    def __getitem__(self, consumer: int) -> BufferIterator:
+        return self._consumers[consumer]
+
+    def __iter__(self) -> Iterator[BufferIterator]:
+        return iter(self._consumers)
+
+    @property
+    def buffer_factory(self) -> BufferFactory:
+        return self._buffer_factory
+
+    @property
+    def consumers(self) -> List[BufferIterator]:
+        return self._consumers
+
+    def stats(self) -> dict:
+        """Returns the metrics of the commander, the producers and the consumers, see BufferFactory.stats"""
+        return self._buffer_factory.stats()
+
+    def stop(self, timeout: float = 0.0):
+        """Shuts the factory down or detaches the commander, see shutdown_factory
+
+        Args:
+            timeout (float, optional): see BufferFactory.shutdown. Defaults to 0.0.
+        """
+
+        if self._shutdown_factory:
+            self._buffer_factory.shutdown(timeout=timeout)
+        else:
+            self._buffer_factory.detach()
+
+    async def async_stop(self, timeout: float = 0.0):
+        await asyncio.get_running_loop().run_in_executor(None, self.stop, timeout)
@@ -1,24 +1,60 @@
-import multiprocessing
-from typing import List
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+from multiprocessing import ProcessError
+from typing import List, Optional, Sequence
 
 import numpy as np
 
+from concurrentbuffer.affinity import get_original_cpu_affinity, set_cpu_affinity
+from concurrentbuffer.attachment import BufferAttachment, pop_error
 from concurrentbuffer.commander import (
+    BUFFER_ID_KEY,
     STOP_MESSAGE,
     Commander,
     CommanderProcess,
     get_commander_process_class_object,
 )
 from concurrentbuffer.info import BufferInfo
-from concurrentbuffer.manager import SharedBufferManager
+from concurrentbuffer.manager import LocalBufferManager, SharedBufferManager
 from concurrentbuffer.memory import BufferMemory
+from concurrentbuffer.metrics import BufferMetrics
+from concurrentbuffer.notify import AvailableNotifier
+from concurrentbuffer.process import CommanderError
 from concurrentbuffer.producer import (
+    CONFIGURE_MESSAGE,
+    NO_BUFFER_ID,
+    RESERVATION_FIELDS,
     Producer,
+    ProducerError,
     ProducerProcess,
     get_producer_process_class_object,
 )
+from concurrentbuffer.ring import MessageRing
 from concurrentbuffer.state import BufferState, BufferStateMemory
-from concurrentbuffer.system import BufferSystem
+from concurrentbuffer.system import (
+    FAIL_STRAGGLERS,
+    QUEUE_TRANSPORT,
+    RAISE_ERRORS,
+    SHARED_MEMORY_TRANSPORT,
+    BufferSystem,
+)
+from concurrentbuffer.thread import ThreadContext, get_context
+from concurrentbuffer.tuning import get_buffer_count
+
+WINDOWS = sys.platform == "win32"
+
+if not WINDOWS:
+    from multiprocessing.context import ForkServerContext
+
+# maximum time in seconds between checks for producer processes that died while waiting for data
+PRODUCER_CHECK_INTERVAL = 1.0
+
+# number of times in a row a producer process is respawned that died before its producer was built (e.g., build always raises)
+MAX_FAILED_STARTS = 3
 
 # use spawn with pickable object
 # use spawn with build function
@@ -48,6 +84,7 @@ class BufferFactory:
         self._buffer_info = buffer_info
         self._commander = commander
         self._producer = producer
+        self._buffer_shapes = buffer_info.shapes
 
         self._commander_process_class = get_commander_process_class_object(
             buffer_system.context
@@ -56,21 +93,53 @@ class BufferFactory:
             buffer_system.context
         )
 
-        self._message_queue = self._buffer_system.context.Queue(
-            maxsize=self._buffer_info.count
+        self._lock = self._buffer_system.context.Condition()
+        self._configure_barrier = self._buffer_system.context.Barrier(
+            self._buffer_system.cpus
         )
-        self._receiver, self._sender = (
-            self._buffer_system.context.Pipe()
-            if self._buffer_system.deterministic
-            else (None, None)
+        # configurations do not fit in the slots of a message ring
+        self._configure_queue = self._buffer_system.context.Queue()
+        self._available_notifier = (
+            AvailableNotifier(context=self._buffer_system.context)
+            if self._buffer_system.notify_available
+            else None
         )
-        self._lock = self._buffer_system.context.Lock()
-
+        self._error_queue = self._buffer_system.context.Queue()
+        # consumers in multiple threads share the errors and check the producers
+        self._consumers_lock = threading.RLock()
+        self._producer_reservations = self._buffer_system.context.Array(
+            "q",
+            [NO_BUFFER_ID]
+            * (
+                RESERVATION_FIELDS
+                * self._buffer_system.cpus
+                * self._buffer_system.message_batch_size
+            ),
+            lock=False,
+        )
+        self._producer_started = self._buffer_system.context.Array(
+            "i", [0] * self._buffer_system.cpus, lock=False
+        )
+        self._failed_starts = [0] * self._buffer_system.cpus
+        self._commander_exceptions = self._buffer_system.context.Queue()
+        self._commander_error = None
+        # checks the processes for consumers in other processes, see attachment
+        self._watchdog = None
+        self._watchdog_stop = threading.Event()
+        self._stopped_event = None
+        # the CPUs of the thread of the consumer before it was pinned, see _init_affinity
+        self._consumer_cpus = None
+
+        self._init_forkserver_preload()
         self._init_shared_buffer_manager()
+        self._init_metrics()
+        self._init_message_queue()
         self._init_buffer_state_memory()
         self._init_buffer_memory()
+        self._init_affinity()
         self._init_message_process()
         self._init_producer_processes()
+        self._init_prefault()
 
     @property
     def buffer_system(self) -> BufferSystem:
@@ -85,23 +154,135 @@ class BufferFactory:
         return self._buffer_memories
 
     @property
-    def receiver(self):
-        return self._receiver
+    def available_notifier(self) -> Optional[AvailableNotifier]:
+        return self._available_notifier
 
     @property
-    def sender(self):
-        return self._sender
+    def metrics(self) -> Optional[BufferMetrics]:
+        return self._metrics
+
+    def attachment(self) -> BufferAttachment:
+        """Returns a token with which a process started with the context of the factory consumes from its buffers, see BufferAttachment
+
+        Raises:
+            ValueError: the producers are threads, their buffers are memory of the current process
+
+        Returns:
+            BufferAttachment: the attachment
+        """
+
+        if isinstance(self._buffer_system.context, ThreadContext):
+            raise ValueError("buffers of a ThreadContext can not be attached from another process")
+        self._start_watchdog()
+        return BufferAttachment(
+            buffer_system=self._buffer_system,
+            buffer_state_memory=self._buffer_state_memory,
+            buffer_memories=self._buffer_memories,
+            error_queue=self._error_queue,
+            stopped_event=self._stopped_event,
+            available_notifier=self._available_notifier,
+            metrics=self._metrics,
+        )
+
+    def _start_watchdog(self):
+        # attached consumers do not check the processes, a thread of this process does it for them
+        if self._watchdog is not None:
+            return
+        self._stopped_event = self._buffer_system.context.Event()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        while not self._watchdog_stop.wait(PRODUCER_CHECK_INTERVAL):
+            try:
+                self.check_producer_processes()
+            except ProcessError:
+                # raised again for the consumers of this process when they check
+                self._stopped_event.set()
+                return
+
+    def stats(self) -> dict:
+        """Returns the metrics of all workers and the current number of buffers per state, see BufferMetrics.stats
+
+        Raises:
+            ValueError: metrics are not enabled in the BufferSystem
+
+        Returns:
+            dict: the stats
+        """
+
+        if self._metrics is None:
+            raise ValueError("metrics are not enabled, use BufferSystem(metrics=True)")
+        return self._metrics.stats(
+            states={
+                state.name.lower(): self._buffer_state_memory.get_buffer_count_with_state(state)
+                for state in BufferState
+            }
+        )
+
+    def _init_forkserver_preload(self):
+        if WINDOWS or not isinstance(self._buffer_system.context, ForkServerContext):
+            return
+        # has no effect when the server of the context already started, only imports are preloaded (build runs in every process)
+        modules = [
+            "concurrentbuffer.commander",
+            "concurrentbuffer.producer",
+            type(self._commander).__module__,
+            type(self._producer).__module__,
+            *self._buffer_system.preload_modules,
+        ]
+        self._buffer_system.context.set_forkserver_preload(list(dict.fromkeys(modules)))
 
     def _init_shared_buffer_manager(self):
-        self._shared_buffer_manager = SharedBufferManager(buffer_info=self._buffer_info)
+        buffer_manager_class = (
+            LocalBufferManager
+            if isinstance(self._buffer_system.context, ThreadContext)
+            else SharedBufferManager
+        )
+        self._shared_buffer_manager = buffer_manager_class(buffer_info=self._buffer_info)
         self._shared_buffer_manager.start()
 
+    def _init_metrics(self):
+        self._metrics = None
+        if self._buffer_system.metrics:
+            # every consumer holds a buffer, so there are at most as many consumers as buffers
+            self._metrics = BufferMetrics(
+                cpus=self._buffer_system.cpus,
+                buffer=self._shared_buffer_manager.SharedMemory(
+                    size=BufferMetrics.nbytes(
+                        self._buffer_system.cpus, consumers=self._buffer_info.count
+                    )
+                ),
+                consumers=self._buffer_info.count,
+            )
+
+    def _init_message_queue(self):
+        transport = self._buffer_system.message_transport
+        if transport == QUEUE_TRANSPORT:
+            self._message_queue = self._buffer_system.context.Queue(
+                maxsize=self._buffer_info.count
+            )
+        elif transport == SHARED_MEMORY_TRANSPORT:
+            nbytes = MessageRing.nbytes(
+                size=self._buffer_info.count,
+                message_nbytes=self._buffer_system.message_nbytes,
+            )
+            self._message_queue = MessageRing(
+                context=self._buffer_system.context,
+                buffer=self._shared_buffer_manager.SharedMemory(size=nbytes),
+                size=self._buffer_info.count,
+                message_nbytes=self._buffer_system.message_nbytes,
+            )
+        else:
+            raise ValueError(f"unknown message transport {transport}")
+
     def _init_buffer_state_memory(self):
         self._buffer_state_memory = BufferStateMemory(
             count=self._buffer_info.count,
             dtype=np.dtype("uint8"),
             lock=self._lock,
-            buffer=self._shared_buffer_manager.state_buffer,
+            buffer=self._shared_buffer_manager.arena,
+            offset=self._shared_buffer_manager.layout.state_offset,
         )
 
     def _init_buffer_memory(self):
@@ -109,63 +290,361 @@ class BufferFactory:
         for idx in range(len(self._buffer_info)):
             self._buffer_memories.append(
                 BufferMemory(
-                    shape=self._buffer_info.shapes[idx],
-                    dtype=self._buffer_info.dtype,
-                    buffers=self._shared_buffer_manager.buffers[idx],
+                    shape=self._buffer_shapes[idx],
+                    dtype=self._buffer_info.dtypes[idx],
+                    buffer=self._shared_buffer_manager.arena,
+                    offsets=self._shared_buffer_manager.layout.offsets[idx],
+                    header_offsets=self._shared_buffer_manager.layout.header_offsets[
+                        idx
+                    ],
                 )
             )
 
+    def _init_affinity(self):
+        affinity = self._buffer_system.affinity
+        if affinity is None:
+            return
+        # processes and threads inherit the CPUs of the consumer, those without affinity get the original CPUs back
+        self._default_cpus = get_original_cpu_affinity()
+        # the thread of the consumer gets its CPUs back at shutdown
+        self._consumer_thread_id = threading.get_native_id()
+        self._consumer_cpus = os.sched_getaffinity(0)
+        set_cpu_affinity(affinity.consumer)
+        self._touch_buffers()
+
+    def _touch_buffers(self):
+        # first touch: the pages of the buffers are allocated on the NUMA node of the consumer
+        for buffer_id in range(self._buffer_info.count):
+            for buffer_memory in self._buffer_memories:
+                buffer_memory.touch(buffer_id=buffer_id)
+
+    def _cpu_affinity(self, cpus: Optional[frozenset]) -> Optional[frozenset]:
+        if self._buffer_system.affinity is None:
+            return None
+        return self._default_cpus if cpus is None else cpus
+
     def _init_message_process(self):
         self._message_process = self._create_commander_process()
         self._message_process.start()
+        self._attached = True
 
     def _init_producer_processes(self):
         self._producer_processes = self._create_producer_processes()
         for producer_process in self._producer_processes:
             producer_process.start()
 
-    def shutdown(self):
-        # sending stop messages to queues
+    def _init_prefault(self):
+        # the producers touch the buffers in parallel, the consumer maps them meanwhile (already done with affinity)
+        if self._buffer_system.prefault and self._buffer_system.affinity is None:
+            self._touch_buffers()
+
+    def pop_error(self, sequence: int) -> ProducerError:
+        """Returns the error of data that failed to be produced
+
+        Args:
+            sequence (int): sequence number of a buffer that is marked as failed
+
+        Returns:
+            ProducerError: the error with the traceback of the producer
+        """
+
+        # the error is send before the buffer is marked as failed
+        with self._consumers_lock:
+            return pop_error(error_queue=self._error_queue, sequence=sequence)
+
+    def check_producer_processes(self):
+        """Checks the commander, fails the buffers of producer processes that died and respawns them
+
+        Raises:
+            CommanderError: the commander process stopped, e.g., create_messages raised
+            ProcessError: a producer process died and respawn is disabled, or it died MAX_FAILED_STARTS times in a row before its producer was built
+        """
+
+        with self._consumers_lock:
+            self._check_commander_process()
+            for index, producer_process in enumerate(self._producer_processes):
+                if producer_process.is_alive():
+                    continue
+                exitcode = getattr(producer_process, "exitcode", None)
+                self._fail_producer_buffer_ids(index=index, exitcode=exitcode)
+                if not self._buffer_system.respawn:
+                    raise ProcessError(
+                        f"producer process {index} died with exit code {exitcode}"
+                    )
+                self._count_failed_start(index=index, exitcode=exitcode)
+                producer_process.join()
+                self._producer_started[index] = 0
+                self._producer_processes[index] = self._create_producer_process(index)
+                self._producer_processes[index].start()
+
+    def _check_commander_process(self):
+        # the commander process only exits by itself when the commander raised
+        if self._commander_error is None and not self._message_process.is_alive():
+            exitcode = getattr(self._message_process, "exitcode", None)
+            try:
+                remote_traceback = self._commander_exceptions.get(
+                    timeout=PRODUCER_CHECK_INTERVAL
+                )
+            except queue.Empty:
+                remote_traceback = f"commander process died with exit code {exitcode}"
+            self._commander_error = CommanderError(remote_traceback=remote_traceback)
+        if self._commander_error is not None:
+            raise self._commander_error
+
+    def _count_failed_start(self, index: int, exitcode: Optional[int]):
+        # a producer that can not be built would be respawned forever
+        if self._producer_started[index]:
+            self._failed_starts[index] = 0
+            return
+        self._failed_starts[index] += 1
+        if self._failed_starts[index] > MAX_FAILED_STARTS:
+            raise ProcessError(
+                f"producer process {index} died {self._failed_starts[index]} times in a row before its producer was built, last exit code {exitcode}"
+            )
+
+    def _fail_producer_buffer_ids(self, index: int, exitcode: Optional[int]):
+        batch_size = self._buffer_system.message_batch_size
+        with self._buffer_state_memory.lock:
+            for entry in range(index * batch_size, (index + 1) * batch_size):
+                position = RESERVATION_FIELDS * entry
+                buffer_id, sequence, generation = self._producer_reservations[
+                    position : position + RESERVATION_FIELDS
+                ]
+                self._producer_reservations[position] = NO_BUFFER_ID
+                if buffer_id == NO_BUFFER_ID or not self._claim_dead_reservation(
+                    buffer_id=buffer_id, sequence=sequence, generation=generation
+                ):
+                    continue
+                # consumers in other processes get the error from the queue as well
+                self._error_queue.put(
+                    (
+                        sequence,
+                        ProducerError(
+                            message={BUFFER_ID_KEY: buffer_id},
+                            remote_traceback=f"producer process {index} died with exit code {exitcode}",
+                        ),
+                    )
+                )
+                self._buffer_state_memory.update_buffer_id_to_failed(
+                    buffer_id=buffer_id
+                )
+
+    def _claim_dead_reservation(self, buffer_id: int, sequence: int, generation: int) -> bool:
+        # the process can die after the buffer became available, or after its reservation has been completed by someone else
+        if self._buffer_system.message_timeout is None:
+            # without deadlines only the producer of a message completes its reservation
+            return self._buffer_state_memory.is_reservation(buffer_id, sequence, generation)
+        if self._buffer_state_memory.is_speculated(buffer_id=buffer_id):
+            # the other copy of the message can still complete it, otherwise the commander fails it at this deadline
+            self._buffer_state_memory.start_deadline(
+                buffer_id, sequence, generation, timeout=self._buffer_system.message_timeout
+            )
+            return False
+        return self._buffer_state_memory.claim_buffer_id(buffer_id, sequence, generation)
+
+    def fits(self, buffer_shapes: Sequence[tuple]) -> bool:
+        """Returns if data with the given shapes fits in the allocated buffers
+
+        Args:
+            buffer_shapes (Sequence[tuple]): a shape for every buffer
+
+        Returns:
+            bool: every shape has the dimensions of its buffer and is not larger in any dimension
+        """
+
+        return len(buffer_shapes) == len(self._buffer_info.shapes) and all(
+            len(shape) == len(capacity)
+            and all(size <= capacity_size for size, capacity_size in zip(shape, capacity))
+            for shape, capacity in zip(buffer_shapes, self._buffer_info.shapes)
+        )
+
+    def detach(self):
+        """Stops the commander after its current batch of messages, the producers finish the messages that have been send"""
+
+        if not self._attached:
+            return
+        self._message_process.stop()
+        self._message_process.wait_until_stopped()
+        self._attached = False
+
+    def attach(
+        self,
+        commander: Commander,
+        producer: Optional[Producer] = None,
+        buffer_shapes: Optional[Sequence[tuple]] = None,
+    ):
+        """Starts a new commander for the running producers and the allocated buffers
+
+        The current commander is stopped, the messages that it has send are produced and discarded, and all buffers are freed before the new commander starts.
+
+        Args:
+            commander (Commander): the new commander
+            producer (Optional[Producer], optional): a new producer, build in every producer process. Defaults to None (keep the producer).
+            buffer_shapes (Optional[Sequence[tuple]], optional): new shapes of the data, should fit in the allocated buffers. Defaults to None (keep the shapes).
+
+        Raises:
+            ValueError: the shapes do not fit in the allocated buffers
+        """
+
+        if buffer_shapes is not None and not self.fits(buffer_shapes):
+            raise ValueError(
+                f"shapes {buffer_shapes} do not fit in buffers with shapes {self._buffer_info.shapes}"
+            )
+
+        self.detach()
+
+        if producer is not None or buffer_shapes is not None:
+            if buffer_shapes is not None:
+                self._buffer_shapes = tuple(tuple(shape) for shape in buffer_shapes)
+                self._init_buffer_memory()
+            if producer is not None:
+                self._producer = producer
+            self._configure_producer_processes(
+                producer=producer,
+                buffer_shapes=None if buffer_shapes is None else self._buffer_shapes,
+                buffer_memories=None if buffer_shapes is None else self._buffer_memories,
+            )
+
+        while not self._buffer_state_memory.wait_for_no_buffer_with_state(
+            BufferState.RESERVED, timeout=PRODUCER_CHECK_INTERVAL
+        ):
+            self.check_producer_processes()
+        self._buffer_state_memory.reset()
+        self._clear_errors()
+
+        self._commander = commander
+        self._message_process.restart(commander=commander)
+        self._attached = True
+
+    def _clear_errors(self):
+        # errors of failed buffers that have not been consumed
+        try:
+            while True:
+                self._error_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _configure_producer_processes(self, **configuration):
+        # messages are first in first out, so they are configured after the messages in flight
         for _ in range(self._buffer_system.cpus):
-            self._message_queue.put(STOP_MESSAGE)
+            self._configure_queue.put(configuration)
+            self._message_queue.put(CONFIGURE_MESSAGE)
 
-        # stop producer processes
-        for producer_process in self._producer_processes:
-            producer_process.terminate()
-            producer_process.join()
+    def shutdown(self, timeout: float = 0.0):
+        """Stops all processes and releases the shared memory
 
-        # stop message process
-        self._message_process.terminate()
-        self._message_process.join()
+        The commander stops first, then the producers produce the messages that have been send, run teardown and exit. Processes that are still running after the timeout are terminated (without teardown).
 
-        # close connections
-        if self._buffer_system.deterministic:
-            self._sender.close()
-            self._receiver.close()
+        Args:
+            timeout (float, optional): maximum time in seconds to wait for the processes to stop by themselves. Defaults to 0.0 (terminate right away).
+        """
+
+        deadline = time.monotonic() + timeout
+
+        def remaining() -> float:
+            return max(0.0, deadline - time.monotonic())
+
+        # attached consumers raise instead of waiting for data that does not come anymore
+        if self._watchdog is not None:
+            self._watchdog_stop.set()
+            self._watchdog.join()
+            self._stopped_event.set()
+
+        # stop message process, no new messages are send
+        self._message_process.exit()
+
+        # sending stop messages to queues, after the messages in flight
+        try:
+            for _ in range(self._buffer_system.cpus):
+                self._message_queue.put(STOP_MESSAGE, timeout=remaining())
+        except queue.Full:
+            pass
+
+        # wait for the processes, terminate the ones that did not stop in time
+        processes = [*self._producer_processes, self._message_process]
+        for process in processes:
+            process.join(remaining())
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+        # close notifier
+        if self._available_notifier is not None:
+            self._available_notifier.close()
 
         # shutdown manager
         self._shared_buffer_manager.shutdown()
 
+        # the thread of the consumer gets its CPUs back
+        if self._consumer_cpus is not None:
+            try:
+                set_cpu_affinity(self._consumer_cpus, thread_id=self._consumer_thread_id)
+            except ProcessLookupError:
+                # the thread already exited
+                pass
+            self._consumer_cpus = None
+
+    async def async_shutdown(self, timeout: float = 0.0):
+        """Shuts down without blocking the event loop, see shutdown"""
+
+        await asyncio.get_running_loop().run_in_executor(None, self.shutdown, timeout)
+
     def _create_commander_process(self) -> CommanderProcess:
         return self._commander_process_class(
             commander=self._commander,
             buffer_state_memory=self._buffer_state_memory,
             message_queue=self._message_queue,
-            buffer_id_sender=self.sender,
+            message_batch_size=self._buffer_system.message_batch_size,
+            stop_event=self._buffer_system.context.Event(),
+            idle_event=self._buffer_system.context.Event(),
+            commander_queue=self._buffer_system.context.Queue(),
+            straggler_policy=(
+                None
+                if self._buffer_system.message_timeout is None
+                else self._buffer_system.straggler_policy
+            ),
+            error_queue=self._error_queue,
+            metrics=None if self._metrics is None else self._metrics.commander,
+            cpu_affinity=self._cpu_affinity(
+                None
+                if self._buffer_system.affinity is None
+                else self._buffer_system.affinity.commander
+            ),
+            exception_queue=self._commander_exceptions,
         )
 
     def _create_producer_processes(self) -> List[ProducerProcess]:
-        producer_processes = []
-        for _ in range(self._buffer_system.cpus):
-            producer_process = self._producer_process_class(
-                producer=self._producer,
-                buffer_shapes=self._buffer_info.shapes,
-                buffer_state_memory=self._buffer_state_memory,
-                buffer_memories=self._buffer_memories,
-                message_queue=self._message_queue,
-            )
-            producer_processes.append(producer_process)
-        return producer_processes
+        return [
+            self._create_producer_process(index)
+            for index in range(self._buffer_system.cpus)
+        ]
+
+    def _create_producer_process(self, index: int) -> ProducerProcess:
+        return self._producer_process_class(
+            producer=self._producer,
+            buffer_shapes=self._buffer_shapes,
+            buffer_state_memory=self._buffer_state_memory,
+            buffer_memories=self._buffer_memories,
+            message_queue=self._message_queue,
+            available_notifier=self._available_notifier,
+            configure_barrier=self._configure_barrier,
+            configure_queue=self._configure_queue,
+            error_queue=self._error_queue,
+            max_retries=self._buffer_system.max_retries,
+            producer_index=index,
+            producer_reservations=self._producer_reservations,
+            message_batch_size=self._buffer_system.message_batch_size,
+            message_timeout=self._buffer_system.message_timeout,
+            metrics=None if self._metrics is None else self._metrics.producer(index),
+            cpu_affinity=self._cpu_affinity(
+                None
+                if self._buffer_system.affinity is None
+                else self._buffer_system.affinity.producer(index)
+            ),
+            prefault=self._buffer_system.prefault,
+            producer_started=self._producer_started,
+        )
 
 
 def create_buffer_factory(
@@ -176,18 +655,72 @@ def create_buffer_factory(
     deterministic,
     buffer_shapes,
     buffer_dtype,
+    buffer_count=None,
+    memory_budget=None,
+    consumption_time=0.0,
+    consume=None,
+    buffer_ragged=False,
+    message_batch_size=1,
+    message_transport=QUEUE_TRANSPORT,
+    order_window=0,
+    notify_available=False,
+    preload_modules=(),
+    error_policy=RAISE_ERRORS,
+    max_retries=0,
+    respawn=True,
+    message_timeout=None,
+    straggler_policy=FAIL_STRAGGLERS,
+    metrics=False,
+    affinity=None,
+    prefault=False,
+    buffer_huge_pages=None,
 ):
+    """Creates a BufferFactory for a commander and a producer, see BufferSystem and BufferInfo for most of the arguments
 
-    count = cpus * len(BufferState)
+    buffer_count is None for the default, a number of buffers or "auto". With "auto" the pool is sized by a trial production run: the commander and a copy of the producer are built and create a few batches in the calling process before any process is started, see get_buffer_count. memory_budget, consumption_time and consume are only used with "auto", memory_budget without it raises a ValueError.
+    """
+
+    count = get_buffer_count(
+        buffer_count=buffer_count,
+        cpus=cpus,
+        commander=batch_commander,
+        producer=batch_producer,
+        buffer_shapes=buffer_shapes,
+        buffer_dtype=buffer_dtype,
+        memory_budget=memory_budget,
+        consumption_time=consumption_time,
+        consume=consume,
+    )
 
     if isinstance(context, str):
-        context = multiprocessing.get_context(context)
-        
+        context = get_context(context)
+
     buffer_system = BufferSystem(
-        cpus=cpus, context=context, deterministic=deterministic
+        cpus=cpus,
+        context=context,
+        deterministic=deterministic,
+        message_batch_size=message_batch_size,
+        message_transport=message_transport,
+        order_window=order_window,
+        notify_available=notify_available,
+        preload_modules=preload_modules,
+        error_policy=error_policy,
+        max_retries=max_retries,
+        respawn=respawn,
+        message_timeout=message_timeout,
+        straggler_policy=straggler_policy,
+        metrics=metrics,
+        affinity=affinity,
+        prefault=prefault,
     )
 
-    buffer_info = BufferInfo(count=count, shapes=buffer_shapes, dtype=buffer_dtype)
+    buffer_info = BufferInfo(
+        count=count,
+        shapes=buffer_shapes,
+        dtype=buffer_dtype,
+        ragged=buffer_ragged,
+        huge_pages=buffer_huge_pages,
+    )
 
     return BufferFactory(
         buffer_system=buffer_system,
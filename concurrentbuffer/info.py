@@ -1,5 +1,52 @@
+import mmap
+from typing import Optional, Sequence, Tuple, Union
+
 import numpy as np
 
+CACHE_LINE_SIZE = 64
+HUGE_PAGE_SIZE = 2 * 1024 * 1024
+
+# the buffers are backed by transparent huge pages (madvise) or by a hugetlbfs mount, see HugePageMemory
+TRANSPARENT_HUGE_PAGES = "transparent"
+HUGETLBFS_HUGE_PAGES = "hugetlbfs"
+
+
+def _is_dtype_sequence(dtype) -> bool:
+    # a list of (name, type) tuples describes a structured dtype
+    return isinstance(dtype, (list, tuple)) and not any(
+        isinstance(item, tuple) for item in dtype
+    )
+
+
+def get_output_dtypes(
+    dtype: Union[type, Sequence[type]], length: int
+) -> Tuple[np.dtype, ...]:
+    """Returns the type of every output
+
+    Args:
+        dtype (Union[type, Sequence[type]]): a single type for all outputs, a type per output or a structured type with a field per output
+        length (int): number of outputs
+
+    Raises:
+        ValueError: the number of types does not match the number of outputs
+
+    Returns:
+        Tuple[np.dtype, ...]: the type of every output
+    """
+
+    if _is_dtype_sequence(dtype):
+        dtypes = tuple(np.dtype(output_dtype) for output_dtype in dtype)
+    else:
+        dtype = np.dtype(dtype)
+        if dtype.names is None:
+            return (dtype,) * length
+        dtypes = tuple(dtype.fields[name][0] for name in dtype.names)
+
+    if len(dtypes) != length:
+        raise ValueError(f"got {len(dtypes)} types for {length} outputs")
+    return dtypes
+
+
 class BufferInfo:
     """Class that contains information about the count, shape and type of the buffers
     """
@@ -8,20 +55,45 @@ class BufferInfo:
         self,
         shapes: tuple,
         count: int,
-        dtype: type = np.dtype("uint8"),
+        dtype: Union[type, Sequence[type]] = np.dtype("uint8"),
+        alignment: int = CACHE_LINE_SIZE,
+        ragged: Union[bool, Sequence[bool]] = False,
+        huge_pages: Optional[str] = None,
     ):
         """Init
 
         Args:
             count (int): count of buffers
             shape (tuple): shape of a single buffer
-            dtype (np.dtype, optional): type of the data in the buffers. Defaults to np.dtype("uint8").
+            dtype (Union[type, Sequence[type]], optional): type of the data in the buffers: a single type for all shapes, a type per shape or a structured type with a field per shape. Defaults to np.dtype("uint8").
+            alignment (int, optional): alignment in bytes of every buffer in the shared memory (e.g., CACHE_LINE_SIZE or HUGE_PAGE_SIZE). Defaults to CACHE_LINE_SIZE.
+            ragged (Union[bool, Sequence[bool]], optional): the shapes are the maximum capacity and every buffer stores its actual shape in a header, for all shapes or per shape. Defaults to False.
+            huge_pages (Optional[str], optional): back the buffers with huge pages, TRANSPARENT_HUGE_PAGES or HUGETLBFS_HUGE_PAGES (Linux only). Defaults to None (regular pages).
+
+        Raises:
+            ValueError: the types or ragged flags do not match the outputs or invalid huge_pages
         """
 
         self._shapes = shapes
         self._length = len(shapes)
         self._count = count
         self._dtype = dtype
+        self._dtypes = get_output_dtypes(dtype=dtype, length=self._length)
+        self._alignment = alignment
+        self._ragged = (
+            tuple(ragged)
+            if isinstance(ragged, (list, tuple))
+            else (ragged,) * self._length
+        )
+        if len(self._ragged) != self._length:
+            raise ValueError(
+                f"got {len(self._ragged)} ragged flags for {self._length} outputs"
+            )
+        if huge_pages not in (None, TRANSPARENT_HUGE_PAGES, HUGETLBFS_HUGE_PAGES):
+            raise ValueError(f"unknown huge pages {huge_pages}")
+        if huge_pages is not None and not hasattr(mmap, "MADV_HUGEPAGE"):
+            raise ValueError("huge pages are only supported on Linux")
+        self._huge_pages = huge_pages
 
     def __len__(self):
         return self._length
@@ -35,5 +107,31 @@ class BufferInfo:
         return self._shapes
 
     @property
-    def dtype(self) -> np.dtype:
+    def dtype(self) -> Union[type, Sequence[type]]:
         return self._dtype
+
+    @property
+    def dtypes(self) -> Tuple[np.dtype, ...]:
+        """Type of every shape"""
+        return self._dtypes
+
+    @property
+    def nbytes(self) -> int:
+        """Size in bytes of a single buffer, summed over all shapes"""
+        return sum(
+            int(np.prod(shape)) * dtype.itemsize
+            for shape, dtype in zip(self._shapes, self._dtypes)
+        )
+
+    @property
+    def alignment(self) -> int:
+        return self._alignment
+
+    @property
+    def ragged(self) -> Tuple[bool, ...]:
+        """Whether every shape is ragged"""
+        return self._ragged
+
+    @property
+    def huge_pages(self) -> Optional[str]:
+        return self._huge_pages
@@ -1,34 +1,154 @@
-import multiprocessing
+import asyncio
+import time
+import warnings
 from collections.abc import Iterator
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
+from concurrentbuffer.affinity import CpuAffinity
+from concurrentbuffer.attachment import BufferAttachment
 from concurrentbuffer.commander import Commander
-from concurrentbuffer.factory import BufferFactory
+from concurrentbuffer.factory import PRODUCER_CHECK_INTERVAL, BufferFactory
 from concurrentbuffer.info import BufferInfo
-from concurrentbuffer.producer import Producer
-from concurrentbuffer.state import BufferState
-from concurrentbuffer.system import BufferSystem
+from concurrentbuffer.producer import Producer, ProducerError
+from concurrentbuffer.system import (
+    FAIL_STRAGGLERS,
+    LOAD_BALANCED_DELIVERY,
+    QUEUE_TRANSPORT,
+    RAISE_ERRORS,
+    ROUND_ROBIN_DELIVERY,
+    SKIP_ERRORS,
+    BufferSystem,
+)
+from concurrentbuffer.thread import get_context
+from concurrentbuffer.tuning import get_buffer_count
+
+
+class BufferView(list):
+    """Read-only views into the shared memory of a single buffer.
+
+    The buffer stays in the processing state until it is released, after
+    which the views must not be used anymore.
+    """
+
+    def __init__(
+        self,
+        data: List[np.ndarray],
+        buffer_id: int,
+        release: Callable[[int], None],
+    ):
+        super().__init__(data)
+        self._buffer_id = buffer_id
+        self._release = release
+        self._released = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @property
+    def buffer_id(self) -> int:
+        return self._buffer_id
+
+    @property
+    def released(self) -> bool:
+        return self._released
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._release(self._buffer_id)
 
 
 class BufferIterator(Iterator):
-    """Iterator that goes through the buffers indefinetly"""
+    """Iterator that goes through the buffers indefinetly
+
+    Data that failed to be produced raises a ProducerError or is skipped with a
+    warning, see BufferSystem.error_policy. Producer processes that died are
+    checked for while waiting for data.
+
+    Multiple iterators can consume from the same factory, each one is a
+    consumer in a ConsumerGroup and only gets its share of the data.
+    """
 
     def __init__(
         self,
-        buffer_factory: BufferFactory,
+        buffer_factory: Union[BufferFactory, BufferAttachment],
         auto_free_buffer: bool = True,
+        copy: bool = True,
+        reorder_window: int = 0,
+        shutdown_factory: bool = True,
+        consumer: int = 0,
+        consumers: int = 1,
+        delivery: str = ROUND_ROBIN_DELIVERY,
     ):
         """Init
 
         Args:
-            buffer_factory (BufferFactory): factory in which all the components have been created
+            buffer_factory (Union[BufferFactory, BufferAttachment]): factory in which all the components have been created, or an attachment to a factory in another process
             auto_free (bool, optional): frees the previous buffer when new data is requested. Defaults to True.
+            copy (bool, optional): copies the data out of the shared memory. If False, a BufferView with read-only views is returned that has to be released explicitly (auto_free is ignored). Defaults to True.
+            reorder_window (int, optional): in deterministic mode, data of up to reorder_window later sequence numbers that is ready before the next one is copied out such that its buffer can be freed and reused while waiting. Requires copy. Defaults to 0.
+            shutdown_factory (bool, optional): stop shuts the factory down, otherwise it only detaches the commander such that the factory can be reused, see BufferPool. Defaults to True.
+            consumer (int, optional): index of this iterator among the consumers of the factory. Defaults to 0.
+            consumers (int, optional): number of consumers of the factory, at most the buffer count, with more than one and shutdown_factory=False stop only releases the last buffer of this consumer, see ConsumerGroup. Defaults to 1.
+            delivery (str, optional): how data is divided over the consumers, ROUND_ROBIN_DELIVERY gives every consumer the sequences with sequence % consumers == consumer, LOAD_BALANCED_DELIVERY gives the next data to the consumer that asks first (in deterministic mode the consumers claim the sequences in order). Defaults to ROUND_ROBIN_DELIVERY.
+
+        Raises:
+            ValueError: invalid reorder_window, consumer, consumers or delivery
         """
 
+        if not 0 <= consumer < consumers:
+            raise ValueError(f"consumer should be in [0, {consumers}), got {consumer}")
+        # every consumer holds at least one buffer
+        if consumers > buffer_factory.buffer_state_memory.count:
+            raise ValueError(
+                f"consumers should be at most the buffer count {buffer_factory.buffer_state_memory.count}, got {consumers}"
+            )
+        if delivery not in (ROUND_ROBIN_DELIVERY, LOAD_BALANCED_DELIVERY):
+            raise ValueError(f"unknown delivery {delivery}")
+        if reorder_window < 0:
+            raise ValueError(f"reorder_window should be >= 0, got {reorder_window}")
+        if reorder_window and not copy:
+            raise ValueError("reorder_window requires copy=True")
+        order_window = buffer_factory.buffer_system.order_window
+        if (order_window or reorder_window) and delivery == LOAD_BALANCED_DELIVERY:
+            raise ValueError("order_window and reorder_window require ROUND_ROBIN_DELIVERY")
+        # the sequences that are looked at span at most 2 * order_window - 1 or reorder_window sequences of this consumer
+        if max(2 * order_window - 1, reorder_window) * consumers >= buffer_factory.buffer_state_memory.count:
+            raise ValueError(
+                f"reorder_window and 2 * order_window - 1 times the number of consumers should be smaller than the buffer count {buffer_factory.buffer_state_memory.count}"
+            )
+
         self._buffer_factory = buffer_factory
         self._auto_free_buffer = auto_free_buffer
+        self._copy = copy
+        self._reorder_window = reorder_window
+        self._shutdown_factory = shutdown_factory
+        self._order_window = order_window
+        self._consumer = consumer
+        self._consumers = consumers
+        self._delivery = delivery
         self._last_buffer_id = None
+        self._sequence = None
+        # sequences are counted within the shard of the consumer (sequence % consumers == consumer), see _shard_sequence
+        # the lowest sequence that has not been returned yet
+        self._next_sequence = 0
+        # the number of returned sequences
+        self._position = 0
+        # returned sequences above next_sequence
+        self._returned = set()
+        self._reordered = {}
+        # a sequence claimed with LOAD_BALANCED_DELIVERY that has not been returned yet
+        self._claimed_sequence = None
+        self._metrics = (
+            None
+            if buffer_factory.metrics is None
+            else buffer_factory.metrics.consumer(consumer)
+        )
 
     def __enter__(self):
         return self
@@ -36,37 +156,316 @@ class BufferIterator(Iterator):
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop()
 
-    def __next__(self) -> np.ndarray:
-        if self._auto_free_buffer and self._last_buffer_id is not None:
-            self._buffer_factory.buffer_state_memory.update_buffer_id_to_free(
-                buffer_id=self._last_buffer_id
-            )
+    @property
+    def buffer_factory(self) -> Union[BufferFactory, BufferAttachment]:
+        return self._buffer_factory
 
-        buffer_id = self._next()
-        self._last_buffer_id = buffer_id
+    @property
+    def consumer(self) -> int:
+        return self._consumer
 
-        data = []
-        for buffer_memory in self._buffer_factory.buffer_memories:
-            data.append(buffer_memory.get_buffer(buffer_id=buffer_id))
+    @property
+    def sequence(self) -> Optional[int]:
+        """The sequence number (order of the message) of the last returned data"""
+        return self._sequence
 
-        return data
+    def stats(self) -> dict:
+        """Returns the metrics of the commander, the producers and the consumer, see BufferFactory.stats"""
+        return self._buffer_factory.stats()
 
-    def _next(self) -> int:
-        next_buffer_id = None
-        if self._buffer_factory.buffer_system.deterministic:
-            next_buffer_id = self._buffer_factory.receiver.recv()
+    def __next__(self) -> List[np.ndarray]:
+        self._release_last()
+        while True:
+            start = time.perf_counter_ns()
+            result = self._wait_next()
+            if self._metrics is not None:
+                self._metrics.record("wait", start)
+            data = self._retrieve(*result)
+            if data is not None:
+                return data
 
+    def _wait_next(self) -> Tuple[int, Optional[int]]:
         while True:
-            buffer_id = (
-                self._buffer_factory.buffer_state_memory.get_available_buffer_id(
-                    buffer_id=next_buffer_id
+            result = self._next(timeout=PRODUCER_CHECK_INTERVAL)
+            if result is not None:
+                return result
+            self._buffer_factory.check_producer_processes()
+
+    def _release_last(self):
+        if (
+            self._copy
+            and self._auto_free_buffer
+            and self._last_buffer_id is not None
+        ):
+            self.release(buffer_id=self._last_buffer_id)
+        self._last_buffer_id = None
+
+    def _retrieve(
+        self, sequence: int, buffer_id: Optional[int]
+    ) -> Optional[List[np.ndarray]]:
+        """Returns the data, None if failed data is skipped"""
+
+        self._sequence = sequence
+        if buffer_id is None:
+            data = self._reordered.pop(sequence)
+            if isinstance(data, ProducerError):
+                return self._failed(data)
+            if self._metrics is not None:
+                self._metrics.count("consumed")
+            return data
+
+        if self._buffer_factory.buffer_state_memory.is_failed(buffer_id):
+            return self._failed(self._pop_error(sequence=sequence, buffer_id=buffer_id))
+
+        self._last_buffer_id = buffer_id
+        data = self._get_data(buffer_id=buffer_id)
+        if self._metrics is not None:
+            self._metrics.count("consumed")
+        if not self._copy:
+            return BufferView(data=data, buffer_id=buffer_id, release=self.release)
+        return data
+
+    def _get_data(self, buffer_id: int) -> List[np.ndarray]:
+        start = time.perf_counter_ns()
+        data = [
+            buffer_memory.get_buffer(buffer_id=buffer_id, copy=self._copy)
+            for buffer_memory in self._buffer_factory.buffer_memories
+        ]
+        if self._metrics is not None:
+            self._metrics.record("read", start)
+        return data
+
+    def _pop_error(self, sequence: int, buffer_id: int) -> ProducerError:
+        error = self._buffer_factory.pop_error(sequence=sequence)
+        self.release(buffer_id=buffer_id)
+        return error
+
+    def _failed(self, error: ProducerError) -> None:
+        error_policy = self._buffer_factory.buffer_system.error_policy
+        if error_policy == SKIP_ERRORS:
+            # points at the caller of next(), via __next__ (or __anext__) and _retrieve
+            warnings.warn(
+                f"skipped data of sequence {self._sequence}: {error}",
+                RuntimeWarning,
+                stacklevel=4,
+            )
+            return None
+        raise error
+
+    def release(self, buffer_id: int):
+        """Frees a buffer such that it can be filled with new data
+
+        Args:
+            buffer_id (int): id of the buffer
+        """
+
+        self._buffer_factory.buffer_state_memory.update_buffer_id_to_free(
+            buffer_id=buffer_id
+        )
+
+    def _last_allowed_sequence(self) -> int:
+        # the next sequence has to be returned before it is more than order_window positions late
+        if self._position - self._next_sequence >= self._order_window:
+            return self._next_sequence
+        return self._position + self._order_window
+
+    def _returned_sequence(self, sequence: int):
+        self._position += 1
+        if sequence != self._next_sequence:
+            self._returned.add(sequence)
+            return
+        self._next_sequence += 1
+        while self._next_sequence in self._returned:
+            self._returned.remove(self._next_sequence)
+            self._next_sequence += 1
+
+    def _next(
+        self, timeout: Optional[float] = None
+    ) -> Optional[Tuple[int, Optional[int]]]:
+        """Waits for the next data
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait for a buffer in seconds. Defaults to None (wait forever).
+
+        Returns:
+            Optional[Tuple[int, Optional[int]]]: the sequence and the buffer_id of the data, the buffer_id is None if the data has been copied out of the shared memory before. None if the timeout expired.
+        """
+
+        buffer_state_memory = self._buffer_factory.buffer_state_memory
+        if not self._buffer_factory.buffer_system.deterministic:
+            if self._consumers == 1 or self._delivery == LOAD_BALANCED_DELIVERY:
+                buffer_id = buffer_state_memory.wait_for_available_buffer_id(
+                    timeout=timeout
                 )
+            else:
+                buffer_id = buffer_state_memory.wait_for_available_shard_buffer_id(
+                    shard=self._consumer, shards=self._consumers, timeout=timeout
+                )
+            if buffer_id is None:
+                return None
+            return buffer_state_memory.get_sequence(buffer_id=buffer_id), buffer_id
+
+        if self._delivery == LOAD_BALANCED_DELIVERY:
+            return self._next_claimed(timeout=timeout)
+
+        while True:
+            last = self._last_allowed_sequence()
+            reordered = [
+                sequence
+                for sequence in self._reordered
+                if self._shard_position(sequence) <= last
+            ]
+            if reordered:
+                sequence = min(reordered)
+                self._returned_sequence(self._shard_position(sequence))
+                return sequence, None
+
+            buffer_id = buffer_state_memory.wait_for_available_sequence_buffer_id(
+                first=self._shard_sequence(self._next_sequence),
+                last=self._shard_sequence(
+                    max(last, self._next_sequence + self._reorder_window)
+                ),
+                timeout=timeout,
+                step=self._consumers,
             )
-            if buffer_id is not None:
-                return buffer_id
+            if buffer_id is None:
+                return None
+            sequence = buffer_state_memory.get_sequence(buffer_id=buffer_id)
+            if self._shard_position(sequence) <= last:
+                self._returned_sequence(self._shard_position(sequence))
+                return sequence, buffer_id
+
+            # a later sequence is ready first, keep a copy and let the buffer be reused
+            if buffer_state_memory.is_failed(buffer_id):
+                self._reordered[sequence] = self._pop_error(
+                    sequence=sequence, buffer_id=buffer_id
+                )
+                continue
+            self._reordered[sequence] = self._get_data(buffer_id=buffer_id)
+            self.release(buffer_id=buffer_id)
+
+    def _shard_sequence(self, position: int) -> int:
+        # the sequence of the position-th data of this consumer
+        return self._consumer + position * self._consumers
+
+    def _shard_position(self, sequence: int) -> int:
+        return (sequence - self._consumer) // self._consumers
+
+    def _next_claimed(
+        self, timeout: Optional[float] = None
+    ) -> Optional[Tuple[int, Optional[int]]]:
+        # the claim is kept when the timeout expires, such that every sequence is returned by exactly one consumer
+        buffer_state_memory = self._buffer_factory.buffer_state_memory
+        if self._claimed_sequence is None:
+            self._claimed_sequence = buffer_state_memory.claim_sequence()
+        buffer_id = buffer_state_memory.wait_for_available_sequence_buffer_id(
+            first=self._claimed_sequence, timeout=timeout
+        )
+        if buffer_id is None:
+            return None
+        sequence, self._claimed_sequence = self._claimed_sequence, None
+        return sequence, buffer_id
+
+    def stop(self, timeout: float = 0.0):
+        """Shuts the factory down or detaches the commander, see shutdown_factory
+
+        The last buffer of the consumer is released first. A consumer of a ConsumerGroup or of a BufferAttachment only releases its last buffer, the group or the process of the factory stops the factory. The iterator that owns the factory (shutdown_factory=True) also shuts it down when it is one of several consumers, consumers in other processes then raise a ProcessError.
+
+        Args:
+            timeout (float, optional): see BufferFactory.shutdown. Defaults to 0.0.
+        """
+
+        self._release_last()
+        if self._shutdown_factory:
+            self._buffer_factory.shutdown(timeout=timeout)
+        elif self._consumers == 1:
+            # the commander keeps running for the other consumers
+            self._buffer_factory.detach()
+
+
+class AsyncBufferIterator(BufferIterator):
+    """Asynchronous iterator that goes through the buffers indefinetly without blocking the event loop
+
+    With BufferSystem(notify_available=True) the iterator waits until the
+    AvailableNotifier of the factory is readable, otherwise it polls the states
+    in the default executor of the loop.
+    """
+
+    def __init__(self, *args, poll_interval: float = 0.05, **kwargs):
+        """Init
 
-    def stop(self):
-        self._buffer_factory.shutdown()
+        Args:
+            poll_interval (float, optional): maximum time in seconds an executor thread waits for data before it checks for cancellation, only used without an AvailableNotifier. Defaults to 0.05.
+
+        See BufferIterator for the other arguments.
+        """
+
+        super().__init__(*args, **kwargs)
+        self._poll_interval = poll_interval
+        # the executor future of a cancelled _poll_next, its result is returned by the next call
+        self._pending = None
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.async_stop()
+
+    async def __anext__(self) -> List[np.ndarray]:
+        self._release_last()
+        while True:
+            start = time.perf_counter_ns()
+            if self._buffer_factory.available_notifier is None:
+                result = await self._poll_next()
+            else:
+                result = await self._notified_next()
+            if self._metrics is not None:
+                self._metrics.record("wait", start)
+            data = self._retrieve(*result)
+            if data is not None:
+                return data
+
+    async def _poll_next(self) -> Tuple[int, Optional[int]]:
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._pending is None:
+                self._pending = loop.run_in_executor(
+                    None, self._next, self._poll_interval
+                )
+            # the executor thread cannot be cancelled, when the task is cancelled it keeps the next data
+            try:
+                result = await asyncio.shield(self._pending)
+            except Exception:
+                self._pending = None
+                raise
+            self._pending = None
+            if result is not None:
+                return result
+            self._buffer_factory.check_producer_processes()
+
+    async def _notified_next(self) -> Tuple[int, Optional[int]]:
+        available_notifier = self._buffer_factory.available_notifier
+        while True:
+            result = self._next(timeout=0)
+            if result is not None:
+                return result
+
+            # a producer process that dies does not notify
+            if not await available_notifier.wait(timeout=PRODUCER_CHECK_INTERVAL):
+                self._buffer_factory.check_producer_processes()
+
+    async def async_stop(self, timeout: float = 0.0):
+        if self._pending is not None:
+            # the data of a cancelled __anext__ is not returned anymore
+            pending, self._pending = self._pending, None
+            await asyncio.wait({pending})
+            result = None if pending.exception() else pending.result()
+            if result is not None and result[1] is not None:
+                self.release(buffer_id=result[1])
+        await asyncio.get_running_loop().run_in_executor(None, self.stop, timeout)
 
 
 def buffer_iterator_factory(
@@ -76,19 +475,74 @@ def buffer_iterator_factory(
     producer: Producer,
     context: str,
     deterministic: bool,
-    buffer_dtype: type = np.uint16,
+    buffer_dtype: Union[type, Sequence[type]] = np.uint16,
     buffer_iterator_class: type = BufferIterator,
     *args,
+    buffer_count: Optional[Union[int, str]] = None,
+    memory_budget: Optional[int] = None,
+    consumption_time: float = 0.0,
+    consume: Optional[Callable[[List[np.ndarray]], Any]] = None,
+    buffer_ragged: Union[bool, Sequence[bool]] = False,
+    message_batch_size: int = 1,
+    message_transport: str = QUEUE_TRANSPORT,
+    order_window: int = 0,
+    notify_available: bool = False,
+    preload_modules: Sequence[str] = (),
+    error_policy: str = RAISE_ERRORS,
+    max_retries: int = 0,
+    respawn: bool = True,
+    message_timeout: Optional[float] = None,
+    straggler_policy: str = FAIL_STRAGGLERS,
+    metrics: bool = False,
+    affinity: Optional[CpuAffinity] = None,
+    prefault: bool = False,
+    buffer_huge_pages: Optional[str] = None,
     **kwargs
 ):
-    count = cpus * len(BufferState)
+    """Creates a BufferFactory and returns a buffer_iterator_class over it, the other positional and keyword arguments are passed to the iterator
 
-    mp_context = multiprocessing.get_context(context)
+    The arguments of the factory are those of create_buffer_factory, e.g., buffer_count="auto" first runs copies of the commander and the producer in this process to size the pool.
+    """
+
+    count = get_buffer_count(
+        buffer_count=buffer_count,
+        cpus=cpus,
+        commander=commander,
+        producer=producer,
+        buffer_shapes=buffer_shapes,
+        buffer_dtype=buffer_dtype,
+        memory_budget=memory_budget,
+        consumption_time=consumption_time,
+        consume=consume,
+    )
+
+    mp_context = get_context(context)
     buffer_system = BufferSystem(
-        cpus=cpus, context=mp_context, deterministic=deterministic
+        cpus=cpus,
+        context=mp_context,
+        deterministic=deterministic,
+        message_batch_size=message_batch_size,
+        message_transport=message_transport,
+        order_window=order_window,
+        notify_available=notify_available,
+        preload_modules=preload_modules,
+        error_policy=error_policy,
+        max_retries=max_retries,
+        respawn=respawn,
+        message_timeout=message_timeout,
+        straggler_policy=straggler_policy,
+        metrics=metrics,
+        affinity=affinity,
+        prefault=prefault,
     )
 
-    buffer_info = BufferInfo(count=count, shapes=buffer_shapes, dtype=buffer_dtype)
+    buffer_info = BufferInfo(
+        count=count,
+        shapes=buffer_shapes,
+        dtype=buffer_dtype,
+        ragged=buffer_ragged,
+        huge_pages=buffer_huge_pages,
+    )
 
     buffer_factory = BufferFactory(
         buffer_system=buffer_system,
@@ -97,4 +551,9 @@ def buffer_iterator_factory(
         producer=producer,
     )
 
-    return buffer_iterator_class(buffer_factory=buffer_factory, *args, **kwargs)
+    try:
+        return buffer_iterator_class(buffer_factory=buffer_factory, *args, **kwargs)
+    except Exception:
+        # e.g., invalid arguments of the iterator
+        buffer_factory.shutdown()
+        raise
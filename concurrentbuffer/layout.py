@@ -0,0 +1,85 @@
+from typing import List, Optional
+
+import numpy as np
+
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.state import BufferStateMemory
+
+# the actual shape of a ragged buffer is stored in a header in front of its data, see BufferMemory
+SHAPE_HEADER_DTYPE = np.dtype("int64")
+
+
+def _align(offset: int, alignment: int) -> int:
+    return -(-offset // alignment) * alignment
+
+
+class BufferLayout:
+    """Offsets of the states and the buffers within a single shared memory arena.
+
+    The arena starts with the state array, followed by the buffers. The
+    buffers are grouped per buffer_id such that the outputs of one buffer are
+    adjacent, and every buffer starts at a multiple of the alignment. Ragged
+    outputs are preceded by a header that holds their actual shape.
+    """
+
+    def __init__(self, buffer_info: BufferInfo):
+        """Init
+
+        Args:
+            buffer_info (BufferInfo): contains information about the count, shape, type and alignment of the buffers
+        """
+
+        self._alignment = buffer_info.alignment
+        self._state_offset = 0
+        self._state_nbytes = BufferStateMemory.nbytes(
+            count=buffer_info.count, dtype=np.dtype("uint8")
+        )
+
+        buffer_nbytes = [
+            int(np.prod(shape)) * dtype.itemsize
+            for shape, dtype in zip(buffer_info.shapes, buffer_info.dtypes)
+        ]
+
+        self._offsets = [[] for _ in range(len(buffer_info))]
+        self._header_offsets = [
+            [] if ragged else None for ragged in buffer_info.ragged
+        ]
+        offset = _align(self._state_offset + self._state_nbytes, self._alignment)
+        for _ in range(buffer_info.count):
+            for idx, nbytes in enumerate(buffer_nbytes):
+                if buffer_info.ragged[idx]:
+                    self._header_offsets[idx].append(offset)
+                    offset = _align(
+                        offset
+                        + len(buffer_info.shapes[idx]) * SHAPE_HEADER_DTYPE.itemsize,
+                        self._alignment,
+                    )
+                self._offsets[idx].append(offset)
+                offset = _align(offset + nbytes, self._alignment)
+        self._nbytes = offset
+
+    @property
+    def alignment(self) -> int:
+        return self._alignment
+
+    @property
+    def state_offset(self) -> int:
+        return self._state_offset
+
+    @property
+    def state_nbytes(self) -> int:
+        return self._state_nbytes
+
+    @property
+    def offsets(self) -> List[List[int]]:
+        """Offsets of the buffers, indexed by output and then by buffer_id"""
+        return self._offsets
+
+    @property
+    def header_offsets(self) -> List[Optional[List[int]]]:
+        """Offsets of the shape headers, indexed by output and then by buffer_id (None for outputs that are not ragged)"""
+        return self._header_offsets
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
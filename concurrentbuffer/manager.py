@@ -1,12 +1,21 @@
+import mmap
+import os
+import secrets
 from multiprocessing.context import ProcessError
 from multiprocessing.managers import SharedMemoryManager
 from multiprocessing.shared_memory import SharedMemory
-from multiprocessing import managers
-from typing import List
+from multiprocessing import managers, util
+from typing import Callable, Optional, Union
+from concurrentbuffer.info import (
+    HUGE_PAGE_SIZE,
+    HUGETLBFS_HUGE_PAGES,
+    TRANSPARENT_HUGE_PAGES,
+    BufferInfo,
+)
+from concurrentbuffer.layout import BufferLayout
 
-import numpy as np
-
-from concurrentbuffer.info import BufferInfo
+# shared memory with transparent huge pages lives in the same place as SharedMemory (needs shmem_enabled=advise or always)
+SHM_PATH = "/dev/shm"
 
 
 class SharedBufferManagerNotStarted(ProcessError):
@@ -15,8 +24,121 @@ class SharedBufferManagerNotStarted(ProcessError):
     ...
 
 
+def get_hugetlbfs_mount() -> str:
+    """Returns the mount point of the first hugetlbfs
+
+    Raises:
+        ValueError: no hugetlbfs is mounted
+
+    Returns:
+        str: the mount point
+    """
+
+    try:
+        with open("/proc/mounts") as mounts:
+            for mount in mounts:
+                _, mount_point, filesystem, *_ = mount.split()
+                if filesystem == "hugetlbfs":
+                    return mount_point
+    except OSError:
+        pass
+    raise ValueError("no hugetlbfs is mounted")
+
+
+class HugePageMemory:
+    """Shared memory backed by huge pages with the interface of SharedMemory.
+
+    The memory is a file on a hugetlbfs mount (HUGETLBFS_HUGE_PAGES) or on
+    /dev/shm with transparent huge pages requested by madvise for every
+    mapping (TRANSPARENT_HUGE_PAGES). The size is rounded up to HUGE_PAGE_SIZE.
+    Like SharedMemory it is attached again by name when it is pickled.
+    """
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        create: bool = False,
+        size: int = 0,
+        huge_pages: str = TRANSPARENT_HUGE_PAGES,
+    ):
+        """Init
+
+        Args:
+            name (Optional[str], optional): path of the file. Defaults to None (a new file, requires create).
+            create (bool, optional): create a new file. Defaults to False.
+            size (int, optional): size in bytes when the file is created. Defaults to 0.
+            huge_pages (str, optional): TRANSPARENT_HUGE_PAGES or HUGETLBFS_HUGE_PAGES. Defaults to TRANSPARENT_HUGE_PAGES.
+
+        Raises:
+            ValueError: no hugetlbfs is mounted
+        """
+
+        if name is None:
+            directory = (
+                get_hugetlbfs_mount()
+                if huge_pages == HUGETLBFS_HUGE_PAGES
+                else SHM_PATH
+            )
+            name = os.path.join(directory, f"cb_{secrets.token_hex(8)}")
+
+        flags = os.O_RDWR | (os.O_CREAT | os.O_EXCL if create else 0)
+        fd = os.open(name, flags, 0o600)
+        try:
+            if create:
+                size = -(-size // HUGE_PAGE_SIZE) * HUGE_PAGE_SIZE
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        if huge_pages == TRANSPARENT_HUGE_PAGES:
+            self._mmap.madvise(mmap.MADV_HUGEPAGE)
+
+        self._name = name
+        self._size = size
+        self._huge_pages = huge_pages
+        self._buf = memoryview(self._mmap)
+
+    def __reduce__(self):
+        return (self.__class__, (self._name, False, self._size, self._huge_pages))
+
+    @property
+    def buf(self) -> memoryview:
+        return self._buf
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def unlink(self):
+        """Removes the file, the memory is released when the last mapping is closed"""
+        os.unlink(self._name)
+
+
+def _create_arena(
+    buffer_manager: Union["SharedBufferManager", "LocalBufferManager"], size: int
+) -> Union[SharedMemory, HugePageMemory]:
+    huge_pages = buffer_manager.buffer_info.huge_pages
+    if huge_pages is None:
+        return buffer_manager.SharedMemory(size=size)
+    return HugePageMemory(create=True, size=size, huge_pages=huge_pages)
+
+
+def _shutdown_with_arena(shutdown: Callable[[], None], arena: HugePageMemory):
+    try:
+        arena.unlink()
+    except FileNotFoundError:
+        pass
+    shutdown()
+
+
 class SharedBufferManager(SharedMemoryManager):
     """Controls the creation, access and deletion of shared memory buffers.
+
+    The states and all the buffers live in a single shared memory arena, see BufferLayout for the offsets.
     """
 
     def __init__(self, buffer_info: BufferInfo, *args, **kwargs):
@@ -29,34 +151,115 @@ class SharedBufferManager(SharedMemoryManager):
         super().__init__(*args, **kwargs)
 
         self._buffer_info = buffer_info
-        self._state_buffer = None
-        self._buffers = None
+        self._layout = BufferLayout(buffer_info=buffer_info)
+        self._arena = None
 
     def start(self):
         super().start()
-        self._create_state_buffer()
-        self._create_buffers()
+        self._create_arena()
 
-    def _create_state_buffer(self):
-        size_holder = np.empty((self._buffer_info.count), dtype=np.dtype("uint8"))
-        self._state_buffer = [self.SharedMemory(size=size_holder.nbytes)]
+    def _create_arena(self):
+        self._arena = [_create_arena(self, size=self._layout.nbytes)]
+        if isinstance(self._arena[0], HugePageMemory):
+            # the server only removes the shared memory that it created, start replaced shutdown by a finalizer
+            self.shutdown = util.Finalize(
+                self,
+                _shutdown_with_arena,
+                args=(self.shutdown, self._arena[0]),
+                exitpriority=0,
+            )
 
-    def _create_buffers(self):
-        self._buffers = []
-        for idx in range(len(self._buffer_info)):
-            self._buffers.append({})
-            size_holder = np.empty((self._buffer_info.shapes[idx]), dtype=self._buffer_info.dtype)
-            for buffer_id in range(self._buffer_info.count):
-                self._buffers[idx][buffer_id] = self.SharedMemory(size=size_holder.nbytes)
+    @property
+    def buffer_info(self) -> BufferInfo:
+        return self._buffer_info
 
     @property
-    def state_buffer(self) -> SharedMemory:
+    def layout(self) -> BufferLayout:
+        return self._layout
+
+    @property
+    def arena(self) -> Union[SharedMemory, HugePageMemory]:
         if self._state.value != managers.State.STARTED:
             raise SharedBufferManagerNotStarted()
-        return self._state_buffer[0]
+        return self._arena[0]
 
     @property
-    def buffers(self) -> List[SharedMemory]:
-        if self._state.value != managers.State.STARTED:
+    def state_buffer(self) -> SharedMemory:
+        """The arena, the states are located at layout.state_offset"""
+        return self.arena
+
+
+class LocalMemory:
+    """Anonymous memory of the current process with the interface of SharedMemory"""
+
+    def __init__(self, size: int):
+        """Init
+
+        Args:
+            size (int): size in bytes
+        """
+
+        self._mmap = mmap.mmap(-1, size)
+        self._buf = memoryview(self._mmap)
+        self._size = size
+
+    @property
+    def buf(self) -> memoryview:
+        return self._buf
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def name(self):
+        return None
+
+
+class LocalBufferManager:
+    """Controls the memory of the buffers when the producers are threads of the current process.
+
+    Same interface as SharedBufferManager, but the arena is LocalMemory and no manager process is started.
+    """
+
+    def __init__(self, buffer_info: BufferInfo):
+        """Init
+
+        Args:
+            buffer_info (BufferInfo): contains information about the count, shape and type of the buffers
+        """
+
+        self._buffer_info = buffer_info
+        self._layout = BufferLayout(buffer_info=buffer_info)
+        self._arena = None
+
+    def start(self):
+        self._arena = [_create_arena(self, size=self._layout.nbytes)]
+
+    def shutdown(self):
+        # the memory is released when the last view is garbage collected
+        if self._arena is not None and isinstance(self._arena[0], HugePageMemory):
+            self._arena[0].unlink()
+        self._arena = None
+
+    def SharedMemory(self, size: int) -> LocalMemory:
+        return LocalMemory(size=size)
+
+    @property
+    def buffer_info(self) -> BufferInfo:
+        return self._buffer_info
+
+    @property
+    def layout(self) -> BufferLayout:
+        return self._layout
+
+    @property
+    def arena(self) -> Union[LocalMemory, HugePageMemory]:
+        if self._arena is None:
             raise SharedBufferManagerNotStarted()
-        return self._buffers
+        return self._arena[0]
+
+    @property
+    def state_buffer(self) -> LocalMemory:
+        """The arena, the states are located at layout.state_offset"""
+        return self.arena
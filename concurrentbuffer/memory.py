@@ -1,36 +1,186 @@
+import mmap
 from multiprocessing.shared_memory import SharedMemory
-from typing import Dict
+from typing import Optional, Sequence
 
 import numpy as np
 
+from concurrentbuffer.layout import SHAPE_HEADER_DTYPE
+
+
+def ragged_view(array: np.ndarray, shape: tuple) -> np.ndarray:
+    """Returns the C-contiguous prefix of a (capacity) array with the given shape.
+
+    This is where the data of a ragged buffer is stored. If only the first dimension differs from the capacity, this equals array[:shape[0]].
+
+    Args:
+        array (np.ndarray): C-contiguous array with the capacity shape
+        shape (tuple): the actual shape
+
+    Returns:
+        np.ndarray: view into array
+    """
+
+    return array.reshape(-1)[: int(np.prod(shape))].reshape(shape)
+
 
 class BufferMemory:
     """Class that contains the buffers
     """
-    def __init__(self, shape: tuple, dtype: type, buffers: Dict[int, SharedMemory]):
+    def __init__(
+        self,
+        shape: tuple,
+        dtype: type,
+        buffer: SharedMemory,
+        offsets: Sequence[int],
+        header_offsets: Optional[Sequence[int]] = None,
+    ):
         """INit
 
         Args:
-            shape (tuple): shape of the buffers
+            shape (tuple): shape of the buffers (the capacity of ragged buffers)
             dtype (type): type of the buffers
-            buffers (List[SharedMemory]): the data memory of the buffers
+            buffer (SharedMemory): the shared memory arena that contains the buffers
+            offsets (Sequence[int]): offset in bytes of every buffer_id within the arena
+            header_offsets (Optional[Sequence[int]], optional): offset in bytes of the shape header of every buffer_id, makes the buffers ragged. Defaults to None.
         """
 
-        self._shape = shape
+        self._shape = tuple(shape)
         self._dtype = dtype
-        self._buffers = buffers
+        self._buffer = buffer
+        self._offsets = offsets
+        self._header_offsets = header_offsets
+
+    @property
+    def shape(self) -> tuple:
+        return self._shape
 
-    def get_buffer(self, buffer_id: int):
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def ragged(self) -> bool:
+        return self._header_offsets is not None
+
+    def _get_header(self, buffer_id: int) -> np.ndarray:
         return np.ndarray(
-            shape=self._shape,
-            dtype=self._dtype,
-            buffer=self._buffers[buffer_id].buf,
-        ).copy()
+            shape=len(self._shape),
+            dtype=SHAPE_HEADER_DTYPE,
+            buffer=self._buffer.buf,
+            offset=self._header_offsets[buffer_id],
+        )
+
+    def get_shape(self, buffer_id: int) -> tuple:
+        """Returns the shape of the data in a buffer
+
+        Args:
+            buffer_id (int): id of the buffer
+
+        Returns:
+            tuple: the shape stored in the header for ragged buffers, otherwise the shape of the buffers
+        """
+
+        if not self.ragged:
+            return self._shape
+        return tuple(int(size) for size in self._get_header(buffer_id=buffer_id))
+
+    def update_shape(self, buffer_id: int, shape: tuple):
+        """Stores the actual shape of the data in a ragged buffer
+
+        Args:
+            buffer_id (int): id of the buffer
+            shape (tuple): shape of the data
+
+        Raises:
+            ValueError: buffers are not ragged or the shape does not fit the capacity
+        """
+
+        if not self.ragged:
+            raise ValueError("buffers are not ragged")
+        if len(shape) != len(self._shape) or any(
+            size < 0 or size > capacity for size, capacity in zip(shape, self._shape)
+        ):
+            raise ValueError(f"shape {shape} does not fit in capacity {self._shape}")
+        self._get_header(buffer_id=buffer_id)[:] = shape
+
+    def touch(self, buffer_id: int):
+        """Reads every page of a buffer, such that its pages are allocated and mapped in the calling process before they are used
+
+        Reading does not change the data, so it is safe while other processes write into the buffer.
+
+        Args:
+            buffer_id (int): id of the buffer
+        """
+
+        regions = [
+            (
+                self._offsets[buffer_id],
+                int(np.prod(self._shape)) * np.dtype(self._dtype).itemsize,
+            )
+        ]
+        if self.ragged:
+            regions.append(
+                (
+                    self._header_offsets[buffer_id],
+                    len(self._shape) * SHAPE_HEADER_DTYPE.itemsize,
+                )
+            )
+        for offset, nbytes in regions:
+            if not nbytes:
+                continue
+            pages = np.ndarray(
+                shape=nbytes, dtype=np.uint8, buffer=self._buffer.buf, offset=offset
+            )
+            pages[:: mmap.PAGESIZE].max()
+            pages[-1].max()
+
+    def get_buffer(self, buffer_id: int, copy: bool = True):
+        """Returns the data of a buffer
+
+        Args:
+            buffer_id (int): id of the buffer
+            copy (bool, optional): return a copy of the data, otherwise a read-only view into the shared memory is returned. Defaults to True.
+
+        Returns:
+            np.ndarray: the data of the buffer
+        """
+
+        buffer = self.get_writable_buffer(
+            buffer_id=buffer_id, shape=self.get_shape(buffer_id=buffer_id)
+        )
+        if copy:
+            return buffer.copy()
+        buffer.flags.writeable = False
+        return buffer
+
+    def get_writable_buffer(
+        self, buffer_id: int, shape: Optional[tuple] = None
+    ) -> np.ndarray:
+        """Returns a writable view into the shared memory of a buffer
+
+        Args:
+            buffer_id (int): id of the buffer
+            shape (Optional[tuple], optional): shape of the view, see ragged_view. Defaults to None (the shape of the buffers).
+
+        Returns:
+            np.ndarray: view with the shape and type of the buffer
+        """
 
-    def update_buffer(self, buffer_id: int, data: np.ndarray):
         buffer = np.ndarray(
             shape=self._shape,
             dtype=self._dtype,
-            buffer=self._buffers[buffer_id].buf,
+            buffer=self._buffer.buf,
+            offset=self._offsets[buffer_id],
         )
+        if shape is None or tuple(shape) == self._shape:
+            return buffer
+        return ragged_view(array=buffer, shape=tuple(shape))
+
+    def update_buffer(self, buffer_id: int, data: np.ndarray):
+        if self.ragged:
+            data = np.asarray(data)
+            self.update_shape(buffer_id=buffer_id, shape=data.shape)
+            buffer = self.get_writable_buffer(buffer_id=buffer_id, shape=data.shape)
+        else:
+            buffer = self.get_writable_buffer(buffer_id=buffer_id)
         buffer[:] = data[:]
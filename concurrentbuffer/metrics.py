@@ -0,0 +1,239 @@
+import struct
+import time
+from itertools import accumulate
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Optional, Sequence
+
+from concurrentbuffer.info import CACHE_LINE_SIZE
+
+COMMANDER_COUNTERS = ("messages", "batches", "speculated")
+# sums of the number of buffers per state, sampled by the commander for every batch
+STATE_COUNTERS = ("free", "available", "reserved", "processing")
+PRODUCER_COUNTERS = ("produced", "failed")
+CONSUMER_COUNTERS = ("consumed",)
+COUNTERS = (
+    *COMMANDER_COUNTERS,
+    "state_samples",
+    *STATE_COUNTERS,
+    *PRODUCER_COUNTERS,
+    *CONSUMER_COUNTERS,
+)
+
+LATENCIES = (
+    # commander
+    "create_messages",
+    # producers
+    "create_data",
+    "write",
+    # consumer
+    "wait",
+    "read",
+)
+
+_VALUE = struct.Struct("q")
+# count, total and maximum of a latency
+_LATENCY_HEADER = struct.Struct("qqq")
+
+# latencies are counted in buckets of powers of two nanoseconds, the last bucket holds everything above
+HISTOGRAM_BUCKETS = 40
+_ITEMSIZE = _VALUE.size
+# the header followed by the buckets
+_LATENCY_SIZE = 3 + HISTOGRAM_BUCKETS
+_COUNTER_INDICES = {name: index for index, name in enumerate(COUNTERS)}
+_LATENCY_INDICES = {
+    name: len(COUNTERS) + index * _LATENCY_SIZE for index, name in enumerate(LATENCIES)
+}
+_ROW_SIZE = len(COUNTERS) + len(LATENCIES) * _LATENCY_SIZE
+# every worker writes its own row, rows are on separate cache lines
+_ROW_NBYTES = -(-_ROW_SIZE * _ITEMSIZE // CACHE_LINE_SIZE) * CACHE_LINE_SIZE
+
+PERCENTILES = (50, 90, 99)
+
+
+class WorkerMetrics:
+    """Counters and latency histograms of a single worker (the commander, a producer or the consumer) in shared memory.
+
+    Only the worker writes its row, so updates need no lock. Readers may see
+    a row that is partially updated, which is fine for statistics.
+    """
+
+    def __init__(self, buffer: SharedMemory, offset: int):
+        """Init
+
+        Args:
+            buffer (SharedMemory): memory of the BufferMetrics
+            offset (int): offset in bytes of the row of the worker
+        """
+
+        self._buffer = buffer
+        self._offset = offset
+
+    def _add(self, buf: memoryview, offset: int, value: int):
+        _VALUE.pack_into(buf, offset, _VALUE.unpack_from(buf, offset)[0] + value)
+
+    def count(self, name: str, value: int = 1):
+        """Adds value to a counter
+
+        Args:
+            name (str): one of COUNTERS
+            value (int, optional): the value to add. Defaults to 1.
+        """
+
+        self._add(
+            self._buffer.buf, self._offset + _COUNTER_INDICES[name] * _ITEMSIZE, value
+        )
+
+    def record(self, name: str, start: int):
+        """Records the time since start in a latency histogram
+
+        Args:
+            name (str): one of LATENCIES
+            start (int): start time from time.perf_counter_ns
+        """
+
+        nanoseconds = time.perf_counter_ns() - start
+        buf = self._buffer.buf
+        offset = self._offset + _LATENCY_INDICES[name] * _ITEMSIZE
+        count, total, maximum = _LATENCY_HEADER.unpack_from(buf, offset)
+        _LATENCY_HEADER.pack_into(
+            buf, offset, count + 1, total + nanoseconds, max(maximum, nanoseconds)
+        )
+        bucket = min(nanoseconds.bit_length(), HISTOGRAM_BUCKETS - 1)
+        self._add(buf, offset + (3 + bucket) * _ITEMSIZE, 1)
+
+    def stats(self, counters: Sequence[str] = COUNTERS) -> dict:
+        """Returns counters and a summary of every latency histogram that has been recorded
+
+        Args:
+            counters (Sequence[str], optional): the counters to return. Defaults to COUNTERS.
+
+        Returns:
+            dict: the value of every counter and the summary of every recorded latency
+        """
+
+        return _row_stats(self._values(), counters=counters)
+
+    def _values(self) -> Sequence[int]:
+        return struct.unpack_from(f"{_ROW_SIZE}q", self._buffer.buf, self._offset)
+
+
+def _row_stats(values: Sequence[int], counters: Sequence[str]) -> dict:
+    stats = {name: values[_COUNTER_INDICES[name]] for name in counters}
+    for name in LATENCIES:
+        index = _LATENCY_INDICES[name]
+        if values[index]:
+            stats[name] = _summary(values[index : index + _LATENCY_SIZE])
+    return stats
+
+
+def _merge_rows(rows: Sequence[Sequence[int]]) -> List[int]:
+    # counters, latency counts, totals and buckets add up, the maximum of a latency is the largest one
+    merged = [sum(column) for column in zip(*rows)]
+    for index in _LATENCY_INDICES.values():
+        merged[index + 2] = max(row[index + 2] for row in rows)
+    return merged
+
+
+def _summary(values: List[int]) -> Dict[str, float]:
+    count, total, maximum = values[:3]
+    summary = {
+        "count": count,
+        "total_seconds": total / 1e9,
+        "mean_seconds": total / count / 1e9,
+        "max_seconds": maximum / 1e9,
+    }
+    buckets = values[3:]
+    for percentile in PERCENTILES:
+        # the upper bound of the bucket that contains the percentile
+        rank = percentile / 100 * count
+        bucket = next(
+            (bucket for bucket, cumulative in enumerate(accumulate(buckets)) if cumulative >= rank),
+            len(buckets) - 1,
+        )
+        summary[f"p{percentile}_seconds"] = min(2**bucket, maximum) / 1e9
+    return summary
+
+
+class BufferMetrics:
+    """Metrics of the commander, every producer and every consumer in shared memory, see WorkerMetrics"""
+
+    def __init__(self, cpus: int, buffer: SharedMemory, offset: int = 0, consumers: int = 1):
+        """Init
+
+        Args:
+            cpus (int): number of producer processes
+            buffer (SharedMemory): memory for the metrics, should be at least BufferMetrics.nbytes(cpus, consumers) large
+            offset (int, optional): offset in bytes of the metrics within the buffer. Defaults to 0.
+            consumers (int, optional): maximum number of consumers, every consumer writes its own row. Defaults to 1.
+        """
+
+        self._cpus = cpus
+        self._buffer = buffer
+        self._offset = offset
+        self._consumers = consumers
+        nbytes = self.nbytes(cpus, consumers=consumers)
+        self._buffer.buf[offset : offset + nbytes] = bytes(nbytes)
+
+    @staticmethod
+    def nbytes(cpus: int, consumers: int = 1) -> int:
+        """Size in bytes needed for the metrics
+
+        Args:
+            cpus (int): number of producer processes
+            consumers (int, optional): maximum number of consumers. Defaults to 1.
+
+        Returns:
+            int: size in bytes
+        """
+        return (cpus + 1 + consumers) * _ROW_NBYTES
+
+    def _worker(self, index: int) -> WorkerMetrics:
+        return WorkerMetrics(buffer=self._buffer, offset=self._offset + index * _ROW_NBYTES)
+
+    @property
+    def commander(self) -> WorkerMetrics:
+        return self._worker(0)
+
+    def producer(self, index: int) -> WorkerMetrics:
+        return self._worker(1 + index)
+
+    @property
+    def consumers(self) -> int:
+        return self._consumers
+
+    def consumer(self, index: int = 0) -> WorkerMetrics:
+        return self._worker(self._cpus + 1 + index)
+
+    def stats(self, states: Optional[Dict[str, int]] = None) -> dict:
+        """Returns the metrics of all workers
+
+        Args:
+            states (Optional[Dict[str, int]], optional): current number of buffers per state, added to the result. Defaults to None.
+
+        Returns:
+            dict: the stats of the commander, the producers and the consumers together (see WorkerMetrics.stats) and the mean number of buffers per state
+        """
+
+        samples = self.commander.stats(counters=("state_samples", *STATE_COUNTERS))
+        stats = {
+            "commander": self.commander.stats(counters=COMMANDER_COUNTERS),
+            "producers": [
+                self.producer(index).stats(counters=PRODUCER_COUNTERS)
+                for index in range(self._cpus)
+            ],
+            "consumer": _row_stats(
+                _merge_rows(
+                    [self.consumer(index)._values() for index in range(self._consumers)]
+                ),
+                counters=CONSUMER_COUNTERS,
+            ),
+            "mean_states": {
+                state: samples[state] / samples["state_samples"]
+                if samples["state_samples"]
+                else 0.0
+                for state in STATE_COUNTERS
+            },
+        }
+        if states is not None:
+            stats["states"] = states
+        return stats
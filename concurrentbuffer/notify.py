@@ -0,0 +1,106 @@
+import asyncio
+import os
+from multiprocessing.context import BaseContext
+
+_NOTIFICATION = b"\0"
+_DRAIN_NBYTES = 4096
+
+
+class AvailableNotifier:
+    """Pipe that becomes readable when a buffer became available.
+
+    Producers write a byte after every buffer that became available, the
+    consumer waits until the pipe is readable (e.g., with an event loop) and
+    drains it before it looks at the states again. Writes never block: a full
+    pipe is already readable, so a notification that does not fit is not
+    needed. Not supported on Windows.
+
+    Consumers in an event loop wait with wait: a single reader per event loop
+    drains the pipe and wakes all the consumers that wait in that loop, such
+    that consumers of a ConsumerGroup do not take each other's notifications.
+    """
+
+    def __init__(self, context: BaseContext):
+        """Init
+
+        Args:
+            context (BaseContext): multiprocessing context used to create the pipe
+        """
+
+        self._reader, self._writer = context.Pipe(duplex=False)
+        self._non_blocking = False
+        # the futures of the consumers that wait in every event loop
+        self._waiters = {}
+
+    def __getstate__(self):
+        # every process sets its own end to non-blocking and has its own event loops
+        state = self.__dict__.copy()
+        state["_non_blocking"] = False
+        state["_waiters"] = {}
+        return state
+
+    def _set_non_blocking(self):
+        if not self._non_blocking:
+            os.set_blocking(self._reader.fileno(), False)
+            os.set_blocking(self._writer.fileno(), False)
+            self._non_blocking = True
+
+    def fileno(self) -> int:
+        """File descriptor of the read end, readable when a buffer became available"""
+
+        self._set_non_blocking()
+        return self._reader.fileno()
+
+    def notify(self):
+        """Signals that a buffer became available"""
+
+        self._set_non_blocking()
+        try:
+            os.write(self._writer.fileno(), _NOTIFICATION)
+        except BlockingIOError:
+            pass
+
+    def drain(self):
+        """Removes all pending notifications"""
+
+        self._set_non_blocking()
+        try:
+            while os.read(self._reader.fileno(), _DRAIN_NBYTES):
+                pass
+        except BlockingIOError:
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """Waits in the running event loop until a buffer became available
+
+        Args:
+            timeout (float): maximum time in seconds to wait
+
+        Returns:
+            bool: whether a buffer became available, False when the timeout expired
+        """
+
+        loop = asyncio.get_running_loop()
+        waiters = self._waiters.setdefault(loop, set())
+        if not waiters:
+            loop.add_reader(self.fileno(), self._wake, loop)
+        waiter = loop.create_future()
+        waiters.add(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        finally:
+            waiters.discard(waiter)
+            if not waiters:
+                del self._waiters[loop]
+                loop.remove_reader(self.fileno())
+        return waiter.done()
+
+    def _wake(self, loop: asyncio.AbstractEventLoop):
+        self.drain()
+        for waiter in self._waiters.get(loop, ()):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def close(self):
+        self._reader.close()
+        self._writer.close()
@@ -0,0 +1,106 @@
+from typing import Optional, Sequence
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.factory import BufferFactory
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.iterator import BufferIterator
+from concurrentbuffer.producer import Producer
+from concurrentbuffer.system import BufferSystem
+
+
+class BufferPool:
+    """Keeps the producer processes and the shared memory alive between iterators
+
+    Every iterator attaches its own commander (and optionally a new producer
+    or new shapes) to the running producer processes. Stopping the iterator
+    only stops its commander. When new shapes do not fit in the allocated
+    buffers, the pool starts again with buffers of the new shapes.
+    """
+
+    def __init__(
+        self, buffer_system: BufferSystem, buffer_info: BufferInfo, producer: Producer
+    ):
+        """Init
+
+        Args:
+            buffer_system (BufferSystem): the system information
+            buffer_info (BufferInfo): info about count, shape and type of the buffers
+            producer (Producer): the producer that is used until another one is given to iterator
+        """
+
+        self._buffer_system = buffer_system
+        self._buffer_info = buffer_info
+        self._producer = producer
+        self._buffer_factory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    @property
+    def buffer_factory(self) -> Optional[BufferFactory]:
+        return self._buffer_factory
+
+    def iterator(
+        self,
+        commander: Commander,
+        producer: Optional[Producer] = None,
+        buffer_shapes: Optional[Sequence[tuple]] = None,
+        buffer_iterator_class: type = BufferIterator,
+        **kwargs
+    ) -> BufferIterator:
+        """Creates an iterator for a new commander, a previous iterator of the pool should not be used anymore
+
+        Args:
+            commander (Commander): commander of the iterator
+            producer (Optional[Producer], optional): a new producer. Defaults to None (keep the producer).
+            buffer_shapes (Optional[Sequence[tuple]], optional): new shapes of the data. Defaults to None (keep the shapes).
+            buffer_iterator_class (type, optional): class of the iterator. Defaults to BufferIterator.
+
+        Returns:
+            BufferIterator: the iterator, stopping it keeps the pool alive
+        """
+
+        if producer is not None:
+            self._producer = producer
+
+        if self._buffer_factory is not None and (
+            buffer_shapes is None or self._buffer_factory.fits(buffer_shapes)
+        ):
+            self._buffer_factory.attach(
+                commander=commander, producer=producer, buffer_shapes=buffer_shapes
+            )
+        else:
+            self.shutdown()
+            if buffer_shapes is not None:
+                self._buffer_info = BufferInfo(
+                    shapes=buffer_shapes,
+                    count=self._buffer_info.count,
+                    dtype=self._buffer_info.dtypes,
+                    alignment=self._buffer_info.alignment,
+                    ragged=self._buffer_info.ragged,
+                    huge_pages=self._buffer_info.huge_pages,
+                )
+            self._buffer_factory = BufferFactory(
+                buffer_system=self._buffer_system,
+                buffer_info=self._buffer_info,
+                commander=commander,
+                producer=self._producer,
+            )
+
+        return buffer_iterator_class(
+            buffer_factory=self._buffer_factory, shutdown_factory=False, **kwargs
+        )
+
+    def shutdown(self, timeout: float = 0.0):
+        """Stops all processes, see BufferFactory.shutdown
+
+        Args:
+            timeout (float, optional): maximum time in seconds to wait for the processes to stop by themselves. Defaults to 0.0 (terminate right away).
+        """
+
+        if self._buffer_factory is not None:
+            self._buffer_factory.shutdown(timeout=timeout)
+            self._buffer_factory = None
@@ -1,4 +1,5 @@
 from abc import ABC
+from multiprocessing import ProcessError
 
 
 class SubProcessObject(ABC):
@@ -8,3 +9,38 @@ class SubProcessObject(ABC):
         """[summary]
         """
         pass
+
+    def teardown(self):  # noqa: B027 deliberately a no-op hook, only objects with resources override it
+        """Releases the resources of build (e.g., file handles), called in the process when it stops gracefully
+
+        Does nothing by default.
+        """
+
+
+class ProducerError(ProcessError):
+    """The data of a message could not be produced
+
+    Raised in the consumer, the traceback of the producer is included in the message.
+    """
+
+    def __init__(self, message: dict, remote_traceback: str):
+        super().__init__(f"failed to produce data for message {message}\n\n{remote_traceback}")
+        self.message = message
+        self.remote_traceback = remote_traceback
+
+    def __reduce__(self):
+        return type(self), (self.message, self.remote_traceback)
+
+
+class CommanderError(ProcessError):
+    """The commander could not create or send messages, its process stopped
+
+    Raised in the consumer, the traceback of the commander is included in the message.
+    """
+
+    def __init__(self, remote_traceback: str):
+        super().__init__(f"the commander stopped sending messages\n\n{remote_traceback}")
+        self.remote_traceback = remote_traceback
+
+    def __reduce__(self):
+        return type(self), (self.remote_traceback,)
@@ -1,6 +1,10 @@
+import copy
 import sys
+import time
+import traceback
 from abc import abstractmethod
 from multiprocessing import Queue
+from multiprocessing.synchronize import Barrier
 
 WINDOWS = sys.platform == "win32"
 
@@ -8,20 +12,41 @@ if not WINDOWS:
     from multiprocessing.context import (
         ForkContext,
         ForkProcess,
+        ForkServerContext,
+        ForkServerProcess,
         SpawnContext,
         SpawnProcess,
     )
 else:
     from multiprocessing.context import SpawnContext, SpawnProcess
 
-from typing import List
+from threading import Thread
+from typing import Any, Iterable, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 
-from concurrentbuffer.commander import BUFFER_ID_KEY, STOP_MESSAGE
-from concurrentbuffer.memory import BufferMemory
-from concurrentbuffer.process import SubProcessObject
+from concurrentbuffer.affinity import set_cpu_affinity
+from concurrentbuffer.commander import (
+    BUFFER_ID_KEY,
+    RESERVATION_KEY,
+    STOP_MESSAGE,
+    TIMEOUT_KEY,
+)
+from concurrentbuffer.memory import BufferMemory, ragged_view
+from concurrentbuffer.metrics import WorkerMetrics
+from concurrentbuffer.notify import AvailableNotifier
+from concurrentbuffer.process import ProducerError, SubProcessObject
+from concurrentbuffer.ring import MessageRing
 from concurrentbuffer.state import BufferStateMemory
+from concurrentbuffer.thread import ThreadContext
+
+# this message changes the configuration of a producer process to the next one of the configure queue, see ProducerProcess._configure
+CONFIGURE_MESSAGE = "/configure"
+
+# marks an unused entry of the reservations that producer processes are working on
+NO_BUFFER_ID = -1
+# an entry of the reservations that producer processes are working on is (buffer_id, sequence, generation)
+RESERVATION_FIELDS = 3
 
 
 class Producer(SubProcessObject):
@@ -39,6 +64,82 @@ class Producer(SubProcessObject):
         """
 
 
+class InPlaceProducer(Producer):
+    """Abstract producer class used to create custom producers that write their data directly into the shared memory buffers"""
+
+    @abstractmethod
+    def create_data_into(
+        self, message: dict, out_arrays: List[np.ndarray]
+    ) -> Optional[Sequence[Optional[tuple]]]:
+        """This method creates the data based on a message and writes it into the given arrays.
+
+        Args:
+            message (dict): the message that includes instruction info for the creation of the data.
+            out_arrays (List[np.ndarray]): writable views into the reserved buffer, one for each buffer shape.
+
+        Returns:
+            Optional[Sequence[Optional[tuple]]]: the actual shape of every ragged output, the data is out_array[:rows], None means the full shape. Shapes that differ from the out array beyond the first dimension raise a ValueError, return those from create_shapes instead.
+        """
+
+    def create_shapes(self, message: dict) -> Optional[Sequence[Optional[tuple]]]:
+        """This method returns the shapes of the data of a message before it is created, create_data_into then receives views with these shapes.
+
+        Needed for ragged outputs whose shape differs from the capacity beyond the first dimension, because out_array[:rows, :cols] is not where the data of a ragged buffer is stored (see concurrentbuffer.memory.ragged_view).
+
+        Args:
+            message (dict): the message that includes instruction info for the creation of the data.
+
+        Returns:
+            Optional[Sequence[Optional[tuple]]]: the shape of every output, None means the full shape. Defaults to None (all full shapes).
+        """
+
+        return None
+
+    def create_data(self, message: dict) -> np.ndarray:
+        raise NotImplementedError(
+            f"{type(self).__name__} writes its data in place, use create_data_into"
+        )
+
+
+def _shaped_views(
+    arrays: Sequence[np.ndarray], shapes: Optional[Sequence[Optional[tuple]]]
+) -> List[np.ndarray]:
+    if shapes is None:
+        return list(arrays)
+    return [
+        array if shape is None else ragged_view(array, tuple(shape))
+        for array, shape in zip(arrays, shapes)
+    ]
+
+
+def create_data_into(
+    producer: InPlaceProducer, message: dict, arrays: Sequence[np.ndarray]
+) -> List[np.ndarray]:
+    """Lets an in-place producer write the data of a message into arrays with the capacity shapes
+
+    Args:
+        producer (InPlaceProducer): the producer
+        message (dict): the message
+        arrays (Sequence[np.ndarray]): C-contiguous arrays with the capacity shapes
+
+    Raises:
+        ValueError: create_data_into returned a shape that differs from its out array beyond the first dimension
+
+    Returns:
+        List[np.ndarray]: views into the arrays with the shapes of the data
+    """
+
+    out_arrays = _shaped_views(arrays, producer.create_shapes(message=message))
+    shapes = producer.create_data_into(message=message, out_arrays=out_arrays)
+    for index, (out_array, shape) in enumerate(zip(out_arrays, shapes or ())):
+        if shape is not None and tuple(shape)[1:] != out_array.shape[1:]:
+            raise ValueError(
+                f"shape {tuple(shape)} of output {index} differs from its out array {out_array.shape} beyond the first dimension, "
+                "the data of a ragged buffer is not stored at out_array[:rows, :cols], return the shapes from create_shapes instead"
+            )
+    return _shaped_views(out_arrays, shapes)
+
+
 class ProducerProcess:
     """Process that creates data and puts in into a shared memory buffer."""
 
@@ -48,7 +149,20 @@ class ProducerProcess:
         buffer_shapes: tuple,
         buffer_state_memory: BufferStateMemory,
         buffer_memories: List[BufferMemory],
-        message_queue: Queue,
+        message_queue: Union[Queue, MessageRing],
+        available_notifier: Optional[AvailableNotifier] = None,
+        configure_barrier: Optional[Barrier] = None,
+        configure_queue: Optional[Queue] = None,
+        error_queue: Optional[Queue] = None,
+        max_retries: int = 0,
+        producer_index: int = 0,
+        producer_reservations: Optional[Any] = None,
+        message_batch_size: int = 1,
+        message_timeout: Optional[float] = None,
+        metrics: Optional[WorkerMetrics] = None,
+        cpu_affinity: Optional[Iterable[int]] = None,
+        prefault: bool = False,
+        producer_started: Optional[Any] = None,
     ):
         """Initialization
 
@@ -56,7 +170,20 @@ class ProducerProcess:
             buffer_shape (tuple): shape of the data in the buffers, needs to be used when creating new data
             buffer_state_memory (BufferStateMemory): buffer that contains the states of the buffer memory
             buffer_memory (BufferMemory): contains the buffers
-            message_queue (Queue): queue that receives messages from a MessageProcess that can be used to construct data
+            message_queue (Union[Queue, MessageRing]): queue that receives batches of messages from a CommanderProcess that can be used to construct data
+            available_notifier (Optional[AvailableNotifier], optional): notified after every buffer that became available. Defaults to None.
+            configure_barrier (Optional[Barrier], optional): barrier for all producer processes, needed to receive configure messages. Defaults to None.
+            configure_queue (Optional[Queue], optional): receives the configuration (e.g., a new producer and buffer memories) of every configure message, such that large configurations do not have to fit in the message queue. Defaults to None.
+            error_queue (Optional[Queue], optional): receives (sequence, ProducerError) of data that failed to be produced, its buffer is marked as failed. Defaults to None (the process raises).
+            max_retries (int, optional): number of times the creation of data is tried again before it fails. Defaults to 0.
+            producer_index (int, optional): index of the process in producer_reservations. Defaults to 0.
+            producer_reservations (Optional[Any], optional): shared array with message_batch_size entries of RESERVATION_FIELDS per process, holds the reservations that the process is working on such that they can be failed when the process dies. Defaults to None.
+            message_batch_size (int, optional): maximum number of messages in a batch. Defaults to 1.
+            message_timeout (Optional[float], optional): deadline in seconds for producing a message, see BufferSystem.message_timeout. Defaults to None (no deadlines).
+            metrics (Optional[WorkerMetrics], optional): counts the produced and failed data and times the creation of the data and the copy into the buffer. Defaults to None.
+            cpu_affinity (Optional[Iterable[int]], optional): CPUs the process runs on. Defaults to None (not restricted).
+            prefault (bool, optional): touch every page of the buffers before the first message, see BufferSystem.prefault. Defaults to False.
+            producer_started (Optional[Any], optional): shared array with an entry per process that is set to 1 after the producer has been built, see BufferFactory.check_producer_processes. Defaults to None.
         """
 
         self.daemon = True
@@ -66,15 +193,212 @@ class ProducerProcess:
         self._buffer_state_memory = buffer_state_memory
         self._buffer_memories = buffer_memories
         self._message_queue = message_queue
+        self._available_notifier = available_notifier
+        self._configure_barrier = configure_barrier
+        self._configure_queue = configure_queue
+        self._error_queue = error_queue
+        self._max_retries = max_retries
+        self._producer_index = producer_index
+        self._producer_reservations = producer_reservations
+        self._message_batch_size = message_batch_size
+        self._message_timeout = message_timeout
+        self._metrics = metrics
+        self._cpu_affinity = cpu_affinity
+        self._prefault = prefault
+        self._producer_started = producer_started
+        # arrays in which in-place producers create data when there are deadlines
+        self._local_arrays = None
 
     def run(self):
+        set_cpu_affinity(self._cpu_affinity)
+        if self._prefault:
+            self._prefault_buffers()
         self._producer.build()
-        for message in iter(self._message_queue.get, STOP_MESSAGE):
+        if self._producer_started is not None:
+            self._producer_started[self._producer_index] = 1
+        for messages in iter(self._message_queue.get, STOP_MESSAGE):
+            if messages == CONFIGURE_MESSAGE:
+                self._configure(**self._configure_queue.get())
+                continue
+            self._track_buffer_ids(messages)
+            for index, message in enumerate(messages):
+                self._produce(message=message)
+                self._untrack_buffer_id(index)
+                if self._available_notifier is not None:
+                    self._available_notifier.notify()
+        self._producer.teardown()
+
+    def _prefault_buffers(self):
+        # every process maps all buffers, starting at a different buffer such that the pages are allocated in parallel
+        count = self._buffer_state_memory.count
+        producers = (
+            1
+            if self._producer_reservations is None
+            else len(self._producer_reservations)
+            // (RESERVATION_FIELDS * self._message_batch_size)
+        )
+        start = self._producer_index * count // producers
+        for index in range(count):
+            for buffer_memory in self._buffer_memories:
+                buffer_memory.touch(buffer_id=(start + index) % count)
+
+    def _track_buffer_ids(self, messages: List[dict]):
+        if self._producer_reservations is None:
+            return
+        start = self._producer_index * self._message_batch_size
+        for index, message in enumerate(messages):
             buffer_id = message[BUFFER_ID_KEY]
+            # messages that have not been started are not completed by anyone else, so their reservation did not change
+            sequence, generation = message.get(
+                RESERVATION_KEY,
+                (
+                    self._buffer_state_memory.get_sequence(buffer_id=buffer_id),
+                    self._buffer_state_memory.get_generation(),
+                ),
+            )
+            position = RESERVATION_FIELDS * (start + index)
+            for offset, value in enumerate((buffer_id, sequence, generation)):
+                self._producer_reservations[position + offset] = value
+
+    def _untrack_buffer_id(self, index: int):
+        if self._producer_reservations is None:
+            return
+        start = self._producer_index * self._message_batch_size
+        self._producer_reservations[RESERVATION_FIELDS * (start + index)] = NO_BUFFER_ID
+
+    def _produce(self, message: dict):
+        buffer_id = message[BUFFER_ID_KEY]
+        reservation = None
+        if self._message_timeout is not None:
+            reservation = self._start_deadline(buffer_id=buffer_id, message=message)
+            if reservation is None:
+                # a speculative duplicate of data that has been completed
+                return
+
+        data, error = self._create_with_retries(
+            buffer_id=buffer_id, message=message, reservation=reservation
+        )
+
+        if reservation is not None:
+            if not self._buffer_state_memory.claim_buffer_id(buffer_id, *reservation):
+                return
+            if error is None:
+                self._write_data(buffer_id=buffer_id, data=data)
+
+        if error is None:
+            self._complete(buffer_id=buffer_id)
+        else:
+            self._fail(buffer_id=buffer_id, error=error)
+
+    def _create_with_retries(
+        self, buffer_id: int, message: dict, reservation: Optional[Tuple[int, int]]
+    ) -> Tuple[Optional[Sequence[np.ndarray]], Optional[ProducerError]]:
+        error = None
+        for _ in range(self._max_retries + 1):
+            try:
+                # with deadlines the data is created locally, only the first claim writes the buffer
+                if reservation is None:
+                    return self._create_data(buffer_id=buffer_id, message=message), None
+                return self._create_local_data(message=message), None
+            except Exception:
+                if self._error_queue is None:
+                    raise
+                error = ProducerError(
+                    message=message, remote_traceback=traceback.format_exc()
+                )
+        return None, error
+
+    def _complete(self, buffer_id: int):
+        # counted before the consumer can see the data
+        if self._metrics is not None:
+            self._metrics.count("produced")
+        self._buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+
+    def _fail(self, buffer_id: int, error: ProducerError):
+        if self._metrics is not None:
+            self._metrics.count("failed")
+        # the error is send before the buffer is failed, such that the consumer finds it
+        self._error_queue.put(
+            (self._buffer_state_memory.get_sequence(buffer_id=buffer_id), error)
+        )
+        self._buffer_state_memory.update_buffer_id_to_failed(buffer_id=buffer_id)
+
+    def _start_deadline(self, buffer_id: int, message: dict) -> Optional[Tuple[int, int]]:
+        reservation = message.get(RESERVATION_KEY)
+        if reservation is None:
+            reservation = (
+                self._buffer_state_memory.get_sequence(buffer_id=buffer_id),
+                self._buffer_state_memory.get_generation(),
+            )
+        if not self._buffer_state_memory.start_deadline(
+            buffer_id, *reservation, timeout=message.get(TIMEOUT_KEY, self._message_timeout)
+        ):
+            return None
+        return reservation
+
+    def _configure(
+        self,
+        producer: Optional[Producer] = None,
+        buffer_shapes: Optional[tuple] = None,
+        buffer_memories: Optional[List[BufferMemory]] = None,
+    ):
+        if producer is not None:
+            self._producer.teardown()
+            self._producer = producer
+            self._producer.build()
+        if buffer_shapes is not None:
+            self._buffer_shapes = buffer_shapes
+        if buffer_memories is not None:
+            self._buffer_memories = buffer_memories
+            self._local_arrays = None
+        # every producer process takes exactly one of the configure messages
+        self._configure_barrier.wait()
+
+    def _create_data(self, buffer_id: int, message: dict):
+        if isinstance(self._producer, InPlaceProducer):
+            arrays = [
+                buffer_memory.get_writable_buffer(buffer_id=buffer_id)
+                for buffer_memory in self._buffer_memories
+            ]
+            start = time.perf_counter_ns()
+            out_arrays = create_data_into(
+                producer=self._producer, message=message, arrays=arrays
+            )
+            if self._metrics is not None:
+                self._metrics.record("create_data", start)
+            for out_array, buffer_memory in zip(out_arrays, self._buffer_memories):
+                if buffer_memory.ragged:
+                    buffer_memory.update_shape(buffer_id=buffer_id, shape=out_array.shape)
+            return
+
+        self._write_data(buffer_id=buffer_id, data=self._create_local_data(message))
+
+    def _create_local_data(self, message: dict) -> Sequence[np.ndarray]:
+        start = time.perf_counter_ns()
+        if not isinstance(self._producer, InPlaceProducer):
             data = self._producer.create_data(message=message)
-            for idx, buffer_memory in enumerate(self._buffer_memories):
-                buffer_memory.update_buffer(buffer_id=buffer_id, data=data[idx])
-            self._buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+            if self._metrics is not None:
+                self._metrics.record("create_data", start)
+            return data
+
+        if self._local_arrays is None:
+            self._local_arrays = [
+                np.empty(buffer_memory.shape, dtype=buffer_memory.dtype)
+                for buffer_memory in self._buffer_memories
+            ]
+        out_arrays = create_data_into(
+            producer=self._producer, message=message, arrays=self._local_arrays
+        )
+        if self._metrics is not None:
+            self._metrics.record("create_data", start)
+        return out_arrays
+
+    def _write_data(self, buffer_id: int, data: Sequence[np.ndarray]):
+        start = time.perf_counter_ns()
+        for idx, buffer_memory in enumerate(self._buffer_memories):
+            buffer_memory.update_buffer(buffer_id=buffer_id, data=data[idx])
+        if self._metrics is not None:
+            self._metrics.record("write", start)
 
 
 class ProducerSpawnProcess(ProducerProcess, SpawnProcess):
@@ -85,6 +409,29 @@ class ProducerSpawnProcess(ProducerProcess, SpawnProcess):
         ProducerProcess.__init__(self, *args, **kwargs)
 
 
+class ProducerThread(ProducerProcess, Thread):
+    """Producer class based on a thread of the current process
+
+    Every thread builds and uses its own copy of the producer, like every
+    process gets its own producer when it is pickled or forked.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Thread.__init__(self)
+        ProducerProcess.__init__(self, *args, **kwargs)
+        self._producer = copy.deepcopy(self._producer)
+
+    def _configure(self, producer: Optional[Producer] = None, **configuration):
+        # the threads receive the same configure messages
+        if producer is not None:
+            producer = copy.deepcopy(producer)
+        super()._configure(producer=producer, **configuration)
+
+    def terminate(self):
+        """Threads can not be killed, the producer stops when it receives the stop message"""
+        self._message_queue.put(STOP_MESSAGE)
+
+
 if not WINDOWS:
 
     class ProducerForkProcess(ProducerProcess, ForkProcess):
@@ -94,14 +441,24 @@ if not WINDOWS:
             ForkProcess.__init__(self)
             ProducerProcess.__init__(self, *args, **kwargs)
 
+    class ProducerForkServerProcess(ProducerProcess, ForkServerProcess):
+        """Producer class based on multiprocessing forkserver context process"""
+
+        def __init__(self, *args, **kwargs):
+            ForkServerProcess.__init__(self)
+            ProducerProcess.__init__(self, *args, **kwargs)
+
     _CONCRETE_PRODUCER_CONTEXT_PROCESSES = {
         ForkContext: ProducerForkProcess,
+        ForkServerContext: ProducerForkServerProcess,
         SpawnContext: ProducerSpawnProcess,
+        ThreadContext: ProducerThread,
     }
 
 else:
     _CONCRETE_PRODUCER_CONTEXT_PROCESSES = {
         SpawnContext: ProducerSpawnProcess,
+        ThreadContext: ProducerThread,
     }
 
 
@@ -109,13 +466,13 @@ def get_producer_process_class_object(context: type) -> type:
     """Factory function for creating a process class object based on a specific context
 
     Args:
-        context (type): type of context (should be either ForkContext or SpawnContext)
+        context (type): type of context (should be either ForkContext, ForkServerContext, SpawnContext or ThreadContext)
 
     Raises:
         ValueError: context was not found in supported context processes
 
     Returns:
-        type: producer process with specific context (either ProducerForkProcess or ProducerSpawnProcess)
+        type: producer process with specific context (either ProducerForkProcess, ProducerForkServerProcess, ProducerSpawnProcess or ProducerThread)
     """
 
     try:
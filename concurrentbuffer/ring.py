@@ -0,0 +1,141 @@
+import pickle
+import queue
+import struct
+from multiprocessing.context import BaseContext
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Optional
+
+from concurrentbuffer.info import CACHE_LINE_SIZE
+
+# the head (read) and tail (write) counters live on separate cache lines
+_COUNTER = struct.Struct("q")
+_HEAD_OFFSET = 0
+_TAIL_OFFSET = CACHE_LINE_SIZE
+_HEADER_NBYTES = 2 * CACHE_LINE_SIZE
+# length of the message in a slot
+_LENGTH = struct.Struct("I")
+
+
+class MessageRing:
+    """Bounded queue of messages in shared memory.
+
+    Messages are pickled into a ring of fixed-size slots. Writers and readers
+    synchronize with semaphores only, there is no feeder thread and no pipe
+    like in multiprocessing.Queue. Supports multiple writers and multiple
+    readers.
+
+    Pickle is used instead of a compact binary encoding because the messages
+    are whatever dicts a commander creates. A batch of small messages pickles
+    into a few hundred bytes, and the cost of pickling is small next to the
+    pipe and the feeder thread that the ring avoids. Every slot has room for
+    message_nbytes bytes, so messages of unbounded size (e.g., the
+    configurations of the producers) are not send through the ring.
+    """
+
+    def __init__(
+        self,
+        context: BaseContext,
+        buffer: SharedMemory,
+        size: int,
+        message_nbytes: int,
+        offset: int = 0,
+    ):
+        """Init
+
+        Args:
+            context (BaseContext): multiprocessing context used to create the semaphores and locks
+            buffer (SharedMemory): memory for the ring, should be at least MessageRing.nbytes(size, message_nbytes) large
+            size (int): maximum number of messages in the ring
+            message_nbytes (int): maximum size in bytes of a pickled message
+            offset (int, optional): offset in bytes of the ring within the buffer. Defaults to 0.
+        """
+
+        self._buffer = buffer
+        self._size = size
+        self._message_nbytes = message_nbytes
+        self._head_offset = offset + _HEAD_OFFSET
+        self._tail_offset = offset + _TAIL_OFFSET
+        self._slots_offset = offset + _HEADER_NBYTES
+        self._slot_nbytes = _LENGTH.size + message_nbytes
+
+        self._empty_slots = context.Semaphore(size)
+        self._full_slots = context.Semaphore(0)
+        self._put_lock = context.Lock()
+        self._get_lock = context.Lock()
+
+        _COUNTER.pack_into(self._buffer.buf, self._head_offset, 0)
+        _COUNTER.pack_into(self._buffer.buf, self._tail_offset, 0)
+
+    @staticmethod
+    def nbytes(size: int, message_nbytes: int) -> int:
+        """Size in bytes needed for a ring
+
+        Args:
+            size (int): maximum number of messages in the ring
+            message_nbytes (int): maximum size in bytes of a pickled message
+
+        Returns:
+            int: size in bytes
+        """
+        return _HEADER_NBYTES + size * (_LENGTH.size + message_nbytes)
+
+    def _slot_offset(self, index: int) -> int:
+        return self._slots_offset + (index % self._size) * self._slot_nbytes
+
+    def put(self, message: Any, timeout: Optional[float] = None):
+        """Puts a message in the ring, blocks while the ring is full
+
+        Args:
+            message (Any): picklable message
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Raises:
+            ValueError: the pickled message does not fit in a slot
+            queue.Full: the timeout expired
+        """
+
+        payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self._message_nbytes:
+            raise ValueError(
+                f"message of {len(payload)} bytes does not fit in {self._message_nbytes} bytes, increase message_nbytes"
+            )
+
+        if not self._empty_slots.acquire(timeout=timeout):
+            raise queue.Full
+
+        with self._put_lock:
+            (tail,) = _COUNTER.unpack_from(self._buffer.buf, self._tail_offset)
+            slot_offset = self._slot_offset(tail)
+            _LENGTH.pack_into(self._buffer.buf, slot_offset, len(payload))
+            start = slot_offset + _LENGTH.size
+            self._buffer.buf[start : start + len(payload)] = payload
+            _COUNTER.pack_into(self._buffer.buf, self._tail_offset, tail + 1)
+
+        self._full_slots.release()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Takes the oldest message from the ring, blocks while the ring is empty
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Raises:
+            queue.Empty: the timeout expired
+
+        Returns:
+            Any: the message
+        """
+
+        if not self._full_slots.acquire(timeout=timeout):
+            raise queue.Empty
+
+        with self._get_lock:
+            (head,) = _COUNTER.unpack_from(self._buffer.buf, self._head_offset)
+            slot_offset = self._slot_offset(head)
+            (length,) = _LENGTH.unpack_from(self._buffer.buf, slot_offset)
+            start = slot_offset + _LENGTH.size
+            payload = bytes(self._buffer.buf[start : start + length])
+            _COUNTER.pack_into(self._buffer.buf, self._head_offset, head + 1)
+
+        self._empty_slots.release()
+        return pickle.loads(payload)
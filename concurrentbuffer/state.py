@@ -1,8 +1,9 @@
+import time
 from enum import Enum
 from functools import wraps
-from multiprocessing import Lock
 from multiprocessing.shared_memory import SharedMemory
-from typing import Optional
+from multiprocessing.synchronize import Condition
+from typing import List, Optional
 
 import numpy as np
 
@@ -16,51 +17,288 @@ class BufferState(Enum):
     PROCESSING = 4
 
 
+_NO_BUFFER_ID = -1
+_LINKS_DTYPE = np.dtype("int32")
+_SEQUENCE_DTYPE = np.dtype("int64")
+_DEADLINE_DTYPE = np.dtype("float64")
+
+# bits of the flags of a buffer, cleared when the buffer is reserved
+_FAILED = 1
+_CLAIMED = 2
+_SPECULATED = 4
+
+
 def _lock_state_buffer(method):
     @wraps(method)
     def wrapper(self, *args, **kwargs):
-        self.lock.acquire()
-        out = method(self, *args, **kwargs)
-        self.lock.release()
-        return out
+        with self.lock:
+            return method(self, *args, **kwargs)
 
     return wrapper
 
 
 class BufferStateMemory:
-    """Class that contains the states of buffers"""
+    """Class that contains the states of buffers
+
+    Next to the states, the memory holds a doubly linked list per state
+    (first in, first out) such that finding, reserving and releasing a buffer
+    are O(1) operations.
+
+    A buffer that failed to be produced is available with a failed flag, see
+    update_buffer_id_to_failed.
+
+    Every reserved buffer can have a deadline (time.monotonic, which is the
+    same clock in all processes) by which it should be produced, see
+    start_deadline and get_expired_buffer_ids. Whoever claims the buffer first
+    (a producer, a speculative duplicate or a failure) completes it, see
+    claim_buffer_id.
 
-    def __init__(self, count: int, dtype: type, lock: Lock, buffer: SharedMemory):
+    Reserving a buffer assigns it the next sequence number, the order in which
+    the commander created the messages. An order table maps every sequence
+    number to its buffer_id such that buffers can be consumed in order without
+    any other communication with the commander.
+    """
+
+    def __init__(
+        self,
+        count: int,
+        dtype: type,
+        lock: Condition,
+        buffer: SharedMemory,
+        offset: int = 0,
+    ):
         """Init
 
         Args:
             count (int): count of buffers
             dtype (type): type of buffers
-            buffer (SharedMemory): buffer that contains states
+            lock (Condition): guards the states and is notified when a buffer becomes free or available
+            buffer (SharedMemory): buffer that contains states, should be at least BufferStateMemory.nbytes(count, dtype) large
+            offset (int, optional): offset in bytes of the states within the buffer. Defaults to 0.
         """
 
         self._count = count
         self._dtype = dtype
         self._buffer = buffer
+        self._offset = offset
         self._lock = lock
 
-        for buffer_id in range(self._count):
-            self.update_buffer_id_to_free(buffer_id=buffer_id)
+        self._flags_offset = offset + count * np.dtype(dtype).itemsize
+        self._sequences_offset = offset + self._states_nbytes(count=count, dtype=dtype)
+        self._deadlines_offset = self._sequences_offset + self._sequences_nbytes(count)
+        self._links_offset = self._deadlines_offset + count * _DEADLINE_DTYPE.itemsize
+        self._heads = 2 * count
+        self._tails = self._heads + len(BufferState)
+        self._sizes = self._tails + len(BufferState)
+        self._order = self._sizes + len(BufferState)
+        # twice the count such that looking ahead up to count sequences never wraps onto an unconsumed sequence
+        self._order_size = 2 * count
+        self._views = None
+
+        self.reset()
+
+    def __getstate__(self):
+        # views into the shared memory are created again in every process
+        state = self.__dict__.copy()
+        state["_views"] = None
+        return state
+
+    @staticmethod
+    def _states_nbytes(count: int, dtype: type) -> int:
+        # the states followed by the flags of every buffer_id
+        nbytes = count * np.dtype(dtype).itemsize + count
+        return -(-nbytes // _SEQUENCE_DTYPE.itemsize) * _SEQUENCE_DTYPE.itemsize
+
+    @staticmethod
+    def _sequences_nbytes(count: int) -> int:
+        # the next sequence number, the sequence number of every buffer_id, the next claimed sequence number and the generation
+        return (count + 3) * _SEQUENCE_DTYPE.itemsize
+
+    @staticmethod
+    def nbytes(count: int, dtype: type) -> int:
+        """Size in bytes needed to store the states of count buffers
+
+        Args:
+            count (int): count of buffers
+            dtype (type): type of the states
+
+        Returns:
+            int: size in bytes
+        """
+
+        links = 4 * count + 3 * len(BufferState)
+        return (
+            BufferStateMemory._states_nbytes(count=count, dtype=dtype)
+            + BufferStateMemory._sequences_nbytes(count)
+            + count * _DEADLINE_DTYPE.itemsize
+            + links * _LINKS_DTYPE.itemsize
+        )
+
+    @property
+    def count(self) -> int:
+        return self._count
 
     @property
     def lock(self):
         return self._lock
 
-    def get_state_buffer(self):
-        return np.ndarray(
-            shape=self._count,
-            dtype=self._dtype,
-            buffer=self._buffer.buf,
-        )
+    def _get_views(self):
+        if self._views is None:
+            states = np.ndarray(
+                shape=self._count,
+                dtype=self._dtype,
+                buffer=self._buffer.buf,
+                offset=self._offset,
+            )
+            flags = np.ndarray(
+                shape=self._count,
+                dtype=np.uint8,
+                buffer=self._buffer.buf,
+                offset=self._flags_offset,
+            )
+            # [next sequence, sequence of every buffer_id, next claimed sequence, generation]
+            sequences = np.ndarray(
+                shape=self._count + 3,
+                dtype=_SEQUENCE_DTYPE,
+                buffer=self._buffer.buf,
+                offset=self._sequences_offset,
+            )
+            # [next of every buffer_id, previous of every buffer_id, heads, tails, sizes, order]
+            links = np.ndarray(
+                shape=self._order + self._order_size,
+                dtype=_LINKS_DTYPE,
+                buffer=self._buffer.buf,
+                offset=self._links_offset,
+            )
+            deadlines = np.ndarray(
+                shape=self._count,
+                dtype=_DEADLINE_DTYPE,
+                buffer=self._buffer.buf,
+                offset=self._deadlines_offset,
+            )
+            self._views = (states, sequences, links, flags, deadlines)
+        return self._views
+
+    def get_state_buffer(self) -> np.ndarray:
+        return self._get_views()[0]
+
+    def _get_sequences(self) -> np.ndarray:
+        return self._get_views()[1]
+
+    def _get_links(self) -> np.ndarray:
+        return self._get_views()[2]
+
+    def is_failed(self, buffer_id: int) -> bool:
+        """Returns if the data of an available buffer failed to be produced, see update_buffer_id_to_failed"""
+        return bool(self._get_views()[3][buffer_id] & _FAILED)
+
+    def is_speculated(self, buffer_id: int) -> bool:
+        """Returns if a speculative duplicate of the message of a reserved buffer has been send, see update_buffer_id_to_speculated"""
+        return bool(self._get_views()[3][buffer_id] & _SPECULATED)
+
+    def get_generation(self) -> int:
+        """Returns the number of resets, together with the sequence number it identifies a reservation of a buffer"""
+        return int(self._get_sequences()[-1])
+
+    def get_sequence(self, buffer_id: int) -> int:
+        """Returns the sequence number that was assigned when the buffer was last reserved
+
+        Args:
+            buffer_id (int): id of the buffer
+
+        Returns:
+            int: the sequence number, -1 if the buffer has never been reserved
+        """
+
+        return int(self._get_sequences()[buffer_id + 1])
+
+    @_lock_state_buffer
+    def reset(self):
+        """Marks all buffers as free"""
+
+        state_buffer, sequences, links, flags, deadlines = self._get_views()
+        state_buffer[:] = 0
+        flags[:] = 0
+        deadlines[:] = np.inf
+        sequences[0] = 0
+        sequences[1:-2] = -1
+        sequences[-2] = 0
+        sequences[-1] += 1
+        links[self._heads : self._sizes] = _NO_BUFFER_ID
+        links[self._sizes : self._order] = 0
+        links[self._order :] = _NO_BUFFER_ID
+        for buffer_id in range(self._count):
+            self._update_state_buffer(buffer_id=buffer_id, buffer_state=BufferState.FREE)
+        self._lock.notify_all()
+
+    def _unlink(self, links: np.ndarray, buffer_id: int, index: int):
+        next_buffer_id = links[buffer_id]
+        previous_buffer_id = links[self._count + buffer_id]
+
+        if previous_buffer_id == _NO_BUFFER_ID:
+            links[self._heads + index] = next_buffer_id
+        else:
+            links[previous_buffer_id] = next_buffer_id
+
+        if next_buffer_id == _NO_BUFFER_ID:
+            links[self._tails + index] = previous_buffer_id
+        else:
+            links[self._count + next_buffer_id] = previous_buffer_id
 
-    def _get_buffer_ids_with_state(self, state: BufferState):
-        state_buffer = self.get_state_buffer()
-        return list(np.where(state_buffer == state.value)[0])
+        links[self._sizes + index] -= 1
+
+    def _append(self, links: np.ndarray, buffer_id: int, index: int):
+        tail = links[self._tails + index]
+
+        links[buffer_id] = _NO_BUFFER_ID
+        links[self._count + buffer_id] = tail
+        if tail == _NO_BUFFER_ID:
+            links[self._heads + index] = buffer_id
+        else:
+            links[tail] = buffer_id
+        links[self._tails + index] = buffer_id
+
+        links[self._sizes + index] += 1
+
+    def get_buffer_ids_with_state(self, state: BufferState) -> List[int]:
+        """Returns the buffer ids with a specific state, in the order in which they got that state"""
+
+        links = self._get_links()
+        buffer_ids = []
+        buffer_id = links[self._heads + state.value - 1]
+        while buffer_id != _NO_BUFFER_ID:
+            buffer_ids.append(int(buffer_id))
+            buffer_id = links[buffer_id]
+        return buffer_ids
+
+    def get_buffer_count_with_state(self, state: BufferState) -> int:
+        return int(self._get_links()[self._sizes + state.value - 1])
+
+    def _find_buffer_id_with_state(
+        self, state: BufferState, buffer_id: Optional[int] = None
+    ) -> Optional[int]:
+        if buffer_id is not None:
+            if self.get_state_buffer()[buffer_id] != state.value:
+                return None
+            return buffer_id
+
+        head = self._get_links()[self._heads + state.value - 1]
+        if head == _NO_BUFFER_ID:
+            return None
+        return int(head)
+
+    def _find_buffer_id_with_sequence(
+        self, state: BufferState, first: int, last: int, step: int = 1
+    ) -> Optional[int]:
+        state_buffer, sequences, links, _, _ = self._get_views()
+        for sequence in range(first, min(last, int(sequences[0]) - 1) + 1, step):
+            buffer_id = links[self._order + sequence % self._order_size]
+            if (
+                sequences[buffer_id + 1] == sequence
+                and state_buffer[buffer_id] == state.value
+            ):
+                return int(buffer_id)
+        return None
 
     @_lock_state_buffer
     def _get_buffer_id_with_state(
@@ -69,24 +307,68 @@ class BufferStateMemory:
         update_state: BufferState,
         buffer_id: Optional[int] = None,
     ):
-        buffer_ids = self._get_buffer_ids_with_state(state=state)
+        buffer_id = self._find_buffer_id_with_state(state=state, buffer_id=buffer_id)
+        if buffer_id is not None:
+            self._update_state_buffer(buffer_id=buffer_id, buffer_state=update_state)
+        return buffer_id
 
-        if len(buffer_ids) == 0:
-            return None
+    @_lock_state_buffer
+    def _wait_for_buffer_ids_with_state(
+        self,
+        state: BufferState,
+        update_state: BufferState,
+        max_count: int,
+        timeout: Optional[float] = None,
+    ) -> List[int]:
+        self._lock.wait_for(
+            lambda: self._find_buffer_id_with_state(state=state) is not None,
+            timeout=timeout,
+        )
+        buffer_ids = []
+        while len(buffer_ids) < max_count:
+            buffer_id = self._find_buffer_id_with_state(state=state)
+            if buffer_id is None:
+                break
+            self._update_state_buffer(buffer_id=buffer_id, buffer_state=update_state)
+            buffer_ids.append(buffer_id)
+        return buffer_ids
 
-        if buffer_id is not None and buffer_id not in buffer_ids:
+    @_lock_state_buffer
+    def _wait_for_buffer_id_with_state(
+        self,
+        state: BufferState,
+        update_state: BufferState,
+        buffer_id: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        found = self._lock.wait_for(
+            lambda: self._find_buffer_id_with_state(state=state, buffer_id=buffer_id)
+            is not None,
+            timeout=timeout,
+        )
+        if not found:
             return None
-
-        if buffer_id is None:
-            buffer_id = buffer_ids[0]
-
-        self._update_state_buffer(buffer_id=buffer_id, buffer_state=update_state)
-        return buffer_id
+        return self._get_buffer_id_with_state(
+            state=state, update_state=update_state, buffer_id=buffer_id
+        )
 
     def _update_state_buffer(self, buffer_id: int, buffer_state: BufferState):
-        state_buffer = self.get_state_buffer()
+        state_buffer, sequences, links, flags, deadlines = self._get_views()
+        # the list index of a state is its value - 1, 0 means not in a list yet
+        current_value = int(state_buffer[buffer_id])
+        if current_value != 0:
+            self._unlink(links=links, buffer_id=buffer_id, index=current_value - 1)
+        self._append(links=links, buffer_id=buffer_id, index=buffer_state.value - 1)
         state_buffer[buffer_id] = buffer_state.value
 
+        if buffer_state == BufferState.RESERVED:
+            flags[buffer_id] = 0
+            deadlines[buffer_id] = np.inf
+            sequence = sequences[0]
+            sequences[buffer_id + 1] = sequence
+            links[self._order + sequence % self._order_size] = buffer_id
+            sequences[0] = sequence + 1
+
     def get_free_buffer_id(self):
         return self._get_buffer_id_with_state(
             state=BufferState.FREE, update_state=BufferState.RESERVED
@@ -99,10 +381,277 @@ class BufferStateMemory:
             buffer_id=buffer_id,
         )
 
+    def wait_for_free_buffer_id(self, timeout: Optional[float] = None):
+        """Blocks until a buffer is free and reserves it.
+
+        Args:
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            Optional[int]: the reserved buffer_id or None if the timeout expired
+        """
+        return self._wait_for_buffer_id_with_state(
+            state=BufferState.FREE, update_state=BufferState.RESERVED, timeout=timeout
+        )
+
+    def wait_for_free_buffer_ids(
+        self, max_count: int, timeout: Optional[float] = None
+    ) -> List[int]:
+        """Blocks until at least one buffer is free and reserves up to max_count free buffers.
+
+        Args:
+            max_count (int): maximum number of buffers to reserve
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            List[int]: the reserved buffer ids, empty if the timeout expired
+        """
+        return self._wait_for_buffer_ids_with_state(
+            state=BufferState.FREE,
+            update_state=BufferState.RESERVED,
+            max_count=max_count,
+            timeout=timeout,
+        )
+
+    def wait_for_available_buffer_id(
+        self, buffer_id: Optional[int] = None, timeout: Optional[float] = None
+    ):
+        """Blocks until a buffer (or the given buffer_id) is available and marks it as processing.
+
+        Args:
+            buffer_id (Optional[int], optional): specific buffer to wait for. Defaults to None (any buffer).
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            Optional[int]: the buffer_id or None if the timeout expired
+        """
+        return self._wait_for_buffer_id_with_state(
+            state=BufferState.AVAILABLE,
+            update_state=BufferState.PROCESSING,
+            buffer_id=buffer_id,
+            timeout=timeout,
+        )
+
+    @_lock_state_buffer
+    def wait_for_no_buffer_with_state(
+        self, state: BufferState, timeout: Optional[float] = None
+    ) -> bool:
+        """Blocks until no buffer has a specific state, e.g., until all reserved buffers have been produced.
+
+        Args:
+            state (BufferState): the state
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            bool: False if the timeout expired
+        """
+        return self._lock.wait_for(
+            lambda: self.get_buffer_count_with_state(state) == 0, timeout=timeout
+        )
+
+    @_lock_state_buffer
+    def wait_for_available_sequence_buffer_id(
+        self,
+        first: int,
+        last: Optional[int] = None,
+        timeout: Optional[float] = None,
+        step: int = 1,
+    ) -> Optional[int]:
+        """Blocks until the buffer of a sequence number between first and last is available and marks it as processing.
+
+        The buffer with the lowest available sequence number is returned, use get_sequence to find out which one it is.
+
+        Args:
+            first (int): first sequence number
+            last (Optional[int], optional): last sequence number, last - first should be smaller than the count of buffers. Defaults to None (only first).
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+            step (int, optional): only every step-th sequence number from first is looked at, see claim_sequence. Defaults to 1.
+
+        Raises:
+            ValueError: the sequence numbers span the count of buffers or more
+
+        Returns:
+            Optional[int]: the buffer_id or None if the timeout expired
+        """
+
+        if last is None:
+            last = first
+        if last - first >= self._count:
+            raise ValueError(
+                f"cannot look ahead {last - first} sequences with {self._count} buffers"
+            )
+
+        found = self._lock.wait_for(
+            lambda: self._find_buffer_id_with_sequence(
+                state=BufferState.AVAILABLE, first=first, last=last, step=step
+            )
+            is not None,
+            timeout=timeout,
+        )
+        if not found:
+            return None
+        buffer_id = self._find_buffer_id_with_sequence(
+            state=BufferState.AVAILABLE, first=first, last=last, step=step
+        )
+        self._update_state_buffer(
+            buffer_id=buffer_id, buffer_state=BufferState.PROCESSING
+        )
+        return buffer_id
+
+    @_lock_state_buffer
+    def claim_sequence(self) -> int:
+        """Returns the next sequence number that has not been claimed by a consumer, see wait_for_available_sequence_buffer_id
+
+        Returns:
+            int: the sequence number, consumers claim every sequence number once
+        """
+
+        sequences = self._get_sequences()
+        sequence = int(sequences[-2])
+        sequences[-2] = sequence + 1
+        return sequence
+
+    def _find_buffer_id_with_shard(
+        self, state: BufferState, shard: int, shards: int
+    ) -> Optional[int]:
+        sequences = self._get_sequences()
+        for buffer_id in self.get_buffer_ids_with_state(state):
+            if sequences[buffer_id + 1] % shards == shard:
+                return buffer_id
+        return None
+
+    @_lock_state_buffer
+    def wait_for_available_shard_buffer_id(
+        self, shard: int, shards: int, timeout: Optional[float] = None
+    ) -> Optional[int]:
+        """Blocks until a buffer of a shard (sequence number % shards == shard) is available and marks it as processing.
+
+        Args:
+            shard (int): the shard
+            shards (int): the number of shards
+            timeout (Optional[float], optional): maximum time to wait in seconds. Defaults to None (wait forever).
+
+        Returns:
+            Optional[int]: the buffer_id or None if the timeout expired
+        """
+
+        found = self._lock.wait_for(
+            lambda: self._find_buffer_id_with_shard(
+                state=BufferState.AVAILABLE, shard=shard, shards=shards
+            )
+            is not None,
+            timeout=timeout,
+        )
+        if not found:
+            return None
+        buffer_id = self._find_buffer_id_with_shard(
+            state=BufferState.AVAILABLE, shard=shard, shards=shards
+        )
+        self._update_state_buffer(
+            buffer_id=buffer_id, buffer_state=BufferState.PROCESSING
+        )
+        return buffer_id
+
+    @_lock_state_buffer
     def update_buffer_id_to_free(self, buffer_id):
         self._update_state_buffer(buffer_id=buffer_id, buffer_state=BufferState.FREE)
+        self._lock.notify_all()
 
+    @_lock_state_buffer
     def update_buffer_id_to_available(self, buffer_id):
         self._update_state_buffer(
             buffer_id=buffer_id, buffer_state=BufferState.AVAILABLE
         )
+        self._lock.notify_all()
+
+    @_lock_state_buffer
+    def update_buffer_id_to_failed(self, buffer_id):
+        """Marks a buffer as available with a failed flag, such that the consumer can handle the failure in the order of the buffers"""
+        self._get_views()[3][buffer_id] |= _FAILED
+        self._update_state_buffer(
+            buffer_id=buffer_id, buffer_state=BufferState.AVAILABLE
+        )
+        self._lock.notify_all()
+
+    def _is_reservation(self, buffer_id: int, sequence: int, generation: int) -> bool:
+        state_buffer, sequences, _, flags, _ = self._get_views()
+        return (
+            state_buffer[buffer_id] == BufferState.RESERVED.value
+            and sequences[buffer_id + 1] == sequence
+            and sequences[-1] == generation
+            and not flags[buffer_id] & _CLAIMED
+        )
+
+    @_lock_state_buffer
+    def is_reservation(self, buffer_id: int, sequence: int, generation: int) -> bool:
+        """Returns if a buffer is still reserved for the given sequence and generation and has not been claimed
+
+        Args:
+            buffer_id (int): id of the buffer
+            sequence (int): sequence number of the reservation
+            generation (int): generation of the reservation, see get_generation
+
+        Returns:
+            bool: the reservation exists and nobody claimed it
+        """
+
+        return self._is_reservation(buffer_id, sequence, generation)
+
+    @_lock_state_buffer
+    def start_deadline(
+        self, buffer_id: int, sequence: int, generation: int, timeout: float
+    ) -> bool:
+        """Sets the deadline of a reserved buffer to timeout seconds from now
+
+        Args:
+            buffer_id (int): id of the buffer
+            sequence (int): sequence number of the reservation
+            generation (int): generation of the reservation, see get_generation
+            timeout (float): time in seconds
+
+        Returns:
+            bool: False if the reservation has been claimed or does not exist anymore
+        """
+
+        if not self._is_reservation(buffer_id, sequence, generation):
+            return False
+        self._get_views()[4][buffer_id] = time.monotonic() + timeout
+        return True
+
+    @_lock_state_buffer
+    def claim_buffer_id(self, buffer_id: int, sequence: int, generation: int) -> bool:
+        """Claims the completion of a reserved buffer, only the first claim of a reservation succeeds
+
+        Args:
+            buffer_id (int): id of the buffer
+            sequence (int): sequence number of the reservation
+            generation (int): generation of the reservation, see get_generation
+
+        Returns:
+            bool: True if the caller should make the buffer available or failed
+        """
+
+        if not self._is_reservation(buffer_id, sequence, generation):
+            return False
+        _, _, _, flags, deadlines = self._get_views()
+        flags[buffer_id] |= _CLAIMED
+        deadlines[buffer_id] = np.inf
+        return True
+
+    @_lock_state_buffer
+    def get_expired_buffer_ids(self) -> List[int]:
+        """Returns the reserved buffers that have not been claimed before their deadline, their deadlines are cleared"""
+
+        state_buffer, _, _, flags, deadlines = self._get_views()
+        expired = np.flatnonzero(
+            (deadlines <= time.monotonic())
+            & (state_buffer == BufferState.RESERVED.value)
+            & (flags & _CLAIMED == 0)
+        )
+        deadlines[expired] = np.inf
+        return [int(buffer_id) for buffer_id in expired]
+
+    @_lock_state_buffer
+    def update_buffer_id_to_speculated(self, buffer_id: int):
+        """Marks that a speculative duplicate of the message of a reserved buffer has been send"""
+        self._get_views()[3][buffer_id] |= _SPECULATED
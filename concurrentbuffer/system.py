@@ -1,4 +1,32 @@
+import os
+import sys
 from multiprocessing.context import BaseContext, SpawnContext
+from typing import Optional, Sequence
+
+from concurrentbuffer.affinity import CpuAffinity, affinity_supported
+
+WINDOWS = sys.platform == "win32"
+
+QUEUE_TRANSPORT = "queue"
+SHARED_MEMORY_TRANSPORT = "shared_memory"
+
+RAISE_ERRORS = "raise"
+SKIP_ERRORS = "skip"
+
+FAIL_STRAGGLERS = "fail"
+SPECULATE_STRAGGLERS = "speculate"
+
+# how data is divided over multiple consumers, see ConsumerGroup
+ROUND_ROBIN_DELIVERY = "round_robin"
+LOAD_BALANCED_DELIVERY = "load_balanced"
+
+
+def _check_affinity(affinity: CpuAffinity):
+    if not affinity_supported():
+        raise ValueError("affinity is only supported on Linux")
+    unavailable = affinity.cpus - os.sched_getaffinity(0)
+    if unavailable:
+        raise ValueError(f"affinity contains unavailable CPUs {sorted(unavailable)}")
 
 
 class BufferSystem:
@@ -9,10 +37,82 @@ class BufferSystem:
         cpus: int,
         context: BaseContext = SpawnContext(),
         deterministic: bool = True,
+        message_batch_size: int = 1,
+        message_transport: str = QUEUE_TRANSPORT,
+        message_nbytes: int = 4096,
+        order_window: int = 0,
+        notify_available: bool = False,
+        preload_modules: Sequence[str] = (),
+        error_policy: str = RAISE_ERRORS,
+        max_retries: int = 0,
+        respawn: bool = True,
+        message_timeout: Optional[float] = None,
+        straggler_policy: str = FAIL_STRAGGLERS,
+        metrics: bool = False,
+        affinity: Optional[CpuAffinity] = None,
+        prefault: bool = False,
     ):
+        """Init
+
+        Args:
+            cpus (int): number of producer processes
+            context (BaseContext, optional): multiprocessing context, or a ThreadContext to run the commander and producers as threads. Defaults to SpawnContext().
+            deterministic (bool, optional): data is retrieved in the order of the messages. Defaults to True.
+            message_batch_size (int, optional): maximum number of messages the commander sends at once, a producer processes a batch of messages sequentially. Defaults to 1.
+            message_transport (str, optional): how messages are send to the producers, QUEUE_TRANSPORT (multiprocessing.Queue) or SHARED_MEMORY_TRANSPORT (MessageRing). Defaults to QUEUE_TRANSPORT.
+            message_nbytes (int, optional): maximum size in bytes of a pickled batch of messages for SHARED_MEMORY_TRANSPORT. Defaults to 4096.
+            order_window (int, optional): in deterministic mode, data may be retrieved at most order_window positions away from the order of the messages, 0 is strictly in order. Defaults to 0.
+            notify_available (bool, optional): producers signal every available buffer over an AvailableNotifier, needed to wait for data in an event loop without a thread (not supported on Windows). Defaults to False.
+            preload_modules (Sequence[str], optional): modules the forkserver imports once before it forks the processes, next to the modules of the commander and producer classes. Only used with a ForkServerContext and before its server started, Producer.build still runs in every process. Defaults to ().
+            error_policy (str, optional): what the iterator does with data that failed to be produced, RAISE_ERRORS raises a ProducerError (iterating can continue afterwards) and SKIP_ERRORS skips it with a warning. Defaults to RAISE_ERRORS.
+            max_retries (int, optional): number of times a producer tries a message again before the data fails. Defaults to 0.
+            respawn (bool, optional): producer processes that died are started again, their data fails. Otherwise the iterator raises a ProcessError when a producer process died. Defaults to True.
+            message_timeout (Optional[float], optional): deadline in seconds for producing a message, from the moment a producer starts on it. A commander can set the deadline of a single message with the TIMEOUT_KEY of the message. Defaults to None (no deadlines).
+            straggler_policy (str, optional): what happens with a message that is past its deadline, FAIL_STRAGGLERS fails its data (see error_policy) and SPECULATE_STRAGGLERS first sends a duplicate of the message to the producers, the first result is used and the data fails if the duplicate is not ready before its deadline either. Defaults to FAIL_STRAGGLERS.
+            metrics (bool, optional): the commander, the producers and the consumer keep counters and latency histograms in shared memory, see BufferIterator.stats. Defaults to False.
+            affinity (Optional[CpuAffinity], optional): CPUs on which the commander, the producers and the consumer run, the buffers are first touched by the consumer (Linux only). Defaults to None (not restricted).
+            prefault (bool, optional): every producer and the consumer touch all pages of the buffers at startup, such that the first batches are not slowed down by page faults. The producers touch the buffers in parallel before their first message. Defaults to False.
+
+        Raises:
+            ValueError: invalid message_batch_size, order_window, notify_available, error_policy, max_retries, message_timeout, straggler_policy or affinity
+        """
+
+        if message_batch_size < 1:
+            raise ValueError(f"message_batch_size should be >= 1, got {message_batch_size}")
+        if order_window < 0:
+            raise ValueError(f"order_window should be >= 0, got {order_window}")
+        if order_window and not deterministic:
+            raise ValueError("order_window requires deterministic=True")
+        if notify_available and WINDOWS:
+            raise ValueError("notify_available is not supported on Windows")
+        if error_policy not in (RAISE_ERRORS, SKIP_ERRORS):
+            raise ValueError(f"unknown error policy {error_policy}")
+        if max_retries < 0:
+            raise ValueError(f"max_retries should be >= 0, got {max_retries}")
+        if message_timeout is not None and message_timeout <= 0:
+            raise ValueError(f"message_timeout should be > 0, got {message_timeout}")
+        if straggler_policy not in (FAIL_STRAGGLERS, SPECULATE_STRAGGLERS):
+            raise ValueError(f"unknown straggler policy {straggler_policy}")
+        if affinity is not None:
+            _check_affinity(affinity)
+
         self._cpus = cpus
         self._context = context
         self._deterministic = deterministic
+        self._message_batch_size = message_batch_size
+        self._message_transport = message_transport
+        self._message_nbytes = message_nbytes
+        self._order_window = order_window
+        self._notify_available = notify_available
+        self._preload_modules = tuple(preload_modules)
+        self._error_policy = error_policy
+        self._max_retries = max_retries
+        self._respawn = respawn
+        self._message_timeout = message_timeout
+        self._straggler_policy = straggler_policy
+        self._metrics = metrics
+        self._affinity = affinity
+        self._prefault = prefault
 
     @property
     def cpus(self):
@@ -25,3 +125,59 @@ class BufferSystem:
     @property
     def deterministic(self):
         return self._deterministic
+
+    @property
+    def message_batch_size(self):
+        return self._message_batch_size
+
+    @property
+    def message_transport(self):
+        return self._message_transport
+
+    @property
+    def message_nbytes(self):
+        return self._message_nbytes
+
+    @property
+    def order_window(self):
+        return self._order_window
+
+    @property
+    def notify_available(self):
+        return self._notify_available
+
+    @property
+    def preload_modules(self):
+        return self._preload_modules
+
+    @property
+    def error_policy(self):
+        return self._error_policy
+
+    @property
+    def max_retries(self):
+        return self._max_retries
+
+    @property
+    def respawn(self):
+        return self._respawn
+
+    @property
+    def message_timeout(self):
+        return self._message_timeout
+
+    @property
+    def straggler_policy(self):
+        return self._straggler_policy
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    @property
+    def affinity(self):
+        return self._affinity
+
+    @property
+    def prefault(self):
+        return self._prefault
@@ -0,0 +1,59 @@
+import array
+import multiprocessing
+import queue
+import threading
+from multiprocessing.context import BaseContext
+from typing import Union
+
+THREAD_CONTEXT = "thread"
+
+
+class ThreadContext:
+    """Context that runs the commander and the producers as threads of the current process.
+
+    Provides the parts of a multiprocessing context that are used to build the
+    buffer components. Nothing is pickled and the buffers are plain memory of
+    the current process, which suits producers that release the GIL (e.g.,
+    image decoding, numpy).
+    """
+
+    def Condition(self, lock=None):
+        return threading.Condition(lock)
+
+    def Lock(self):
+        return threading.Lock()
+
+    def Semaphore(self, value: int = 1):
+        return threading.Semaphore(value)
+
+    def Event(self):
+        return threading.Event()
+
+    def Barrier(self, parties: int):
+        return threading.Barrier(parties)
+
+    def Array(self, typecode: str, size_or_initializer, lock: bool = True):
+        if isinstance(size_or_initializer, int):
+            size_or_initializer = [0] * size_or_initializer
+        return array.array(typecode, size_or_initializer)
+
+    def Queue(self, maxsize: int = 0):
+        return queue.Queue(maxsize=maxsize)
+
+    def Pipe(self, duplex: bool = True):
+        return multiprocessing.Pipe(duplex=duplex)
+
+
+def get_context(method: str) -> Union[BaseContext, ThreadContext]:
+    """Returns the context for a start method
+
+    Args:
+        method (str): THREAD_CONTEXT or a multiprocessing start method (e.g., 'fork' or 'spawn')
+
+    Returns:
+        Union[BaseContext, ThreadContext]: the context
+    """
+
+    if method == THREAD_CONTEXT:
+        return ThreadContext()
+    return multiprocessing.get_context(method)
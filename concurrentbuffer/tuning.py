@@ -0,0 +1,218 @@
+import math
+import pickle
+import time
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from concurrentbuffer.commander import Commander
+from concurrentbuffer.info import BufferInfo, get_output_dtypes
+from concurrentbuffer.producer import InPlaceProducer, Producer, create_data_into
+from concurrentbuffer.state import BufferState
+
+AUTO_BUFFER_COUNT = "auto"
+
+
+def default_buffer_count(cpus: int) -> int:
+    """The default number of buffers: one for every state per producer"""
+    return cpus * len(BufferState)
+
+
+def _create_batches(
+    commander: Commander,
+    producer: Producer,
+    buffer_shapes: tuple,
+    buffer_dtype: Union[type, Sequence[type]],
+    samples: int,
+) -> Tuple[float, List[List[np.ndarray]]]:
+    # copies, such that the messages that are send to the producer processes are not affected
+    commander = pickle.loads(pickle.dumps(commander))
+    producer = pickle.loads(pickle.dumps(producer))
+    dtypes = get_output_dtypes(dtype=buffer_dtype, length=len(buffer_shapes))
+    batches = []
+    commander.build()
+    try:
+        producer.build()
+        try:
+            start = time.perf_counter()
+            for _ in range(samples):
+                message = commander.create_message()
+                if isinstance(producer, InPlaceProducer):
+                    arrays = [
+                        np.empty(shape, dtype=dtype)
+                        for shape, dtype in zip(buffer_shapes, dtypes)
+                    ]
+                    batches.append(
+                        create_data_into(producer=producer, message=message, arrays=arrays)
+                    )
+                else:
+                    batches.append(
+                        [
+                            np.asarray(data, dtype=dtype)
+                            for data, dtype in zip(producer.create_data(message=message), dtypes)
+                        ]
+                    )
+            elapsed = time.perf_counter() - start
+        finally:
+            producer.teardown()
+    finally:
+        commander.teardown()
+    return elapsed / samples, batches
+
+
+def measure_production_time(
+    commander: Commander,
+    producer: Producer,
+    buffer_shapes: tuple,
+    buffer_dtype: Union[type, Sequence[type]],
+    samples: int = 3,
+) -> float:
+    """Measures the time one producer needs to create a single batch.
+
+    The measurement runs in the current process on copies of the commander and the producer, such that the messages that are send to the producer processes are not affected.
+
+    Args:
+        commander (Commander): commander that creates the messages
+        producer (Producer): producer that creates the data
+        buffer_shapes (tuple): shapes of the buffers
+        buffer_dtype (Union[type, Sequence[type]]): type of the buffers, see BufferInfo
+        samples (int, optional): number of batches to create. Defaults to 3.
+
+    Returns:
+        float: average time in seconds to create one batch
+    """
+
+    return _create_batches(
+        commander=commander,
+        producer=producer,
+        buffer_shapes=buffer_shapes,
+        buffer_dtype=buffer_dtype,
+        samples=samples,
+    )[0]
+
+
+def measure_consumption_time(
+    batches: Sequence[Sequence[np.ndarray]],
+    consume: Optional[Callable[[List[np.ndarray]], Any]] = None,
+) -> float:
+    """Measures the time the consumer needs for a single batch: the copy out of the buffer (see BufferIterator) and consume
+
+    Args:
+        batches (Sequence[Sequence[np.ndarray]]): sample batches, e.g., created by the producer
+        consume (Optional[Callable[[List[np.ndarray]], Any]], optional): what the consumer does with a batch (e.g., a training step). Defaults to None (only the copy).
+
+    Returns:
+        float: average time in seconds to consume one batch
+    """
+
+    start = time.perf_counter()
+    for batch in batches:
+        data = [np.array(array, copy=True) for array in batch]
+        if consume is not None:
+            consume(data)
+    return (time.perf_counter() - start) / len(batches)
+
+
+def auto_buffer_count(
+    cpus: int,
+    buffer_nbytes: int,
+    production_time: float,
+    consumption_time: float = 0.0,
+    memory_budget: Optional[int] = None,
+) -> int:
+    """Sizes the buffer pool from the producer and consumer rates.
+
+    Every producer reserves one buffer and the consumer processes one buffer. On top of that, the pool holds the batches that the consumer uses while a single batch is being created, which is capped at the number of producers because more batches can not be ready at the same time.
+
+    Args:
+        cpus (int): number of producers
+        buffer_nbytes (int): size in bytes of a single buffer (all outputs)
+        production_time (float): time in seconds one producer needs to create a batch
+        consumption_time (float, optional): time in seconds the consumer spends on a batch. Defaults to 0.0 (as fast as possible).
+        memory_budget (Optional[int], optional): maximum size in bytes of all buffers. Defaults to None.
+
+    Raises:
+        ValueError: the memory budget does not fit a buffer per producer and one for the consumer
+
+    Returns:
+        int: the number of buffers
+    """
+
+    ready = cpus
+    if consumption_time > 0:
+        ready = min(cpus, math.ceil(production_time / consumption_time))
+    count = cpus + 1 + max(1, ready)
+
+    if memory_budget is not None:
+        max_count = memory_budget // buffer_nbytes
+        if max_count < cpus + 1:
+            raise ValueError(
+                f"memory budget of {memory_budget} bytes fits {max_count} buffers of {buffer_nbytes} bytes, at least {cpus + 1} are needed"
+            )
+        count = min(count, max_count)
+    return count
+
+
+def get_buffer_count(
+    buffer_count: Optional[Union[int, str]],
+    cpus: int,
+    commander: Commander,
+    producer: Producer,
+    buffer_shapes: tuple,
+    buffer_dtype: Union[type, Sequence[type]],
+    memory_budget: Optional[int] = None,
+    consumption_time: float = 0.0,
+    consume: Optional[Callable[[List[np.ndarray]], Any]] = None,
+) -> int:
+    """Resolves the number of buffers
+
+    AUTO_BUFFER_COUNT runs a trial production: the commander and a copy of the producer are built in the calling process and create a few batches before any process is started.
+
+    Args:
+        buffer_count (Optional[Union[int, str]]): number of buffers, None for the default or AUTO_BUFFER_COUNT to size the pool with auto_buffer_count
+        cpus (int): number of producers
+        commander (Commander): commander that creates the messages
+        producer (Producer): producer that creates the data
+        buffer_shapes (tuple): shapes of the buffers
+        buffer_dtype (Union[type, Sequence[type]]): type of the buffers, see BufferInfo
+        memory_budget (Optional[int], optional): maximum size in bytes of all buffers when auto sizing. Defaults to None.
+        consumption_time (float, optional): time in seconds the consumer spends on a batch when auto sizing, on top of the measured copy out of the buffer and consume. Defaults to 0.0.
+        consume (Optional[Callable[[List[np.ndarray]], Any]], optional): what the consumer does with a batch, measured on batches of the producer when auto sizing, see measure_consumption_time. Defaults to None.
+
+    Raises:
+        ValueError: buffer_count is not a positive integer, None or AUTO_BUFFER_COUNT, or memory_budget is given without AUTO_BUFFER_COUNT
+
+    Returns:
+        int: the number of buffers
+    """
+
+    if memory_budget is not None and buffer_count != AUTO_BUFFER_COUNT:
+        raise ValueError(
+            f"memory_budget is only used with buffer_count={AUTO_BUFFER_COUNT!r}, got buffer_count={buffer_count!r}"
+        )
+
+    if buffer_count is None:
+        return default_buffer_count(cpus=cpus)
+
+    if buffer_count == AUTO_BUFFER_COUNT:
+        production_time, batches = _create_batches(
+            commander=commander,
+            producer=producer,
+            buffer_shapes=buffer_shapes,
+            buffer_dtype=buffer_dtype,
+            samples=3,
+        )
+        return auto_buffer_count(
+            cpus=cpus,
+            buffer_nbytes=BufferInfo(
+                shapes=buffer_shapes, count=1, dtype=buffer_dtype
+            ).nbytes,
+            production_time=production_time,
+            consumption_time=consumption_time
+            + measure_consumption_time(batches=batches, consume=consume),
+            memory_budget=memory_budget,
+        )
+
+    if isinstance(buffer_count, str) or buffer_count < 1:
+        raise ValueError(f"invalid buffer count {buffer_count}")
+    return buffer_count
@@ -12,4 +12,18 @@ class DataCommander(Commander):
         message = {"values": (self._times[0][self._index], self._times[1][self._index])}
         self._index = (self._index + 1) % len(self._times[0])
         return message
-        
\ No newline at end of file
+
+
+class FailingDataCommander(DataCommander):
+    """Custom Commander class that raises at a given message for testing purposes"""
+
+    def __init__(self, times, fail_at):
+        super().__init__(times=times)
+        self._fail_at = fail_at
+        self._count = 0
+
+    def create_message(self):
+        if self._count == self._fail_at:
+            raise ValueError(f"cannot create message {self._count}")
+        self._count += 1
+        return super().create_message()
@@ -1,7 +1,9 @@
+import os
 import time
 
 import numpy as np
-from concurrentbuffer.producer import Producer
+from concurrentbuffer.commander import RESERVATION_KEY
+from concurrentbuffer.producer import InPlaceProducer, Producer
 
 
 class DataProducer(Producer):
@@ -16,3 +18,116 @@ class DataProducer(Producer):
             np.ones(self._data_shapes[0]) * message["values"][0],
             np.ones(self._data_shapes[1]) * message["values"][1],
         )
+
+
+class InPlaceDataProducer(InPlaceProducer):
+    """Custom InPlaceProducer class for testing purposes"""
+
+    def create_data_into(self, message, out_arrays):
+        time.sleep(message["values"][0])
+        out_arrays[0][:] = message["values"][0]
+        out_arrays[1][:] = message["values"][1]
+
+
+class RaggedDataProducer(Producer):
+    """Custom Producer class with a variable number of rows for testing purposes"""
+
+    def __init__(self, data_shapes):
+        self._data_shapes = data_shapes
+
+    def create_data(self, message):
+        time.sleep(message["values"][0])
+        rows = message["values"][1]
+        return (
+            np.ones((rows,) + self._data_shapes[0][1:]) * message["values"][0],
+            np.ones(self._data_shapes[1]) * message["values"][1],
+        )
+
+
+class RaggedInPlaceDataProducer(InPlaceProducer):
+    """Custom InPlaceProducer class with a variable number of rows and columns for testing purposes
+
+    With slices=True it writes into out_arrays[0][:rows, :cols] and returns the shapes, which does not match the layout of ragged buffers.
+    """
+
+    def __init__(self, data_shapes, slices=False):
+        self._data_shapes = data_shapes
+        self._slices = slices
+
+    def _shape(self, message):
+        value = message["values"][1]
+        return (value + 1, self._data_shapes[0][1] - value) + tuple(self._data_shapes[0][2:])
+
+    def create_shapes(self, message):
+        return None if self._slices else (self._shape(message), None)
+
+    def create_data_into(self, message, out_arrays):
+        time.sleep(message["values"][0])
+        shape = self._shape(message)
+        out_array = out_arrays[0][: shape[0], : shape[1]] if self._slices else out_arrays[0]
+        out_array[:] = np.arange(out_array.size).reshape(out_array.shape)
+        out_arrays[1][:] = message["values"][1]
+        return (shape, None) if self._slices else None
+
+
+class FailingDataProducer(DataProducer):
+    """Custom Producer class that fails for negative values for testing purposes
+
+    -1 raises an error, -2 exits the process and -3 raises an error the first
+    time the message is produced in a process.
+    """
+
+    def __init__(self, data_shapes):
+        super().__init__(data_shapes=data_shapes)
+        self._failed = set()
+
+    def create_data(self, message):
+        value = message["values"][1]
+        if value == -1:
+            raise ValueError(f"cannot produce value {value}")
+        if value == -2:
+            os._exit(1)
+        if value == -3 and message["values"] not in self._failed:
+            self._failed.add(message["values"])
+            raise ValueError(f"cannot produce value {value} the first time")
+        return super().create_data(message)
+
+
+class UnbuildableDataProducer(DataProducer):
+    """Custom Producer class that can not be built for testing purposes"""
+
+    def build(self):
+        raise ValueError("cannot build producer")
+
+
+class StragglerDataProducer(DataProducer):
+    """Custom Producer class that is only slow for the first try of a message for testing purposes"""
+
+    def create_data(self, message):
+        if RESERVATION_KEY in message:
+            message = {**message, "values": (0.0, message["values"][1])}
+        return super().create_data(message)
+
+
+class DyingStragglerDataProducer(StragglerDataProducer):
+    """Custom Producer class that exits the process after the first try of a negative value for testing purposes"""
+
+    def create_data(self, message):
+        data = super().create_data(message)
+        if message["values"][1] < 0 and RESERVATION_KEY not in message:
+            os._exit(1)
+        return data
+
+
+class AffinityDataProducer(Producer):
+    """Custom Producer class that returns the number and the first of the CPUs of its process for testing purposes"""
+
+    def __init__(self, data_shapes):
+        self._data_shapes = data_shapes
+
+    def create_data(self, message):
+        cpus = os.sched_getaffinity(0)
+        return (
+            np.ones(self._data_shapes[0]) * len(cpus),
+            np.ones(self._data_shapes[1]) * min(cpus),
+        )
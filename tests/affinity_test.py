@@ -0,0 +1,96 @@
+import os
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+import pytest
+from concurrentbuffer.affinity import (
+    CpuAffinity,
+    _parse_cpu_list,
+    affinity_supported,
+    get_numa_nodes,
+    get_original_cpu_affinity,
+    set_cpu_affinity,
+)
+from concurrentbuffer.system import BufferSystem
+from example.producer import AffinityDataProducer
+from tests.helpers import BUFFER_SHAPES, small_buffer_iterator
+
+pytestmark = pytest.mark.skipif(
+    not affinity_supported(), reason="affinity is only supported on Linux"
+)
+
+
+@pytest.fixture
+def consumer_cpus():
+    # the factory pins the thread of the consumer
+    cpus = os.sched_getaffinity(0)
+    yield cpus
+    os.sched_setaffinity(0, cpus)
+
+
+class TestAffinity:
+    """This class contains methods to test the placement of the processes on CPUs"""
+
+    def test_parse_cpu_list(self):
+        assert _parse_cpu_list("0-3,8,10-11\n") == {0, 1, 2, 3, 8, 10, 11}
+        assert _parse_cpu_list("") == set()
+
+    def test_numa_nodes(self):
+        nodes = get_numa_nodes()
+        assert nodes
+        assert os.sched_getaffinity(0) <= set().union(*nodes.values())
+
+    def test_invalid_affinity(self):
+        with pytest.raises(ValueError):
+            CpuAffinity(producers=[[0], []])
+        with pytest.raises(ValueError):
+            BufferSystem(cpus=1, affinity=CpuAffinity(consumer=[os.cpu_count() + 1]))
+
+    def test_producer(self):
+        affinity = CpuAffinity(producers=[[0], [1, 2]])
+        assert affinity.producer(2) == {0}
+        assert affinity.producer(3) == {1, 2}
+        assert affinity.commander is None
+        assert affinity.cpus == {0, 1, 2}
+
+    @pytest.mark.parametrize("context", ["spawn", "thread"])
+    def test_pinned_producers(self, context, consumer_cpus):
+        cpu = min(consumer_cpus)
+        with small_buffer_iterator(
+            producer=AffinityDataProducer(data_shapes=BUFFER_SHAPES),
+            context=context,
+            affinity=CpuAffinity(commander=[cpu], producers=[[cpu]], consumer=[cpu]),
+        ) as buffer_iterator:
+            assert os.sched_getaffinity(0) == {cpu}
+            for _ in range(4):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == 1)
+                assert np.all(data[1] == cpu)
+
+    def test_consumer_cpus_restored(self, consumer_cpus):
+        cpu = min(consumer_cpus)
+        with small_buffer_iterator(affinity=CpuAffinity(consumer=[cpu])):
+            assert os.sched_getaffinity(0) == {cpu}
+        assert os.sched_getaffinity(0) == consumer_cpus
+
+    def test_original_cpus_of_pinned_thread(self, consumer_cpus):
+        # the producers without CPUs of a second factory get the CPUs from before the first factory pinned the thread
+        cpu = min(consumer_cpus)
+        set_cpu_affinity([cpu])
+        assert get_original_cpu_affinity() == consumer_cpus
+        with small_buffer_iterator(
+            producer=AffinityDataProducer(data_shapes=BUFFER_SHAPES),
+            affinity=CpuAffinity(consumer=[cpu]),
+        ) as buffer_iterator:
+            data = next(buffer_iterator)
+            assert np.all(data[0] == len(consumer_cpus))
+            assert np.all(data[1] == cpu)
+        assert os.sched_getaffinity(0) == {cpu}
+
+    def test_numa_node(self):
+        node, cpus = next(iter(get_numa_nodes().items()))
+        affinity = CpuAffinity.numa_node(node, pin_producers=True)
+        assert affinity.consumer == cpus
+        assert affinity.producer(0) == {min(cpus)}
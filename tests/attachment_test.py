@@ -0,0 +1,164 @@
+import multiprocessing
+import pickle
+from multiprocessing import ProcessError
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import pytest
+from concurrentbuffer.iterator import BufferIterator
+from concurrentbuffer.producer import ProducerError
+from example.producer import FailingDataProducer
+from tests.helpers import BUFFER_SHAPES, CPUS, small_buffer_iterator
+
+ITEMS = 8
+# spare buffers for the consumer in the other process
+BUFFER_COUNT = 2 * CPUS + 2
+
+
+def consume(attachment, results, items=ITEMS, **kwargs):
+    """Consumer in another process"""
+    with BufferIterator(buffer_factory=attachment, **kwargs) as buffer_iterator:
+        for _ in range(items):
+            try:
+                data = next(buffer_iterator)
+                results.put((buffer_iterator.sequence, int(data[1][0, 0, 0])))
+            except ProducerError:
+                results.put((buffer_iterator.sequence, None))
+            except ProcessError as error:
+                # the factory can not continue
+                results.put((None, str(error)))
+                return
+
+
+def _start_consumer(buffer_iterator, **kwargs):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=consume,
+        args=(buffer_iterator.buffer_factory.attachment(), results),
+        kwargs=kwargs,
+    )
+    process.start()
+    return process, results
+
+
+class TestBufferAttachment:
+    """This class contains methods to test consumers in another process than the factory"""
+
+    def test_consumer_process(self):
+        with small_buffer_iterator(buffer_count=BUFFER_COUNT) as buffer_iterator:
+            process, results = _start_consumer(buffer_iterator)
+            received = [results.get(timeout=30) for _ in range(ITEMS)]
+            process.join(timeout=30)
+            assert process.exitcode == 0
+            # the consumer only released its buffers, the factory keeps running
+            buffer_iterator.buffer_factory.check_producer_processes()
+
+        assert received == [(sequence, sequence % 4) for sequence in range(ITEMS)]
+
+    def test_sharded_consumers(self):
+        with small_buffer_iterator(buffer_count=BUFFER_COUNT) as buffer_iterator:
+            iterator = BufferIterator(
+                buffer_factory=buffer_iterator.buffer_factory, consumer=0, consumers=2
+            )
+            process, results = _start_consumer(buffer_iterator, consumer=1, consumers=2)
+            local = []
+            for _ in range(ITEMS):
+                next(iterator)
+                local.append(iterator.sequence)
+            received = [results.get(timeout=30) for _ in range(ITEMS)]
+            process.join(timeout=30)
+
+        assert local == list(range(0, 2 * ITEMS, 2))
+        assert [sequence for sequence, _ in received] == list(range(1, 2 * ITEMS, 2))
+
+    def test_owner_shuts_factory_down(self):
+        with small_buffer_iterator(
+            buffer_count=BUFFER_COUNT, consumer=0, consumers=2
+        ) as buffer_iterator:
+            process, results = _start_consumer(buffer_iterator, consumer=1, consumers=2)
+            for _ in range(ITEMS):
+                next(buffer_iterator)
+            received = [results.get(timeout=30) for _ in range(ITEMS)]
+            process.join(timeout=30)
+
+        buffer_factory = buffer_iterator.buffer_factory
+        assert [sequence for sequence, _ in received] == list(range(1, 2 * ITEMS, 2))
+        assert not any(process.is_alive() for process in buffer_factory._producer_processes)
+        assert not buffer_factory._message_process.is_alive()
+
+    def test_errors_of_other_consumers(self):
+        with small_buffer_iterator(
+            FailingDataProducer(data_shapes=BUFFER_SHAPES),
+            buffer_count=BUFFER_COUNT,
+            times=[[0.0] * 4, [0, -1, 2, -1]],
+        ) as buffer_iterator:
+            iterator = BufferIterator(
+                buffer_factory=buffer_iterator.buffer_factory, consumer=0, consumers=2
+            )
+            process, results = _start_consumer(buffer_iterator, consumer=1, consumers=2)
+            for _ in range(ITEMS):
+                data = next(iterator)
+                assert int(data[1][0, 0, 0]) in (0, 2)
+            received = [results.get(timeout=30) for _ in range(ITEMS)]
+            process.join(timeout=30)
+
+        # every data of the other consumer failed
+        assert all(value is None for _, value in received)
+
+    def test_producer_died(self):
+        # the process of the factory respawns the producer while its own consumer does not wait for data
+        with small_buffer_iterator(
+            FailingDataProducer(data_shapes=BUFFER_SHAPES),
+            buffer_count=BUFFER_COUNT,
+            times=[[0.0] * 4, [0, 1, -2, 3]],
+        ) as buffer_iterator:
+            process, results = _start_consumer(buffer_iterator)
+            received = [results.get(timeout=30) for _ in range(ITEMS)]
+            process.join(timeout=30)
+
+        assert received == [
+            (sequence, None if sequence % 4 == 2 else sequence % 4)
+            for sequence in range(ITEMS)
+        ]
+
+    def test_factory_can_not_continue(self):
+        with small_buffer_iterator(
+            FailingDataProducer(data_shapes=BUFFER_SHAPES),
+            buffer_count=BUFFER_COUNT,
+            times=[[0.0] * 4, [0, 1, -2, 3]],
+            respawn=False,
+        ) as buffer_iterator:
+            process, results = _start_consumer(buffer_iterator)
+            sequence, value = results.get(timeout=30)
+            while sequence is not None:
+                sequence, value = results.get(timeout=30)
+            process.join(timeout=30)
+
+        assert "the factory of the attachment stopped" in value
+
+    def test_factory_shutdown(self):
+        buffer_iterator = small_buffer_iterator(
+            buffer_count=BUFFER_COUNT, times=[[0.0] + [60.0] * 3, [0, 1, 2, 3]]
+        )
+        process, results = _start_consumer(buffer_iterator)
+        assert results.get(timeout=30) == (0, 0)
+        buffer_iterator.stop()
+        # the consumer does not wait for data of the producers that have been stopped
+        sequence, value = results.get(timeout=30)
+        process.join(timeout=30)
+
+        assert sequence is None
+        assert "the factory of the attachment stopped" in value
+
+    def test_not_inherited(self):
+        with small_buffer_iterator(buffer_count=BUFFER_COUNT) as buffer_iterator:
+            # only a process that starts with the attachment can use its locks
+            with pytest.raises(RuntimeError, match="through inheritance"):
+                pickle.dumps(buffer_iterator.buffer_factory.attachment())
+
+    def test_thread_context(self):
+        with small_buffer_iterator(context="thread", cpus=1) as buffer_iterator:
+            with pytest.raises(ValueError):
+                buffer_iterator.buffer_factory.attachment()
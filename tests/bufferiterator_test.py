@@ -1,4 +1,7 @@
+import asyncio
+import os
 import sys
+import time
 from multiprocessing.context import BaseContext, SpawnContext
 
 from pytest_cov.embed import cleanup_on_sigterm
@@ -10,19 +13,72 @@ if not WINDOWS:
     from multiprocessing.context import ForkContext
 
 import numpy as np
+import pytest
 from concurrentbuffer.factory import create_buffer_factory
 from concurrentbuffer.info import BufferInfo
-from concurrentbuffer.iterator import BufferIterator, buffer_iterator_factory
+from concurrentbuffer.iterator import (
+    AsyncBufferIterator,
+    BufferIterator,
+    BufferView,
+    buffer_iterator_factory,
+)
+from concurrentbuffer.process import ProducerError
 from concurrentbuffer.state import BufferState
-from concurrentbuffer.system import BufferSystem
+from concurrentbuffer.system import SHARED_MEMORY_TRANSPORT, BufferSystem
+from concurrentbuffer.thread import ThreadContext
 from example.commander import DataCommander
-from example.producer import DataProducer
+from example.producer import (
+    DataProducer,
+    InPlaceDataProducer,
+    RaggedDataProducer,
+    RaggedInPlaceDataProducer,
+)
+from tests import helpers
 
 CPUS = 6
 BUFFER_SHAPES = ((12, 284, 284, 3), (12, 284, 284))
 TIMES = [[1, 5, 1, 4, 1, 1, 2, 4, 2, 4], [2, 6, 2, 5, 2, 2, 3, 5, 3, 5]]
 
 
+class TeardownDataProducer(DataProducer):
+    """DataProducer that writes a file in teardown"""
+
+    def __init__(self, data_shapes, path):
+        super().__init__(data_shapes=data_shapes)
+        self._path = path
+
+    def teardown(self):
+        with open(os.path.join(self._path, f"producer-{os.getpid()}"), "w"):
+            pass
+
+
+class TeardownDataCommander(DataCommander):
+    """DataCommander that writes a file in teardown"""
+
+    def __init__(self, times, path):
+        super().__init__(times=times)
+        self._path = path
+
+    def teardown(self):
+        with open(os.path.join(self._path, "commander"), "w"):
+            pass
+
+
+class BuildCountDataProducer(DataProducer):
+    """DataProducer that returns how many times build ran on its instance"""
+
+    def __init__(self, data_shapes):
+        super().__init__(data_shapes=data_shapes)
+        self._builds = 0
+
+    def build(self):
+        self._builds += 1
+
+    def create_data(self, message):
+        data, _ = super().create_data(message)
+        return data, np.full(self._data_shapes[1], self._builds)
+
+
 class TestBufferIterator:
     """This class contains methods to test the buffer iterator"""
 
@@ -30,9 +86,16 @@ class TestBufferIterator:
         self,
         context: BaseContext = SpawnContext(),
         deterministic: bool = True,
+        copy: bool = True,
+        in_place: bool = False,
+        buffer_dtype=np.uint8,
     ):
         commander = DataCommander(times=TIMES)
-        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        producer = (
+            InPlaceDataProducer()
+            if in_place
+            else DataProducer(data_shapes=BUFFER_SHAPES)
+        )
         buffer_factory = create_buffer_factory(
             cpus=CPUS * len(BufferState),
             batch_commander=commander,
@@ -40,15 +103,24 @@ class TestBufferIterator:
             context=context,
             deterministic=deterministic,
             buffer_shapes=BUFFER_SHAPES,
-            buffer_dtype=np.uint8,
+            buffer_dtype=buffer_dtype,
         )
 
-        with BufferIterator(buffer_factory=buffer_factory) as data_buffer_iterator:
+        with BufferIterator(
+            buffer_factory=buffer_factory, copy=copy
+        ) as data_buffer_iterator:
             for index in range(10):
                 data = next(data_buffer_iterator)
                 if deterministic:
                     assert np.all(data[0] == TIMES[0][index])
                     assert np.all(data[1] == TIMES[1][index])
+                if isinstance(buffer_dtype, tuple):
+                    assert data[0].dtype == buffer_dtype[0]
+                    assert data[1].dtype == buffer_dtype[1]
+                if not copy:
+                    assert isinstance(data, BufferView)
+                    assert not data[0].flags.writeable
+                    data.release()
 
     if not WINDOWS:
 
@@ -76,6 +148,30 @@ class TestBufferIterator:
                 deterministic=deterministic,
             )
 
+        def test_buffer_iterator_deterministic_forkserver(self):
+            context = "forkserver"
+            deterministic = True
+            self._iterating(
+                context=context,
+                deterministic=deterministic,
+            )
+
+        def test_iterator_factory_forkserver_preload(self):
+            commander = DataCommander(times=TIMES)
+            producer = DataProducer(data_shapes=BUFFER_SHAPES)
+            with buffer_iterator_factory(
+                cpus=CPUS,
+                buffer_shapes=BUFFER_SHAPES,
+                commander=commander,
+                producer=producer,
+                context="forkserver",
+                deterministic=True,
+                preload_modules=["numpy"],
+            ) as buffer_iterator:
+                for index in range(4):
+                    data = next(buffer_iterator)
+                    assert np.all(data[0] == TIMES[0][index])
+
     def test_buffer_iterator_spawn(self):
         context = SpawnContext()
         deterministic = False
@@ -100,6 +196,274 @@ class TestBufferIterator:
             deterministic=deterministic,
         )
 
+    def test_buffer_iterator_thread(self):
+        context = ThreadContext()
+        deterministic = False
+        self._iterating(
+            context=context,
+            deterministic=deterministic,
+        )
+
+    def test_buffer_iterator_deterministic_thread_str(self):
+        context = "thread"
+        deterministic = True
+        self._iterating(
+            context=context,
+            deterministic=deterministic,
+            in_place=True,
+        )
+
+    def test_buffer_iterator_thread_producer_copies(self):
+        producer = BuildCountDataProducer(data_shapes=helpers.BUFFER_SHAPES)
+        with helpers.small_buffer_iterator(
+            producer=producer,
+            times=[[0] * 10, list(range(10))],
+            context="thread",
+            cpus=4,
+        ) as buffer_iterator:
+            # every thread built its own producer once
+            for _ in range(8):
+                assert np.all(next(buffer_iterator)[1] == 1)
+            buffer_iterator.buffer_factory.attach(
+                commander=DataCommander(times=[[0] * 10, list(range(10))]),
+                producer=producer,
+            )
+            # the sequences start again after an attach, so a new iterator consumes them
+            with BufferIterator(
+                buffer_factory=buffer_iterator.buffer_factory, shutdown_factory=False
+            ) as attached_iterator:
+                for _ in range(8):
+                    assert np.all(next(attached_iterator)[1] == 1)
+        assert producer._builds == 0
+
+    def test_buffer_iterator_zero_copy_spawn(self):
+        context = SpawnContext()
+        deterministic = True
+        self._iterating(
+            context=context,
+            deterministic=deterministic,
+            copy=False,
+        )
+
+    def test_buffer_iterator_in_place_spawn(self):
+        context = SpawnContext()
+        deterministic = True
+        self._iterating(
+            context=context,
+            deterministic=deterministic,
+            in_place=True,
+        )
+
+    def test_buffer_iterator_per_output_dtypes_spawn(self):
+        context = SpawnContext()
+        deterministic = True
+        self._iterating(
+            context=context,
+            deterministic=deterministic,
+            buffer_dtype=(np.uint8, np.int64),
+        )
+
+    def test_iterator_factory_ragged(self):
+        commander = DataCommander(times=TIMES)
+        producer = RaggedDataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            buffer_ragged=(True, False),
+        ) as buffer_iterator:
+            for index in range(4):
+                data = next(buffer_iterator)
+                assert data[0].shape == (TIMES[1][index],) + BUFFER_SHAPES[0][1:]
+                assert np.all(data[0] == TIMES[0][index])
+                assert data[1].shape == BUFFER_SHAPES[1]
+
+    @pytest.mark.parametrize("message_timeout", [None, 30.0])
+    def test_iterator_factory_ragged_in_place(self, message_timeout):
+        # with deadlines the producer writes into local arrays first
+        with helpers.small_buffer_iterator(
+            producer=RaggedInPlaceDataProducer(data_shapes=helpers.BUFFER_SHAPES),
+            buffer_ragged=(True, False),
+            message_timeout=message_timeout,
+        ) as buffer_iterator:
+            for index in range(4):
+                data = next(buffer_iterator)
+                value = helpers.TIMES[1][index]
+                shape = (value + 1, 8 - value, 8, 3)
+                assert data[0].shape == shape
+                assert np.all(data[0] == np.arange(np.prod(shape)).reshape(shape))
+                assert np.all(data[1] == value)
+
+    def test_iterator_factory_ragged_in_place_slices(self):
+        with helpers.small_buffer_iterator(
+            producer=RaggedInPlaceDataProducer(data_shapes=helpers.BUFFER_SHAPES, slices=True),
+            buffer_ragged=(True, False),
+        ) as buffer_iterator:
+            # only the number of rows differs
+            assert next(buffer_iterator)[0].shape == (1, 8, 8, 3)
+            with pytest.raises(ProducerError, match="return the shapes from create_shapes"):
+                next(buffer_iterator)
+
+    def test_iterator_factory_message_batch_size(self):
+        commander = DataCommander(times=TIMES)
+        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            message_batch_size=3,
+        ) as buffer_iterator:
+            for index in range(6):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == TIMES[0][index])
+                assert np.all(data[1] == TIMES[1][index])
+
+    def test_iterator_factory_shared_memory_transport(self):
+        commander = DataCommander(times=TIMES)
+        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            message_transport=SHARED_MEMORY_TRANSPORT,
+        ) as buffer_iterator:
+            for index in range(6):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == TIMES[0][index])
+                assert np.all(data[1] == TIMES[1][index])
+
+    def test_iterator_factory_reorder_window(self):
+        commander = DataCommander(times=TIMES)
+        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            reorder_window=CPUS,
+        ) as buffer_iterator:
+            for index in range(10):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == TIMES[0][index])
+                assert np.all(data[1] == TIMES[1][index])
+
+    def test_iterator_factory_order_window(self):
+        order_window = 2
+        commander = DataCommander(times=TIMES)
+        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            order_window=order_window,
+        ) as buffer_iterator:
+            sequences = []
+            for position in range(10):
+                data = next(buffer_iterator)
+                sequence = buffer_iterator.sequence
+                assert abs(sequence - position) <= order_window
+                index = sequence % len(TIMES[0])
+                assert np.all(data[0] == TIMES[0][index])
+                assert np.all(data[1] == TIMES[1][index])
+                sequences.append(sequence)
+            assert len(set(sequences)) == len(sequences)
+            assert set(range(10 - order_window)) <= set(sequences)
+
+    def _async_iterating(self, notify_available: bool):
+        async def iterate():
+            async with helpers.small_buffer_iterator(
+                buffer_iterator_class=AsyncBufferIterator,
+                notify_available=notify_available,
+            ) as buffer_iterator:
+                # the event loop keeps running while waiting for data
+                ticks = 0
+
+                async def tick():
+                    nonlocal ticks
+                    while True:
+                        await asyncio.sleep(0.01)
+                        ticks += 1
+
+                ticker = asyncio.ensure_future(tick())
+                index = 0
+                async for data in buffer_iterator:
+                    assert np.all(data[1] == helpers.TIMES[1][index])
+                    index += 1
+                    if index == 4:
+                        break
+                ticker.cancel()
+                assert ticks > 0
+
+        asyncio.run(iterate())
+
+    if not WINDOWS:
+
+        def test_async_iterator_notify_available(self):
+            self._async_iterating(notify_available=True)
+
+    def test_async_iterator_poll(self):
+        self._async_iterating(notify_available=False)
+
+    def test_async_iterator_cancel(self):
+        times = [[0.5] + [0] * 9, list(range(10))]
+
+        async def iterate():
+            async with helpers.small_buffer_iterator(
+                times=times,
+                buffer_iterator_class=AsyncBufferIterator,
+                poll_interval=30.0,
+            ) as buffer_iterator:
+                # cancelled while an executor thread waits for the first data
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(buffer_iterator.__anext__(), timeout=0.1)
+                state_memory = buffer_iterator.buffer_factory.buffer_state_memory
+                # the executor thread takes the first data after the cancellation
+                while not state_memory.get_buffer_count_with_state(BufferState.PROCESSING):
+                    await asyncio.sleep(0.01)
+                for index in range(3):
+                    data = await buffer_iterator.__anext__()
+                    assert buffer_iterator.sequence == index
+                    assert np.all(data[1] == times[1][index])
+                # only the buffer of the last data is processing
+                assert state_memory.get_buffer_count_with_state(BufferState.PROCESSING) == 1
+
+        asyncio.run(iterate())
+
+    def test_graceful_shutdown(self, tmp_path):
+        times = [[0.2] * 10, list(range(10))]
+        buffer_iterator = buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=TeardownDataCommander(times=times, path=str(tmp_path)),
+            producer=TeardownDataProducer(data_shapes=BUFFER_SHAPES, path=str(tmp_path)),
+            context="spawn",
+            deterministic=True,
+        )
+        for index in range(2):
+            assert np.all(next(buffer_iterator)[1] == times[1][index])
+
+        start = time.monotonic()
+        buffer_iterator.stop(timeout=30)
+        # the messages in flight are produced, not waited for until the timeout
+        assert time.monotonic() - start < 30
+        names = sorted(os.listdir(tmp_path))
+        assert names.count("commander") == 1
+        assert len([name for name in names if name.startswith("producer-")]) == CPUS
+
     def test_iterator_factory(self):
         commander = DataCommander(times=TIMES)
         producer = DataProducer(data_shapes=BUFFER_SHAPES)
@@ -118,3 +482,20 @@ class TestBufferIterator:
             if deterministic:
                 assert np.all(data[0] == TIMES[0][index])
                 assert np.all(data[1] == TIMES[1][index])
+        buffer_iterator.stop()
+
+    def test_iterator_factory_buffer_count(self):
+        commander = DataCommander(times=TIMES)
+        producer = DataProducer(data_shapes=BUFFER_SHAPES)
+        with buffer_iterator_factory(
+            cpus=CPUS,
+            buffer_shapes=BUFFER_SHAPES,
+            commander=commander,
+            producer=producer,
+            context="spawn",
+            deterministic=True,
+            buffer_count=CPUS + 1,
+        ) as buffer_iterator:
+            for index in range(4):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == TIMES[0][index])
@@ -0,0 +1,128 @@
+import asyncio
+import sys
+import threading
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import pytest
+from concurrentbuffer import iterator
+from concurrentbuffer.consumers import ConsumerGroup
+from concurrentbuffer.iterator import AsyncBufferIterator
+from concurrentbuffer.system import LOAD_BALANCED_DELIVERY, ROUND_ROBIN_DELIVERY
+from tests.helpers import CPUS, small_buffer_iterator
+
+CONSUMERS = 2
+ITEMS = 12
+WINDOWS = sys.platform == "win32"
+
+
+def _consumer_group(consumers=CONSUMERS, **kwargs):
+    return small_buffer_iterator(
+        buffer_count=2 * CPUS + CONSUMERS,
+        buffer_iterator_class=ConsumerGroup,
+        consumers=consumers,
+        **kwargs,
+    )
+
+
+def _consume(consumer_group, items=ITEMS):
+    # every consumer runs in its own thread and returns the sequences and values it got
+    results = [[] for _ in consumer_group]
+
+    def consume(consumer, result):
+        for _ in range(items):
+            data = next(consumer)
+            result.append((consumer.sequence, int(data[1][0, 0, 0])))
+
+    threads = [
+        threading.Thread(target=consume, args=(consumer, result))
+        for consumer, result in zip(consumer_group, results)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestConsumerGroup:
+    """This class contains methods to test multiple consumers of one factory"""
+
+    @pytest.mark.parametrize("context", ["spawn", "thread"])
+    def test_round_robin_deterministic(self, context):
+        with _consumer_group(context=context, delivery=ROUND_ROBIN_DELIVERY) as consumer_group:
+            results = _consume(consumer_group)
+
+        for consumer, result in enumerate(results):
+            sequences = [consumer + index * CONSUMERS for index in range(ITEMS)]
+            assert result == [(sequence, sequence % 4) for sequence in sequences]
+
+    def test_load_balanced_deterministic(self):
+        with _consumer_group(delivery=LOAD_BALANCED_DELIVERY) as consumer_group:
+            results = _consume(consumer_group)
+
+        for result in results:
+            assert [sequence for sequence, _ in result] == sorted(sequence for sequence, _ in result)
+            assert all(value == sequence % 4 for sequence, value in result)
+        sequences = sorted(sequence for result in results for sequence, _ in result)
+        assert sequences == list(range(CONSUMERS * ITEMS))
+
+    @pytest.mark.parametrize("delivery", [ROUND_ROBIN_DELIVERY, LOAD_BALANCED_DELIVERY])
+    def test_not_deterministic(self, delivery):
+        with _consumer_group(deterministic=False, delivery=delivery) as consumer_group:
+            results = _consume(consumer_group)
+
+        sequences = [sequence for result in results for sequence, _ in result]
+        assert len(set(sequences)) == len(sequences)
+        if delivery == ROUND_ROBIN_DELIVERY:
+            for consumer, result in enumerate(results):
+                assert all(sequence % CONSUMERS == consumer for sequence, _ in result)
+
+    if not WINDOWS:
+
+        def test_async_consumers_notify_available(self, monkeypatch):
+            # a consumer that misses a notification would wait for the producer check
+            monkeypatch.setattr(iterator, "PRODUCER_CHECK_INTERVAL", 60.0)
+
+            async def consume(consumer):
+                result = []
+                for _ in range(ITEMS):
+                    data = await consumer.__anext__()
+                    result.append((consumer.sequence, int(data[1][0, 0, 0])))
+                return result
+
+            async def consume_all():
+                consumer_group = _consumer_group(
+                    consumer_class=AsyncBufferIterator, notify_available=True
+                )
+                try:
+                    return await asyncio.wait_for(
+                        asyncio.gather(*(consume(consumer) for consumer in consumer_group)),
+                        timeout=30.0,
+                    )
+                finally:
+                    await consumer_group.async_stop()
+
+            results = asyncio.run(consume_all())
+            for consumer, result in enumerate(results):
+                sequences = [consumer + index * CONSUMERS for index in range(ITEMS)]
+                assert result == [(sequence, sequence % 4) for sequence in sequences]
+
+    def test_consumer_stop_releases_buffer(self):
+        with _consumer_group() as consumer_group:
+            next(consumer_group[0])
+            consumer_group[0].stop()
+            # the factory keeps running for the other consumer
+            for index in range(4):
+                next(consumer_group[1])
+                assert consumer_group[1].sequence == 1 + index * CONSUMERS
+
+    def test_invalid_consumers(self):
+        with pytest.raises(ValueError):
+            _consumer_group(delivery="random")
+        with pytest.raises(ValueError):
+            _consumer_group(delivery=LOAD_BALANCED_DELIVERY, reorder_window=1)
+        # more consumers than buffers
+        with pytest.raises(ValueError):
+            _consumer_group(consumers=2 * CPUS + CONSUMERS + 1)
@@ -1,19 +1,13 @@
-import sys
-
 from pytest_cov.embed import cleanup_on_sigterm
 cleanup_on_sigterm()
 
-WINDOWS = sys.platform == "win32"
-
-if not WINDOWS:
-    from multiprocessing.context import ForkServerContext
-
 from concurrentbuffer.commander import get_commander_process_class_object
 from concurrentbuffer.info import BufferInfo
 from concurrentbuffer.manager import (SharedBufferManager,
                                       SharedBufferManagerNotStarted)
 from concurrentbuffer.producer import get_producer_process_class_object
 from concurrentbuffer.state import BufferState
+from concurrentbuffer.system import BufferSystem
 from pytest import raises
 
 
@@ -28,7 +22,7 @@ class TestErrors:
             buffer_shapes = ((12, 284, 284, 3), (12, 284, 284))
             buffer_info = BufferInfo(count=count, shapes=buffer_shapes)
             shared_buffer_manager = SharedBufferManager(buffer_info=buffer_info)
-            _ = shared_buffer_manager.buffers
+            _ = shared_buffer_manager.arena
 
     def test_buffer_state_error(self):
 
@@ -40,11 +34,20 @@ class TestErrors:
             shared_buffer_manager = SharedBufferManager(buffer_info=buffer_info)
             _ = shared_buffer_manager.state_buffer
 
-    if not WINDOWS:
-        def test_get_commander_process_class_object(self):
-            with raises(ValueError):
-                get_commander_process_class_object(ForkServerContext)
+    def test_order_window_error(self):
+        with raises(ValueError):
+            BufferSystem(cpus=6, order_window=-1)
+        with raises(ValueError):
+            BufferSystem(cpus=6, deterministic=False, order_window=2)
+
+    def test_message_batch_size_error(self):
+        with raises(ValueError):
+            BufferSystem(cpus=6, message_batch_size=0)
+
+    def test_get_commander_process_class_object(self):
+        with raises(ValueError):
+            get_commander_process_class_object(object())
 
-        def test_get_producer_process_class_object(self):
-            with raises(ValueError):
-                get_producer_process_class_object(ForkServerContext)
+    def test_get_producer_process_class_object(self):
+        with raises(ValueError):
+            get_producer_process_class_object(object())
@@ -0,0 +1,38 @@
+import numpy as np
+from concurrentbuffer.iterator import buffer_iterator_factory
+from example.commander import DataCommander
+from example.producer import DataProducer
+
+# small buffers that are produced fast, shared by the tests of the features of the iterator
+CPUS = 2
+BUFFER_SHAPES = ((4, 8, 8, 3), (4, 8, 8))
+TIMES = [[0.01, 0.0, 0.02, 0.0], [0, 1, 2, 3]]
+
+
+def small_buffer_iterator(
+    producer=None,
+    times=TIMES,
+    commander=None,
+    context="spawn",
+    cpus=CPUS,
+    buffer_count=None,
+    **kwargs,
+):
+    """Creates a deterministic iterator over int16 buffers with BUFFER_SHAPES
+
+    The commander defaults to a DataCommander of the times, the producer to a DataProducer and the
+    buffer count to two buffers per cpu, the remaining keyword arguments are passed to
+    buffer_iterator_factory.
+    """
+
+    return buffer_iterator_factory(
+        cpus=cpus,
+        buffer_shapes=BUFFER_SHAPES,
+        commander=DataCommander(times=times) if commander is None else commander,
+        producer=DataProducer(data_shapes=BUFFER_SHAPES) if producer is None else producer,
+        context=context,
+        deterministic=kwargs.pop("deterministic", True),
+        buffer_dtype=np.int16,
+        buffer_count=2 * cpus if buffer_count is None else buffer_count,
+        **kwargs,
+    )
@@ -0,0 +1,71 @@
+import os
+import pickle
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+import pytest
+from concurrentbuffer.info import (
+    HUGE_PAGE_SIZE,
+    HUGETLBFS_HUGE_PAGES,
+    TRANSPARENT_HUGE_PAGES,
+    BufferInfo,
+)
+from concurrentbuffer.manager import SHM_PATH, HugePageMemory, get_hugetlbfs_mount
+from tests.helpers import BUFFER_SHAPES, small_buffer_iterator
+
+
+def _hugetlbfs_mounted() -> bool:
+    try:
+        get_hugetlbfs_mount()
+    except ValueError:
+        return False
+    return True
+
+
+def _huge_page_files() -> set:
+    return {name for name in os.listdir(SHM_PATH) if name.startswith("cb_")}
+
+
+class TestHugePages:
+    """This class contains methods to test buffers backed by huge pages and prefaulting"""
+
+    def test_huge_page_memory(self):
+        memory = HugePageMemory(create=True, size=100, huge_pages=TRANSPARENT_HUGE_PAGES)
+        try:
+            assert memory.size == HUGE_PAGE_SIZE
+            memory.buf[:3] = b"abc"
+            attached = pickle.loads(pickle.dumps(memory))
+            assert attached.name == memory.name
+            assert bytes(attached.buf[:3]) == b"abc"
+        finally:
+            memory.unlink()
+        assert not os.path.exists(memory.name)
+
+    @pytest.mark.skipif(not _hugetlbfs_mounted(), reason="no hugetlbfs is mounted")
+    def test_hugetlbfs_memory(self):
+        memory = HugePageMemory(create=True, size=100, huge_pages=HUGETLBFS_HUGE_PAGES)
+        try:
+            memory.buf[:3] = b"abc"
+            assert bytes(memory.buf[:3]) == b"abc"
+        finally:
+            memory.unlink()
+
+    def test_invalid_huge_pages(self):
+        with pytest.raises(ValueError):
+            BufferInfo(shapes=BUFFER_SHAPES, count=4, huge_pages="gigantic")
+
+    @pytest.mark.parametrize("context", ["spawn", "thread"])
+    def test_prefault_huge_pages(self, context):
+        files = _huge_page_files()
+        with small_buffer_iterator(
+            context=context,
+            prefault=True,
+            buffer_huge_pages=TRANSPARENT_HUGE_PAGES,
+        ) as buffer_iterator:
+            assert len(_huge_page_files() - files) == 1
+            for index in range(8):
+                data = next(buffer_iterator)
+                assert np.all(data[1] == index % 4)
+        assert _huge_page_files() == files
@@ -0,0 +1,54 @@
+import numpy as np
+from concurrentbuffer.info import HUGE_PAGE_SIZE, BufferInfo
+from concurrentbuffer.layout import BufferLayout
+from pytest import raises
+
+BUFFER_SHAPES = ((12, 28, 28, 3), (12, 28, 28))
+
+
+class TestBufferLayout:
+    """This class contains methods to test the layout of the arena"""
+
+    def _check_layout(self, buffer_info: BufferInfo):
+        layout = BufferLayout(buffer_info=buffer_info)
+        regions = [(layout.state_offset, layout.state_nbytes)]
+        for idx, shape in enumerate(buffer_info.shapes):
+            nbytes = int(np.prod(shape)) * buffer_info.dtypes[idx].itemsize
+            for offset in layout.offsets[idx]:
+                assert offset % buffer_info.alignment == 0
+                regions.append((offset, nbytes))
+
+        regions.sort()
+        for (offset, nbytes), (next_offset, _) in zip(regions, regions[1:]):
+            assert offset + nbytes <= next_offset
+        assert regions[-1][0] + regions[-1][1] <= layout.nbytes
+
+    def test_cache_line_layout(self):
+        self._check_layout(
+            BufferInfo(shapes=BUFFER_SHAPES, count=24, dtype=np.dtype("float32"))
+        )
+
+    def test_huge_page_layout(self):
+        self._check_layout(
+            BufferInfo(shapes=BUFFER_SHAPES, count=8, alignment=HUGE_PAGE_SIZE)
+        )
+
+    def test_per_output_dtypes_layout(self):
+        buffer_info = BufferInfo(
+            shapes=BUFFER_SHAPES, count=4, dtype=(np.uint8, np.float32)
+        )
+        assert buffer_info.dtypes == (np.dtype("uint8"), np.dtype("float32"))
+        assert buffer_info.nbytes == 12 * 28 * 28 * 3 + 12 * 28 * 28 * 4
+        self._check_layout(buffer_info)
+
+    def test_structured_dtype(self):
+        buffer_info = BufferInfo(
+            shapes=BUFFER_SHAPES,
+            count=4,
+            dtype=np.dtype([("image", np.uint8), ("mask", np.int64)]),
+        )
+        assert buffer_info.dtypes == (np.dtype("uint8"), np.dtype("int64"))
+
+    def test_dtype_count_mismatch(self):
+        with raises(ValueError):
+            BufferInfo(shapes=BUFFER_SHAPES, count=4, dtype=(np.uint8,))
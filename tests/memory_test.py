@@ -0,0 +1,79 @@
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pytest
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.layout import BufferLayout
+from concurrentbuffer.memory import BufferMemory, ragged_view
+
+BUFFER_SHAPES = ((6, 4, 3), (5,))
+COUNT = 2
+
+
+@pytest.fixture
+def buffer_memories():
+    buffer_info = BufferInfo(
+        shapes=BUFFER_SHAPES, count=COUNT, dtype=np.int32, ragged=(True, False)
+    )
+    layout = BufferLayout(buffer_info=buffer_info)
+    shared_memory = SharedMemory(create=True, size=layout.nbytes)
+    yield [
+        BufferMemory(
+            shape=shape,
+            dtype=buffer_info.dtypes[idx],
+            buffer=shared_memory,
+            offsets=layout.offsets[idx],
+            header_offsets=layout.header_offsets[idx],
+        )
+        for idx, shape in enumerate(BUFFER_SHAPES)
+    ]
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+class TestBufferMemory:
+    """This class contains methods to test the buffer memory"""
+
+    def test_ragged_buffer(self, buffer_memories):
+        ragged_memory, fixed_memory = buffer_memories
+        assert ragged_memory.ragged
+        assert not fixed_memory.ragged
+
+        data = np.arange(2 * 4 * 3).reshape(2, 4, 3)
+        ragged_memory.update_buffer(buffer_id=1, data=data)
+        assert ragged_memory.get_shape(buffer_id=1) == (2, 4, 3)
+        assert np.all(ragged_memory.get_buffer(buffer_id=1) == data)
+
+        view = ragged_memory.get_buffer(buffer_id=1, copy=False)
+        assert view.shape == (2, 4, 3)
+        assert not view.flags.writeable
+        del view
+
+        assert fixed_memory.get_buffer(buffer_id=1).shape == BUFFER_SHAPES[1]
+
+    def test_ragged_view_in_place(self, buffer_memories):
+        ragged_memory, _ = buffer_memories
+        out_array = ragged_memory.get_writable_buffer(buffer_id=0)
+        ragged_view(array=out_array, shape=(3, 2, 3))[:] = 7
+        ragged_memory.update_shape(buffer_id=0, shape=(3, 2, 3))
+        data = ragged_memory.get_buffer(buffer_id=0)
+        assert data.shape == (3, 2, 3)
+        assert np.all(data == 7)
+        del out_array
+
+    def test_ragged_shape_exceeds_capacity(self, buffer_memories):
+        ragged_memory, fixed_memory = buffer_memories
+        with pytest.raises(ValueError):
+            ragged_memory.update_buffer(buffer_id=0, data=np.zeros((7, 4, 3)))
+        with pytest.raises(ValueError):
+            fixed_memory.update_shape(buffer_id=0, shape=(2,))
+
+    def test_touch(self, buffer_memories):
+        ragged_memory, fixed_memory = buffer_memories
+        ragged_memory.update_buffer(buffer_id=1, data=np.ones((2, 4, 3)))
+        fixed_memory.update_buffer(buffer_id=1, data=np.arange(5))
+        for buffer_id in range(COUNT):
+            ragged_memory.touch(buffer_id=buffer_id)
+            fixed_memory.touch(buffer_id=buffer_id)
+        assert np.all(ragged_memory.get_buffer(buffer_id=1) == np.ones((2, 4, 3)))
+        assert np.all(fixed_memory.get_buffer(buffer_id=1) == np.arange(5))
@@ -0,0 +1,104 @@
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import pytest
+from concurrentbuffer.consumers import ConsumerGroup
+from concurrentbuffer.metrics import BufferMetrics
+from tests.helpers import CPUS, small_buffer_iterator
+
+# every data takes at least 0.01 seconds to create
+TIMES = [[0.01] * 4, [0, 1, 2, 3]]
+
+
+@pytest.fixture
+def buffer_metrics():
+    shared_memory = SharedMemory(
+        create=True, size=BufferMetrics.nbytes(cpus=CPUS, consumers=2)
+    )
+    yield BufferMetrics(cpus=CPUS, buffer=shared_memory, consumers=2)
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+class TestBufferMetrics:
+    """This class contains methods to test the metrics"""
+
+    def test_worker_metrics(self, buffer_metrics):
+        producer = buffer_metrics.producer(1)
+        producer.count("produced")
+        producer.count("produced", 2)
+        for _ in range(10):
+            producer.record("create_data", time.perf_counter_ns() - 1000)
+
+        stats = buffer_metrics.stats()
+        assert stats["producers"][0] == {"produced": 0, "failed": 0}
+        assert stats["producers"][1]["produced"] == 3
+        create_data = stats["producers"][1]["create_data"]
+        assert create_data["count"] == 10
+        assert 1e-6 <= create_data["mean_seconds"] <= create_data["max_seconds"]
+        assert create_data["p50_seconds"] <= create_data["p99_seconds"] <= create_data["max_seconds"]
+        assert stats["consumer"] == {"consumed": 0}
+
+    def test_consumer_rows(self, buffer_metrics):
+        # every consumer writes its own row, the stats add them up
+        for index in range(2):
+            consumer = buffer_metrics.consumer(index)
+            consumer.count("consumed", index + 1)
+            consumer.record("wait", time.perf_counter_ns() - 1000 * 10**index)
+
+        stats = buffer_metrics.stats()
+        assert stats["consumer"]["consumed"] == 3
+        assert stats["consumer"]["wait"]["count"] == 2
+        assert stats["consumer"]["wait"]["max_seconds"] >= 1e-5
+        assert stats["consumer"]["wait"]["total_seconds"] >= 1.1e-5
+
+    def test_consumer_group_stats(self):
+        with small_buffer_iterator(
+            times=TIMES,
+            metrics=True,
+            buffer_iterator_class=ConsumerGroup,
+            consumers=2,
+        ) as consumer_group:
+            threads = [
+                threading.Thread(target=lambda consumer=consumer: [next(consumer) for _ in range(4)])
+                for consumer in consumer_group
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            stats = consumer_group.stats()
+
+        assert stats["consumer"]["consumed"] == 8
+        assert stats["consumer"]["wait"]["count"] == 8
+
+    def test_iterator_stats(self):
+        with small_buffer_iterator(
+            times=TIMES,
+            metrics=True,
+        ) as buffer_iterator:
+            for _ in range(8):
+                next(buffer_iterator)
+            stats = buffer_iterator.stats()
+
+        assert stats["consumer"]["consumed"] == 8
+        assert stats["consumer"]["wait"]["count"] == 8
+        assert stats["consumer"]["read"]["count"] == 8
+        assert sum(producer["produced"] for producer in stats["producers"]) >= 8
+        assert all(
+            producer["create_data"]["mean_seconds"] >= 0.01
+            for producer in stats["producers"]
+            if "create_data" in producer
+        )
+        assert stats["commander"]["messages"] >= 8
+        assert sum(stats["states"].values()) == 2 * CPUS
+        assert 0 < sum(stats["mean_states"].values()) <= 2 * CPUS
+
+    def test_metrics_disabled(self):
+        with small_buffer_iterator(times=TIMES, context="thread", cpus=1) as buffer_iterator:
+            with pytest.raises(ValueError):
+                buffer_iterator.stats()
@@ -0,0 +1,55 @@
+import asyncio
+import multiprocessing
+import select
+import sys
+
+import pytest
+from concurrentbuffer.notify import AvailableNotifier
+
+WINDOWS = sys.platform == "win32"
+
+
+@pytest.mark.skipif(WINDOWS, reason="notifications are not supported on Windows")
+class TestAvailableNotifier:
+    """This class contains methods to test the available notifier"""
+
+    def test_notify_and_drain(self):
+        available_notifier = AvailableNotifier(
+            context=multiprocessing.get_context("spawn")
+        )
+        assert select.select([available_notifier.fileno()], [], [], 0)[0] == []
+        available_notifier.notify()
+        available_notifier.notify()
+        assert select.select([available_notifier.fileno()], [], [], 0)[0] != []
+        available_notifier.drain()
+        assert select.select([available_notifier.fileno()], [], [], 0)[0] == []
+        available_notifier.close()
+
+    def test_notify_does_not_block_when_full(self):
+        available_notifier = AvailableNotifier(
+            context=multiprocessing.get_context("spawn")
+        )
+        for _ in range(1 << 18):
+            available_notifier.notify()
+        available_notifier.drain()
+        assert select.select([available_notifier.fileno()], [], [], 0)[0] == []
+        available_notifier.close()
+
+    def test_wait_wakes_all_waiters(self):
+        available_notifier = AvailableNotifier(
+            context=multiprocessing.get_context("spawn")
+        )
+
+        async def wait():
+            assert not await available_notifier.wait(timeout=0.01)
+            waiters = [
+                asyncio.ensure_future(available_notifier.wait(timeout=5.0))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0)
+            available_notifier.notify()
+            return await asyncio.gather(*waiters)
+
+        assert asyncio.run(wait()) == [True, True, True]
+        assert select.select([available_notifier.fileno()], [], [], 0)[0] == []
+        available_notifier.close()
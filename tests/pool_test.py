@@ -0,0 +1,101 @@
+from multiprocessing.context import SpawnContext
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.pool import BufferPool
+from concurrentbuffer.system import SHARED_MEMORY_TRANSPORT, BufferSystem
+from example.commander import DataCommander
+from example.producer import DataProducer, InPlaceDataProducer
+
+CPUS = 3
+BUFFER_SHAPES = ((12, 28, 28, 3), (12, 28, 28))
+FIRST_TIMES = [[0.01] * 10, list(range(10))]
+SECOND_TIMES = [[0.01] * 10, list(range(10, 20))]
+
+
+class TestBufferPool:
+    """This class contains methods to test the buffer pool"""
+
+    def _iterate(self, buffer_iterator, times, shapes=BUFFER_SHAPES, count=5):
+        with buffer_iterator:
+            for index in range(count):
+                data = next(buffer_iterator)
+                assert data[1].shape == shapes[1]
+                assert np.all(data[1] == times[1][index])
+
+    def test_buffer_pool(self):
+        buffer_system = BufferSystem(cpus=CPUS, context=SpawnContext())
+        buffer_info = BufferInfo(count=CPUS * 2, shapes=BUFFER_SHAPES)
+        with BufferPool(
+            buffer_system=buffer_system,
+            buffer_info=buffer_info,
+            producer=DataProducer(data_shapes=BUFFER_SHAPES),
+        ) as buffer_pool:
+            self._iterate(
+                buffer_pool.iterator(commander=DataCommander(times=FIRST_TIMES)),
+                FIRST_TIMES,
+            )
+            buffer_factory = buffer_pool.buffer_factory
+
+            # a new commander on the warm producers
+            self._iterate(
+                buffer_pool.iterator(commander=DataCommander(times=SECOND_TIMES)),
+                SECOND_TIMES,
+            )
+            assert buffer_pool.buffer_factory is buffer_factory
+
+            # a new producer and shapes that fit in the allocated buffers
+            shapes = ((6, 28, 28, 3), (6, 28, 28))
+            self._iterate(
+                buffer_pool.iterator(
+                    commander=DataCommander(times=FIRST_TIMES),
+                    producer=InPlaceDataProducer(),
+                    buffer_shapes=shapes,
+                ),
+                FIRST_TIMES,
+                shapes=shapes,
+            )
+            assert buffer_pool.buffer_factory is buffer_factory
+
+            # shapes that do not fit start the pool again
+            shapes = ((24, 28, 28, 3), (24, 28, 28))
+            self._iterate(
+                buffer_pool.iterator(
+                    commander=DataCommander(times=SECOND_TIMES),
+                    buffer_shapes=shapes,
+                ),
+                SECOND_TIMES,
+                shapes=shapes,
+            )
+            assert buffer_pool.buffer_factory is not buffer_factory
+
+    def test_buffer_pool_reshape_shared_memory_transport(self):
+        # the configuration of many buffers does not fit in a slot of the message ring
+        buffer_system = BufferSystem(
+            cpus=CPUS, context=SpawnContext(), message_transport=SHARED_MEMORY_TRANSPORT
+        )
+        shapes = ((2, 64, 64, 3), (2, 64, 64), (2, 64))
+        buffer_info = BufferInfo(count=256, shapes=shapes)
+        with BufferPool(
+            buffer_system=buffer_system,
+            buffer_info=buffer_info,
+            producer=InPlaceDataProducer(),
+        ) as buffer_pool:
+            self._iterate(
+                buffer_pool.iterator(commander=DataCommander(times=FIRST_TIMES)),
+                FIRST_TIMES,
+                shapes=shapes,
+            )
+            shapes = ((1, 64, 64, 3), (1, 64, 64), (1, 64))
+            self._iterate(
+                buffer_pool.iterator(
+                    commander=DataCommander(times=FIRST_TIMES),
+                    producer=InPlaceDataProducer(),
+                    buffer_shapes=shapes,
+                ),
+                FIRST_TIMES,
+                shapes=shapes,
+            )
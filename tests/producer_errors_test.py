@@ -0,0 +1,122 @@
+from multiprocessing import ProcessError
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+import pytest
+from concurrentbuffer.factory import MAX_FAILED_STARTS, BufferFactory
+from concurrentbuffer.info import BufferInfo
+from concurrentbuffer.iterator import BufferIterator
+from concurrentbuffer.process import CommanderError
+from concurrentbuffer.producer import ProducerError
+from concurrentbuffer.system import SHARED_MEMORY_TRANSPORT, SKIP_ERRORS, BufferSystem
+from concurrentbuffer.thread import get_context
+from example.commander import DataCommander, FailingDataCommander
+from example.producer import FailingDataProducer, UnbuildableDataProducer
+from tests.helpers import BUFFER_SHAPES, CPUS, small_buffer_iterator
+
+
+def _times(values):
+    return [[0.01] * len(values), values]
+
+
+def _failing_iterator(values, **kwargs):
+    # the producer fails on negative values
+    return small_buffer_iterator(
+        producer=FailingDataProducer(data_shapes=BUFFER_SHAPES), times=_times(values), **kwargs
+    )
+
+
+class TestProducerErrors:
+    """This class contains methods to test data that fails to be produced"""
+
+    def test_raise_error(self):
+        with _failing_iterator([0, 1, -1, 3, 4, 5, 6, 7]) as buffer_iterator:
+            assert np.all(next(buffer_iterator)[1] == 0)
+            assert np.all(next(buffer_iterator)[1] == 1)
+            with pytest.raises(ProducerError, match="ValueError: cannot produce value -1"):
+                next(buffer_iterator)
+            assert buffer_iterator.sequence == 2
+            # iterating continues after the error
+            assert np.all(next(buffer_iterator)[1] == 3)
+            assert np.all(next(buffer_iterator)[1] == 4)
+
+    def test_skip_error_thread(self):
+        with _failing_iterator(
+            [0, -1, 2, 3, 4, 5, 6, 7], context="thread", error_policy=SKIP_ERRORS
+        ) as buffer_iterator:
+            assert np.all(next(buffer_iterator)[1] == 0)
+            with pytest.warns(RuntimeWarning, match="skipped data of sequence 1") as record:
+                assert np.all(next(buffer_iterator)[1] == 2)
+            assert record[0].filename == __file__
+            assert np.all(next(buffer_iterator)[1] == 3)
+
+    def test_reorder_window_error(self):
+        with _failing_iterator(
+            [0, 1, -1, 3, 4, 5, 6, 7], reorder_window=2 * CPUS - 1
+        ) as buffer_iterator:
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(2)] == [0, 1]
+            with pytest.raises(ProducerError):
+                next(buffer_iterator)
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(5)] == [3, 4, 5, 6, 7]
+
+    def test_max_retries(self):
+        with _failing_iterator([0, -3, 2, 3], max_retries=1) as buffer_iterator:
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(4)] == [0, -3, 2, 3]
+
+    def test_respawn(self):
+        with _failing_iterator([0, -2, 2, 3, 4, 5, 6, 7]) as buffer_iterator:
+            assert np.all(next(buffer_iterator)[1] == 0)
+            with pytest.raises(ProducerError, match="died with exit code 1"):
+                next(buffer_iterator)
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(6)] == [2, 3, 4, 5, 6, 7]
+            assert all(
+                producer_process.is_alive()
+                for producer_process in buffer_iterator._buffer_factory._producer_processes
+            )
+
+    def test_no_respawn(self):
+        with _failing_iterator([0, -2, 2, 3, 4, 5, 6, 7], respawn=False) as buffer_iterator:
+            assert np.all(next(buffer_iterator)[1] == 0)
+            with pytest.raises(ProcessError, match="died with exit code 1"):
+                next(buffer_iterator)
+
+    def test_commander_error(self):
+        with small_buffer_iterator(
+            commander=FailingDataCommander(times=_times([0, 1, 2, 3]), fail_at=3)
+        ) as buffer_iterator:
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(3)] == [0, 1, 2]
+            with pytest.raises(CommanderError, match="ValueError: cannot create message 3"):
+                next(buffer_iterator)
+
+    def test_commander_message_too_large(self):
+        buffer_factory = BufferFactory(
+            buffer_system=BufferSystem(
+                cpus=CPUS,
+                context=get_context("spawn"),
+                message_transport=SHARED_MEMORY_TRANSPORT,
+                message_nbytes=32,
+            ),
+            buffer_info=BufferInfo(count=2 * CPUS, shapes=BUFFER_SHAPES, dtype=np.int16),
+            commander=DataCommander(times=_times([0, 1, 2, 3])),
+            producer=FailingDataProducer(data_shapes=BUFFER_SHAPES),
+        )
+        with BufferIterator(buffer_factory=buffer_factory) as buffer_iterator:
+            with pytest.raises(CommanderError, match="does not fit"):
+                next(buffer_iterator)
+
+    def test_max_failed_starts(self):
+        with small_buffer_iterator(
+            producer=UnbuildableDataProducer(data_shapes=BUFFER_SHAPES)
+        ) as buffer_iterator:
+            with pytest.raises(
+                ProcessError, match=f"died {MAX_FAILED_STARTS + 1} times in a row"
+            ):
+                next(buffer_iterator)
+
+    def test_error_policy_error(self):
+        with pytest.raises(ValueError):
+            BufferSystem(cpus=CPUS, error_policy="ignore")
+        with pytest.raises(ValueError):
+            BufferSystem(cpus=CPUS, max_retries=-1)
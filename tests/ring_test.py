@@ -0,0 +1,65 @@
+import multiprocessing
+import queue
+from multiprocessing.shared_memory import SharedMemory
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import pytest
+from concurrentbuffer.ring import MessageRing
+
+SIZE = 4
+MESSAGE_NBYTES = 256
+
+
+def _put_messages(message_ring: MessageRing, count: int):
+    for index in range(count):
+        message_ring.put([{"index": index}])
+
+
+@pytest.fixture
+def message_ring():
+    shared_memory = SharedMemory(
+        create=True,
+        size=MessageRing.nbytes(size=SIZE, message_nbytes=MESSAGE_NBYTES),
+    )
+    yield MessageRing(
+        context=multiprocessing.get_context("spawn"),
+        buffer=shared_memory,
+        size=SIZE,
+        message_nbytes=MESSAGE_NBYTES,
+    )
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+class TestMessageRing:
+    """This class contains methods to test the shared memory message ring"""
+
+    def test_put_get(self, message_ring):
+        for index in range(3 * SIZE):
+            message_ring.put({"index": index})
+            assert message_ring.get() == {"index": index}
+
+    def test_full_and_empty(self, message_ring):
+        with pytest.raises(queue.Empty):
+            message_ring.get(timeout=0.01)
+        for index in range(SIZE):
+            message_ring.put(index)
+        with pytest.raises(queue.Full):
+            message_ring.put(SIZE, timeout=0.01)
+        assert [message_ring.get() for _ in range(SIZE)] == list(range(SIZE))
+
+    def test_message_too_large(self, message_ring):
+        with pytest.raises(ValueError):
+            message_ring.put(b"x" * MESSAGE_NBYTES)
+
+    def test_between_processes(self, message_ring):
+        count = 5 * SIZE
+        process = multiprocessing.get_context("spawn").Process(
+            target=_put_messages, args=(message_ring, count)
+        )
+        process.start()
+        messages = [message_ring.get(timeout=30) for _ in range(count)]
+        process.join()
+        assert messages == [[{"index": index}] for index in range(count)]
@@ -0,0 +1,155 @@
+import multiprocessing
+import threading
+from multiprocessing.shared_memory import SharedMemory
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+import pytest
+from concurrentbuffer.state import BufferState, BufferStateMemory
+
+COUNT = 8
+
+
+@pytest.fixture
+def buffer_state_memory():
+    shared_memory = SharedMemory(
+        create=True, size=BufferStateMemory.nbytes(count=COUNT, dtype=np.uint8)
+    )
+    yield BufferStateMemory(
+        count=COUNT,
+        dtype=np.dtype("uint8"),
+        lock=multiprocessing.get_context("spawn").Condition(),
+        buffer=shared_memory,
+    )
+    shared_memory.close()
+    shared_memory.unlink()
+
+
+class TestBufferStateMemory:
+    """This class contains methods to test the buffer state memory"""
+
+    def test_wait_for_available_timeout(self, buffer_state_memory):
+        assert buffer_state_memory.wait_for_available_buffer_id(timeout=0.05) is None
+
+    def test_wait_for_free_buffer_id(self, buffer_state_memory):
+        for _ in range(COUNT):
+            assert buffer_state_memory.wait_for_free_buffer_id(timeout=0) is not None
+        assert buffer_state_memory.wait_for_free_buffer_id(timeout=0.05) is None
+
+    def test_wait_for_available_wakes_up(self, buffer_state_memory):
+        buffer_id = buffer_state_memory.get_free_buffer_id()
+        timer = threading.Timer(
+            0.05,
+            buffer_state_memory.update_buffer_id_to_available,
+            kwargs={"buffer_id": buffer_id},
+        )
+        timer.start()
+        assert (
+            buffer_state_memory.wait_for_available_buffer_id(
+                buffer_id=buffer_id, timeout=5
+            )
+            == buffer_id
+        )
+        timer.join()
+        state_buffer = buffer_state_memory.get_state_buffer()
+        assert state_buffer[buffer_id] == BufferState.PROCESSING.value
+
+    def test_buffer_ids_with_state(self, buffer_state_memory):
+        reserved = [buffer_state_memory.get_free_buffer_id() for _ in range(3)]
+        assert reserved == [0, 1, 2]
+        for buffer_id in reversed(reserved):
+            buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+
+        assert buffer_state_memory.get_buffer_ids_with_state(
+            BufferState.AVAILABLE
+        ) == [2, 1, 0]
+        assert buffer_state_memory.get_available_buffer_id(buffer_id=1) == 1
+        assert buffer_state_memory.get_available_buffer_id() == 2
+        assert buffer_state_memory.get_buffer_count_with_state(BufferState.AVAILABLE) == 1
+        assert buffer_state_memory.get_buffer_count_with_state(BufferState.PROCESSING) == 2
+
+        buffer_state_memory.update_buffer_id_to_free(buffer_id=1)
+        assert buffer_state_memory.get_buffer_ids_with_state(BufferState.FREE) == [
+            3, 4, 5, 6, 7, 1
+        ]
+
+    def test_reset(self, buffer_state_memory):
+        for _ in range(COUNT):
+            buffer_state_memory.get_free_buffer_id()
+        buffer_state_memory.reset()
+        assert buffer_state_memory.get_buffer_count_with_state(BufferState.FREE) == COUNT
+        assert buffer_state_memory.get_buffer_count_with_state(BufferState.RESERVED) == 0
+
+    def test_wait_for_free_buffer_ids(self, buffer_state_memory):
+        assert buffer_state_memory.wait_for_free_buffer_ids(max_count=3) == [0, 1, 2]
+        assert buffer_state_memory.wait_for_free_buffer_ids(max_count=COUNT) == [
+            3, 4, 5, 6, 7
+        ]
+        assert buffer_state_memory.wait_for_free_buffer_ids(max_count=2, timeout=0.05) == []
+
+    def test_sequences(self, buffer_state_memory):
+        buffer_ids = buffer_state_memory.wait_for_free_buffer_ids(max_count=3)
+        assert [buffer_state_memory.get_sequence(buffer_id) for buffer_id in buffer_ids] == [0, 1, 2]
+
+        buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_ids[2])
+        assert buffer_state_memory.wait_for_available_sequence_buffer_id(first=0, timeout=0.05) is None
+        assert (
+            buffer_state_memory.wait_for_available_sequence_buffer_id(first=0, last=2, timeout=0)
+            == buffer_ids[2]
+        )
+
+        buffer_state_memory.update_buffer_id_to_free(buffer_id=buffer_ids[2])
+        buffer_id = buffer_state_memory.get_free_buffer_id()
+        assert buffer_state_memory.get_sequence(buffer_id) == 3
+        buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+        buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_ids[0])
+        assert (
+            buffer_state_memory.wait_for_available_sequence_buffer_id(first=0, last=3, timeout=0)
+            == buffer_ids[0]
+        )
+
+        with pytest.raises(ValueError):
+            buffer_state_memory.wait_for_available_sequence_buffer_id(first=0, last=COUNT)
+
+    def test_shards(self, buffer_state_memory):
+        buffer_ids = buffer_state_memory.wait_for_free_buffer_ids(max_count=4)
+        for buffer_id in buffer_ids:
+            buffer_state_memory.update_buffer_id_to_available(buffer_id=buffer_id)
+        # sequences 1 and 3 belong to shard 1 of 2
+        assert (
+            buffer_state_memory.wait_for_available_sequence_buffer_id(first=1, last=3, step=2, timeout=0)
+            == buffer_ids[1]
+        )
+        assert (
+            buffer_state_memory.wait_for_available_shard_buffer_id(shard=1, shards=2, timeout=0)
+            == buffer_ids[3]
+        )
+        assert buffer_state_memory.wait_for_available_shard_buffer_id(shard=1, shards=2, timeout=0.05) is None
+
+        assert [buffer_state_memory.claim_sequence() for _ in range(3)] == [0, 1, 2]
+        buffer_state_memory.reset()
+        assert buffer_state_memory.claim_sequence() == 0
+
+    def test_deadline_and_claim(self, buffer_state_memory):
+        buffer_id = buffer_state_memory.get_free_buffer_id()
+        sequence = buffer_state_memory.get_sequence(buffer_id)
+        generation = buffer_state_memory.get_generation()
+        assert buffer_state_memory.start_deadline(buffer_id, sequence, generation, timeout=0)
+        assert buffer_state_memory.get_expired_buffer_ids() == [buffer_id]
+        # the deadline is cleared once it is returned
+        assert buffer_state_memory.get_expired_buffer_ids() == []
+
+        assert buffer_state_memory.claim_buffer_id(buffer_id, sequence, generation)
+        assert not buffer_state_memory.claim_buffer_id(buffer_id, sequence, generation)
+        assert not buffer_state_memory.start_deadline(buffer_id, sequence, generation, timeout=0)
+
+    def test_claim_after_reset(self, buffer_state_memory):
+        buffer_id = buffer_state_memory.get_free_buffer_id()
+        sequence = buffer_state_memory.get_sequence(buffer_id)
+        generation = buffer_state_memory.get_generation()
+        buffer_state_memory.reset()
+        assert buffer_state_memory.get_free_buffer_id() == buffer_id
+        assert buffer_state_memory.get_sequence(buffer_id) == sequence
+        assert not buffer_state_memory.claim_buffer_id(buffer_id, sequence, generation)
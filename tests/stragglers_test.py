@@ -0,0 +1,91 @@
+import time
+
+from pytest_cov.embed import cleanup_on_sigterm
+cleanup_on_sigterm()
+
+import numpy as np
+import pytest
+from concurrentbuffer.producer import ProducerError
+from concurrentbuffer.system import FAIL_STRAGGLERS, SPECULATE_STRAGGLERS, BufferSystem
+from example.producer import (
+    DyingStragglerDataProducer,
+    InPlaceDataProducer,
+    StragglerDataProducer,
+)
+from tests.helpers import BUFFER_SHAPES, CPUS, small_buffer_iterator
+
+SLOW = 5.0
+TIMES = [[0.01, SLOW, 0.01, 0.01, 0.01, 0.01], [0, 1, 2, 3, 4, 5]]
+
+
+def _straggler_iterator(producer, times=TIMES, **kwargs):
+    # a spare buffer for the data after the straggler
+    return small_buffer_iterator(
+        producer=producer, times=times, buffer_count=2 * CPUS + 1, **kwargs
+    )
+
+
+class TestStragglers:
+    """This class contains methods to test messages that are past their deadline"""
+
+    def test_fail_stragglers(self):
+        with _straggler_iterator(
+            StragglerDataProducer(data_shapes=BUFFER_SHAPES), message_timeout=0.5
+        ) as buffer_iterator:
+            start = time.perf_counter()
+            assert np.all(next(buffer_iterator)[1] == 0)
+            with pytest.raises(ProducerError, match="before its deadline"):
+                next(buffer_iterator)
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(4)] == [2, 3, 4, 5]
+            assert time.perf_counter() - start < SLOW
+
+    def test_speculate_stragglers(self):
+        with _straggler_iterator(
+            StragglerDataProducer(data_shapes=BUFFER_SHAPES),
+            message_timeout=0.5,
+            straggler_policy=SPECULATE_STRAGGLERS,
+        ) as buffer_iterator:
+            start = time.perf_counter()
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(6)] == [0, 1, 2, 3, 4, 5]
+            assert time.perf_counter() - start < SLOW
+
+    @pytest.mark.parametrize("straggler_policy", [FAIL_STRAGGLERS, SPECULATE_STRAGGLERS])
+    def test_straggler_dies_later(self, straggler_policy):
+        # the straggler dies while the buffer of its message is reserved for sequence 3
+        times = [[3.0, 0.0, 0.0, 1.5], [-1, 1, 2, 3]]
+        with small_buffer_iterator(
+            producer=DyingStragglerDataProducer(data_shapes=BUFFER_SHAPES),
+            times=times,
+            buffer_count=CPUS + 1,
+            message_timeout=2.0,
+            straggler_policy=straggler_policy,
+        ) as buffer_iterator:
+            if straggler_policy == FAIL_STRAGGLERS:
+                with pytest.raises(ProducerError, match="before its deadline"):
+                    next(buffer_iterator)
+            else:
+                assert np.all(next(buffer_iterator)[1] == -1)
+            assert [int(next(buffer_iterator)[1][0, 0, 0]) for _ in range(2)] == [1, 2]
+            buffer_factory = buffer_iterator.buffer_factory
+            while all(process.is_alive() for process in buffer_factory._producer_processes):
+                time.sleep(0.01)
+            buffer_factory.check_producer_processes()
+            data = next(buffer_iterator)
+            assert buffer_iterator.sequence == 3
+            assert np.all(data[1] == 3)
+
+    def test_in_place_deadlines_thread(self):
+        times = [[0.01] * 4, [0, 1, 2, 3]]
+        with _straggler_iterator(
+            InPlaceDataProducer(), context="thread", times=times, message_timeout=5.0
+        ) as buffer_iterator:
+            for value in range(8):
+                data = next(buffer_iterator)
+                assert np.all(data[0] == 0)
+                assert np.all(data[1] == value % 4)
+
+    def test_message_timeout_error(self):
+        with pytest.raises(ValueError):
+            BufferSystem(cpus=CPUS, message_timeout=0)
+        with pytest.raises(ValueError):
+            BufferSystem(cpus=CPUS, message_timeout=1.0, straggler_policy="ignore")
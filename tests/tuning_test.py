@@ -0,0 +1,118 @@
+import os
+import time
+
+import numpy as np
+from concurrentbuffer.tuning import (
+    AUTO_BUFFER_COUNT,
+    auto_buffer_count,
+    default_buffer_count,
+    get_buffer_count,
+    measure_production_time,
+)
+from example.commander import DataCommander
+from example.producer import DataProducer
+from pytest import raises
+
+CPUS = 4
+BUFFER_SHAPES = ((2, 8, 8, 3), (2, 8, 8))
+TIMES = [[0.01, 0.02], [1, 2]]
+
+
+class TeardownDataProducer(DataProducer):
+    """DataProducer that writes a file in teardown"""
+
+    def __init__(self, data_shapes, path):
+        super().__init__(data_shapes=data_shapes)
+        self._path = path
+
+    def teardown(self):
+        with open(os.path.join(self._path, "producer"), "w"):
+            pass
+
+
+class TestTuning:
+    """This class contains methods to test the sizing of the buffer pool"""
+
+    def test_auto_buffer_count_consumer_bound(self):
+        count = auto_buffer_count(
+            cpus=CPUS, buffer_nbytes=1, production_time=0.1, consumption_time=1.0
+        )
+        assert count == CPUS + 2
+
+    def test_auto_buffer_count_producer_bound(self):
+        count = auto_buffer_count(
+            cpus=CPUS, buffer_nbytes=1, production_time=1.0, consumption_time=0.01
+        )
+        assert count == 2 * CPUS + 1
+
+    def test_auto_buffer_count_memory_budget(self):
+        count = auto_buffer_count(
+            cpus=CPUS, buffer_nbytes=100, production_time=1.0, memory_budget=600
+        )
+        assert count == 6
+
+        with raises(ValueError):
+            auto_buffer_count(
+                cpus=CPUS, buffer_nbytes=100, production_time=1.0, memory_budget=400
+            )
+
+    def test_get_buffer_count(self):
+        kwargs = {
+            "cpus": CPUS,
+            "commander": DataCommander(times=TIMES),
+            "producer": DataProducer(data_shapes=BUFFER_SHAPES),
+            "buffer_shapes": BUFFER_SHAPES,
+            "buffer_dtype": np.uint8,
+        }
+        assert get_buffer_count(buffer_count=None, **kwargs) == default_buffer_count(
+            cpus=CPUS
+        )
+        assert get_buffer_count(buffer_count=7, **kwargs) == 7
+        assert CPUS + 2 <= get_buffer_count(buffer_count=AUTO_BUFFER_COUNT, **kwargs)
+
+        with raises(ValueError):
+            get_buffer_count(buffer_count=0, **kwargs)
+        with raises(ValueError):
+            get_buffer_count(buffer_count="many", **kwargs)
+        # the memory budget is only used to size the pool automatically
+        with raises(ValueError):
+            get_buffer_count(buffer_count=None, memory_budget=1 << 20, **kwargs)
+        with raises(ValueError):
+            get_buffer_count(buffer_count=7, memory_budget=1 << 20, **kwargs)
+
+    def test_get_buffer_count_consumer_bound(self):
+        count = get_buffer_count(
+            buffer_count=AUTO_BUFFER_COUNT,
+            cpus=CPUS,
+            commander=DataCommander(times=[[0.0, 0.0], [1, 2]]),
+            producer=DataProducer(data_shapes=BUFFER_SHAPES),
+            buffer_shapes=BUFFER_SHAPES,
+            buffer_dtype=np.uint8,
+            consume=lambda data: time.sleep(0.05),
+        )
+        assert count == CPUS + 2
+
+    def test_get_buffer_count_producer_bound(self):
+        consumed = []
+        count = get_buffer_count(
+            buffer_count=AUTO_BUFFER_COUNT,
+            cpus=CPUS,
+            commander=DataCommander(times=[[0.05, 0.05], [1, 2]]),
+            producer=DataProducer(data_shapes=BUFFER_SHAPES),
+            buffer_shapes=BUFFER_SHAPES,
+            buffer_dtype=np.uint8,
+            consume=consumed.append,
+        )
+        assert count == 2 * CPUS + 1
+        # the consumer got batches of the producer with the type of the buffers
+        assert all(data[1].dtype == np.uint8 for data in consumed)
+        assert [int(data[1][0, 0, 0]) for data in consumed] == [1, 2, 1]
+
+    def test_measure_production_time_teardown(self, tmp_path):
+        measure_production_time(
+            commander=DataCommander(times=TIMES),
+            producer=TeardownDataProducer(data_shapes=BUFFER_SHAPES, path=str(tmp_path)),
+            buffer_shapes=BUFFER_SHAPES,
+            buffer_dtype=np.uint8,
+        )
+        assert len(os.listdir(tmp_path)) == 1